@@ -1,20 +1,45 @@
+import os
+
 from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
+import api.utils.rate_limit_storage  # noqa: F401 - registers the bounded+memory://, sqlite:// and prealloc+redis:// schemes
+from api.utils.fastjson import FastJSONProvider
+from api.utils import tracing, profiling
+
 # Create Flask app
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
+# Rate limiting can be switched off for load tests (RATELIMIT_ENABLED=0)
+app.config['RATELIMIT_ENABLED'] = os.environ.get('RATELIMIT_ENABLED', '1') != '0'
 
-# Configure CORS
+# Stage timings in a Server-Timing header and JSON logs (TRACING_ENABLED=1, see api/utils/tracing.py)
+tracing.init_app(app)
+# Per-request CPU profiles on demand via the X-Profile header (PROFILING_ENABLED=1, see api/utils/profiling.py)
+profiling.init_app(app)
+
+# Configure CORS (once, for every route)
+# TODO: Configure CORS more restrictively for production
 CORS(app)
 
-# Configure rate limiter
+# Configure rate limiter. bounded+memory:// is per process and tracks at most
+# RATELIMIT_MAX_KEYS client windows; with several workers use a shared store such
+# as sqlite:////tmp/fluxstreams-ratelimit.db or prealloc+redis://host:6379
+RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI', 'bounded+memory://')
+storage_options = {}
+if RATELIMIT_STORAGE_URI.startswith(('sqlite://', 'prealloc+')):
+    storage_options["reserve_batch"] = int(os.environ.get('RATELIMIT_RESERVE_BATCH', 8))
+elif RATELIMIT_STORAGE_URI.startswith('bounded+memory://'):
+    storage_options["max_keys"] = int(os.environ.get('RATELIMIT_MAX_KEYS', 20000))
+
 limiter = Limiter(
     get_remote_address,
     app=app,
     default_limits=["200 per day", "50 per hour", "5 per minute"],
-    storage_uri="memory://"
+    storage_uri=RATELIMIT_STORAGE_URI,
+    storage_options=storage_options
 )
 
 @app.route('/api/health', methods=['GET'])
@@ -32,6 +57,8 @@ def health_check():
 # For example:
 # from . import chatbot # Assuming chatbot.py defines routes on a Blueprint or directly on 'app' if imported 
 from . import chatbot  # This will register the chatbot routes
+from . import enrich  # Bulk icebreaker enrichment jobs (/api/enrich/jobs)
+from . import diagnostics  # Memory diagnostics (/api/diagnostics/memory, needs DIAGNOSTICS_TOKEN)
 
 # Handler for Vercel serverless functions
 # def handler(request):
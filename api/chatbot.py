@@ -1,16 +1,16 @@
 from flask import request, jsonify
-from flask_cors import CORS # For Cross-Origin Resource Sharing
-from flask_limiter import Limiter # For rate limiting
-from flask_limiter.util import get_remote_address # For rate limiting
 from api import app, limiter  # Import app and limiter from __init__.py
-from api.utils.grok import call_grok_api, extract_assistant_response  # Updated import
-from api.utils.n8n_handler import send_chat_lead_to_n8n # Import the new function
+from api.utils.response_cache import ResponseCache, is_context_free
+from api.utils.lead_stream import LeadMarkerParser
+from api.utils.ingest import parse_chat_request, PayloadRejected, rejection_stats
+from api.utils.tracing import span
+from api.utils.resilience import CIRCUIT_OPEN, OVERLOADED
+from api.utils.idempotency import IdempotencyStore, KeyReused, fingerprint, MAX_KEY_LENGTH
 # We will ignore the n8n import and related functions for now
 # from api.utils.n8n import send_lead_to_n8n, validate_lead_data 
 import json
 import logging # Added for logging
 import html # For input sanitization
-import re # For parsing lead details
 
 # Placeholder functions are now removed as we will use the actual utilities
 
@@ -18,106 +18,131 @@ import re # For parsing lead details
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# TODO: Configure CORS more restrictively for production
-# For now, allowing all origins for development ease.
-CORS(app) 
-
-# TODO: Configure rate limits appropriately for production.
-# This is a basic example.
-limiter = Limiter(
-    get_remote_address,
-    app=app,
-    default_limits=["200 per day", "50 per hour", "5 per minute"],
-    storage_uri="memory://",  # Use redis in production
-)
-
-# Helper function to validate conversation history
-def is_valid_conversation_history(history):
-    if not isinstance(history, list):
-        return False
-    for item in history:
-        if not isinstance(item, dict) or \
-           'role' not in item or not isinstance(item['role'], str) or \
-           'content' not in item or not isinstance(item['content'], str):
-            return False
-    return True
-
-def parse_lead_details(text: str) -> dict:
-    """Parses lead details from a string based on the [LEAD_INFO_COLLECTED] marker."""
-    details = {}
-    # Regex to find Key: Value pairs after the marker, allowing for multi-line messages
-    # It captures "Key" and "Value", where Value can span until the next Key or end of string.
-    # Using re.DOTALL so . matches newlines for the Message part.
-    match = re.search(r"FirstName: (.*?)(?:, Email: (.*?))?(?:, Message: (.*?))? Thanks,", text, re.DOTALL)
-    if match:
-        details["FirstName"] = match.group(1).strip() if match.group(1) else ""
-        details["Email"] = match.group(2).strip() if match.group(2) else ""
-        # The message is everything from its start to before " Thanks,"
-        # We need to be careful if Email is not present.
-        # A simpler approach for the message if the AI sticks to the format:
-        # Find "Message: " and take everything until " Thanks,"
-        message_match = re.search(r"Message: (.*?) Thanks,", text, re.DOTALL)
-        if message_match:
-            details["Message"] = message_match.group(1).strip()
-        else: # Fallback if Message part is tricky, or only FirstName/Email captured
-            details["Message"] = ""
-
-        # Ensure keys exist even if empty, matching n8n_handler expectations
-        if "FirstName" not in details: details["FirstName"] = ""
-        if "Email" not in details: details["Email"] = ""
-        if "Message" not in details: details["Message"] = "See conversation for details"
-
-    logger.info(f"Parsed lead details: {details}")
-    return details
+# CORS and rate limits (with their shared storage) are configured once in api/__init__.py
+
+# Cache of replies to first-turn questions (FAQ-style messages with no prior user turns)
+response_cache = ResponseCache.from_env()
+
+# Replies by Idempotency-Key, so a resent turn is answered (and its lead sent) once
+idempotency_store = IdempotencyStore.from_env()
+
+# Sent instead of an error while every LLM provider's circuit is open
+FALLBACK_REPLY = "Sorry, I'm having trouble thinking right now. Please try again in a minute, or leave your name and email and Reid will get back to you."
+# Seconds clients are asked to wait when the LLM providers are at capacity
+OVERLOAD_RETRY_AFTER = 5
+
+# The provider clients and n8n handler pull in `requests` and are only needed once a
+# chat turn arrives, so they are imported on first use to keep cold starts short.
+def call_chat_api(user_message, conversation_history):
+    from api.utils.llm import call_chat_api as _call_chat_api  # Routes across the configured LLM providers
+    return _call_chat_api(user_message, conversation_history)
+
+def extract_assistant_response(response):
+    from api.utils.providers import extract_assistant_response as _extract_assistant_response
+    return _extract_assistant_response(response)
+
+def send_chat_lead_to_n8n(lead_details):
+    from api.utils.n8n_handler import send_chat_lead_to_n8n as _send_chat_lead_to_n8n
+    return _send_chat_lead_to_n8n(lead_details)
 
 @app.route('/api/chatbot', methods=['POST'])
 @limiter.limit("5 per minute")  # Rate limiting to prevent abuse
 def chat():
     try:
-        data = request.get_json()
-    
-        if not data or 'message' not in data:
-            return jsonify({"error": "No message provided"}), 400
-            
-        user_message = data.get('message', '').strip()
-        conversation_history = data.get('conversation_history', [])
-
-        # Validate conversation history
-        if not is_valid_conversation_history(conversation_history):
-            return jsonify({"error": "Invalid conversation history format"}), 400
-            
-        # Call Grok API
-        response = call_grok_api(user_message, conversation_history)
-        
-        # Extract and process the response
-        assistant_response = extract_assistant_response(response)
-        
-        # Check for lead collection marker and handle accordingly
-        if '[LEAD_INFO_COLLECTED]' in assistant_response:
-            try:
-                # Extract lead information
-                lead_info = re.search(r'\[LEAD_INFO_COLLECTED\](.*?)(?=\n|$)', assistant_response)
-                if lead_info:
-                    # Remove the marker from the response
-                    assistant_response = assistant_response.replace(lead_info.group(0), '').strip()
-                    # Send lead to n8n
-                    send_chat_lead_to_n8n(lead_info.group(1))
-            except Exception as e:
-                logger.error(f"Error processing lead information: {e}")
-                # Continue with the response even if lead processing fails
-        
-        return jsonify({
-            "response": assistant_response,
-            "conversation_history": conversation_history + [
-                {"role": "user", "content": user_message},
-                {"role": "assistant", "content": assistant_response}
-            ]
-        })
-        
+        # Size-bounded parsing and validation of the message and history
+        try:
+            with span("validate"):
+                user_message, conversation_history = parse_chat_request(request)
+        except PayloadRejected as rejected:
+            return jsonify({"error": rejected.message}), rejected.status
+
+        key = request.headers.get('Idempotency-Key', '').strip()
+        if not key:
+            return _respond(run_turn(user_message, conversation_history))
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"}), 400
+
+        # Repeats of a turn (retries, double submits) share one upstream call and one lead
+        try:
+            entry, owner = idempotency_store.begin(key, fingerprint(user_message, conversation_history))
+        except KeyReused:
+            return jsonify({"error": "This Idempotency-Key was already used for a different message"}), 422
+        if not owner:
+            with span("idempotent_wait"):
+                result = idempotency_store.wait(entry)
+            if result is None:
+                return jsonify({"error": "A request with this Idempotency-Key is still in progress"}), 409, {"Retry-After": "1"}
+            return _respond(result, replayed=True)
+
+        result = ({"error": "An error occurred processing your request"}, 500, {})
+        try:
+            result = run_turn(user_message, conversation_history, key)
+        finally:
+            # Only real answers are replayed later; failures and the "try again" fallback are retried for real
+            idempotency_store.finish(key, entry, result, keep=result[1] == 200 and result[0].get("response") != FALLBACK_REPLY)
+        return _respond(result)
+
     except Exception as e:
         logger.error(f"Error in chat endpoint: {e}")
         return jsonify({"error": "An error occurred processing your request"}), 500
 
+def _respond(result, replayed=False):
+    body, status, headers = result
+    if replayed:
+        headers = {**headers, "Idempotent-Replayed": "true"}
+    return jsonify(body), status, headers
+
+def run_turn(user_message, conversation_history, idempotency_key=None):
+    """Answer one chat turn and dispatch any lead in it. Returns (body, status, headers)."""
+    # Context-free questions can be answered from the response cache
+    cacheable = is_context_free(conversation_history)
+    assistant_response = None
+    if cacheable:
+        with span("cache") as cache_span:
+            assistant_response = response_cache.get(user_message)
+            cache_span.set(hit=assistant_response is not None)
+
+    if assistant_response is None:
+        # Call the fastest healthy LLM provider (Grok first, DeepSeek as failover)
+        with span("llm"):
+            response = call_chat_api(user_message, conversation_history)
+
+        # Upstreams that are failing or saturated are not waited on
+        if response.get("unavailable") == OVERLOADED:
+            return {"error": "The assistant is busy right now, please try again shortly."}, 503, {"Retry-After": str(OVERLOAD_RETRY_AFTER)}
+        if response.get("unavailable") == CIRCUIT_OPEN:
+            assistant_response = FALLBACK_REPLY
+        else:
+            # Extract and process the response
+            assistant_response = extract_assistant_response(response)
+
+        # Only successful replies are cached; the cache itself refuses lead markers
+        if cacheable and response.get("choices"):
+            response_cache.put(user_message, assistant_response)
+
+    # Strip the lead marker line and parse it into a lead record
+    with span("lead"):
+        lead_parser = LeadMarkerParser()
+        assistant_response = (lead_parser.feed(assistant_response) + lead_parser.close()).strip()
+    if lead_parser.lead and (idempotency_key is None or idempotency_store.claim_lead(idempotency_key)):
+        sent = False
+        try:
+            sent = send_chat_lead_to_n8n(lead_parser.lead)
+        except Exception as e:
+            logger.error(f"Error processing lead information: {e}")
+            # Continue with the response even if lead processing fails
+        if not sent and idempotency_key is not None:
+            # Let a retry of this turn send the lead
+            idempotency_store.release_lead(idempotency_key)
+
+    return {
+        "response": assistant_response,
+        "conversation_history": conversation_history + [
+            {"role": "user", "content": user_message},
+            {"role": "assistant", "content": assistant_response}
+        ]
+    }, 200, {}
+
 @app.route('/api/chatbot/greeting', methods=['GET'])
 @limiter.limit("30 per minute") # Apply a slightly more relaxed limit for greetings
 def chatbot_greeting():
@@ -126,6 +151,31 @@ def chatbot_greeting():
     logger.info(f"Sending greeting: {greeting}")
     return jsonify({"greeting": greeting})
 
+@app.route('/api/chatbot/cache-stats', methods=['GET'])
+@limiter.limit("30 per minute")
+def chatbot_cache_stats():
+    """Return hit-rate metrics for the first-turn response cache."""
+    return jsonify(response_cache.stats())
+
+@app.route('/api/chatbot/ingest-stats', methods=['GET'])
+@limiter.limit("30 per minute")
+def chatbot_ingest_stats():
+    """Return counters for chat payloads rejected by the ingestion limits."""
+    return jsonify(rejection_stats())
+
+@app.route('/api/chatbot/upstream-stats', methods=['GET'])
+@limiter.limit("30 per minute")
+def chatbot_upstream_stats():
+    """Return latency, circuit-breaker and concurrency state for each upstream, and per-tier routing latency."""
+    from api.utils.llm import chat_router
+    from api.utils.model_tiers import tier_stats
+    from api.utils.n8n_handler import n8n_breaker, n8n_bulkhead, lead_outbox
+    return jsonify({
+        "llm": chat_router.snapshot(),
+        "tiers": tier_stats.snapshot(),
+        "n8n": {"circuit": n8n_breaker.snapshot(), "concurrency": n8n_bulkhead.snapshot(), "outbox": lead_outbox().stats()},
+    })
+
 # api/__init__.py already imports this module (chatbot)
 # Example: from . import chatbot
 # This will be handled in a subsequent step. 
\ No newline at end of file
@@ -0,0 +1,94 @@
+import os
+import hmac
+from functools import wraps
+
+from flask import request, jsonify
+
+from api import app, limiter
+from api.utils.diagnostics import MemoryTracker, process_memory, DEFAULT_TOP
+from api.utils.rate_limit_storage import BoundedMemoryStorage, PreallocatingStorage
+
+# Memory reports expose allocation sites, so they are only served with a bearer
+# token. Without DIAGNOSTICS_TOKEN the endpoints answer 404.
+DIAGNOSTICS_TOKEN = os.environ.get('DIAGNOSTICS_TOKEN')
+# Frames per allocation to trace from boot; unset or 0 waits for the first snapshot request
+DIAGNOSTICS_TRACEMALLOC = int(os.environ.get('DIAGNOSTICS_TRACEMALLOC', 0))
+
+memory_tracker = MemoryTracker(frames=max(1, DIAGNOSTICS_TRACEMALLOC))
+if DIAGNOSTICS_TRACEMALLOC:
+    memory_tracker.start()
+
+
+def require_diagnostics_token(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not DIAGNOSTICS_TOKEN:
+            return jsonify({"error": "Not found"}), 404
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied.encode(), DIAGNOSTICS_TOKEN.encode()):
+            return jsonify({"error": "Unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def rate_limit_store_stats():
+    if not limiter.enabled:
+        return {"enabled": False}
+    storage = limiter.storage
+    stats = {"enabled": True, "scheme": type(storage).__name__}
+    if isinstance(storage, BoundedMemoryStorage):
+        stats.update(keys=storage.key_count, max_keys=storage.max_keys, evictions=storage.evictions)
+    elif isinstance(storage, PreallocatingStorage):
+        stats.update(local_leases=len(storage._leases), round_trips=storage.round_trips)
+    elif hasattr(storage, "expirations"):
+        stats.update(keys=len(storage.expirations) + len(getattr(storage, "events", {})), max_keys=None)
+    return stats
+
+
+def store_sizes():
+    """Entry counts of the in-process stores that grow with traffic."""
+    from api.chatbot import response_cache, idempotency_store
+    from api.enrich import job_manager
+    return {
+        "rate_limit": rate_limit_store_stats(),
+        "response_cache": {**response_cache.stats(), "max_entries": response_cache.max_entries},
+        "idempotency": idempotency_store.stats(),
+        "enrichment_jobs": job_manager.stats(),
+    }
+
+
+@app.route('/api/diagnostics/memory', methods=['GET'])
+@limiter.limit("30 per minute")
+@require_diagnostics_token
+def memory_report():
+    """Process RSS, gc counters, store sizes and tracemalloc state."""
+    return jsonify({
+        "process": process_memory(),
+        "stores": store_sizes(),
+        "tracemalloc": memory_tracker.status(),
+    })
+
+
+@app.route('/api/diagnostics/memory/snapshot', methods=['POST'])
+@limiter.limit("10 per minute")
+@require_diagnostics_token
+def memory_snapshot():
+    """
+    Take a tracemalloc snapshot (starting tracing if it is off) and return the
+    top allocation sites and the growth since the previous snapshot.
+    Query: top (default 25), group_by (lineno, filename or traceback).
+    """
+    try:
+        top = min(max(int(request.args.get('top', DEFAULT_TOP)), 1), 200)
+        report = memory_tracker.snapshot(top=top, group_by=request.args.get('group_by', 'lineno'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({**report, "process": process_memory()})
+
+
+@app.route('/api/diagnostics/memory/snapshot', methods=['DELETE'])
+@require_diagnostics_token
+def stop_memory_tracing():
+    """Stop tracemalloc and drop the saved snapshot."""
+    memory_tracker.stop()
+    return jsonify(memory_tracker.status())
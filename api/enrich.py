@@ -0,0 +1,113 @@
+import os
+import hmac
+import logging
+from functools import wraps
+
+from flask import request, jsonify, Response
+from werkzeug.utils import secure_filename
+
+from api import app, limiter
+from api.utils.enrichment import JobManager, InvalidLeadFile, TooManyJobs, JobsUnavailable, parse_lead_csv, MAX_UPLOAD_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Bulk enrichment spends API credits, so it is only served with a bearer token.
+# Without ENRICH_API_TOKEN the endpoints answer 404.
+ENRICH_API_TOKEN = os.environ.get('ENRICH_API_TOKEN')
+
+job_manager = JobManager()
+
+
+def require_enrich_token(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ENRICH_API_TOKEN:
+            return jsonify({"error": "Not found"}), 404
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied.encode(), ENRICH_API_TOKEN.encode()):
+            return jsonify({"error": "Unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _job_or_404(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return None, (jsonify({"error": "Job not found"}), 404)
+    return job, None
+
+
+@app.route('/api/enrich/jobs', methods=['POST'])
+@limiter.limit("10 per hour")
+@require_enrich_token
+def create_enrichment_job():
+    """Upload a lead CSV (multipart field `file`, or a raw text/csv body) and queue it for enrichment."""
+    if request.content_length is not None and request.content_length > MAX_UPLOAD_BYTES:
+        return jsonify({"error": "Upload too large"}), 413
+
+    upload = request.files.get('file')
+    if upload is not None:
+        data = upload.stream.read(MAX_UPLOAD_BYTES + 1)
+        filename = secure_filename(upload.filename or "") or "upload.csv"
+    else:
+        data = request.stream.read(MAX_UPLOAD_BYTES + 1)
+        filename = secure_filename(request.args.get('filename', "")) or "upload.csv"
+    if len(data) > MAX_UPLOAD_BYTES:
+        return jsonify({"error": "Upload too large"}), 413
+
+    try:
+        fieldnames, rows = parse_lead_csv(data)
+    except InvalidLeadFile as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        job = job_manager.submit(filename, fieldnames, rows)
+    except TooManyJobs as e:
+        return jsonify({"error": str(e)}), 429
+    except JobsUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({
+        **job.to_dict(),
+        "status_url": f"/api/enrich/jobs/{job.id}",
+        "results_url": f"/api/enrich/jobs/{job.id}/results",
+    }), 202
+
+
+@app.route('/api/enrich/jobs/<job_id>', methods=['GET'])
+@limiter.limit("120 per minute")
+@require_enrich_token
+def enrichment_job_status(job_id):
+    """Per-row progress of an enrichment job."""
+    job, error = _job_or_404(job_id)
+    return error or jsonify(job.to_dict())
+
+
+@app.route('/api/enrich/jobs/<job_id>', methods=['DELETE'])
+@limiter.limit("30 per minute")
+@require_enrich_token
+def cancel_enrichment_job(job_id):
+    """Stop an enrichment job after the row in progress; rows already produced stay downloadable."""
+    job, error = _job_or_404(job_id)
+    if error:
+        return error
+    job.cancel()
+    return jsonify(job.to_dict()), 202
+
+
+@app.route('/api/enrich/jobs/<job_id>/results', methods=['GET'])
+@limiter.limit("30 per minute")
+@require_enrich_token
+def enrichment_job_results(job_id):
+    """Stream the enriched CSV. Rows are sent as they are produced; the response ends when the job does."""
+    job, error = _job_or_404(job_id)
+    if error:
+        return error
+    download_name = job.filename.rsplit('.', 1)[0] + "_with_icebreakers.csv"
+    return Response(
+        job.stream_csv(),
+        mimetype='text/csv',
+        headers={
+            "Content-Disposition": f'attachment; filename="{download_name}"',
+            "X-Accel-Buffering": "no",  # keep proxies from holding the stream back
+        },
+    )
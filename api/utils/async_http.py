@@ -0,0 +1,106 @@
+"""
+Shared asyncio HTTP transport for the async LLM and n8n clients.
+
+With httpx installed, every coroutine on an event loop shares one
+httpx.AsyncClient for that loop. That client is a keep-alive connection pool
+capped at ASYNC_HTTP_MAX_CONNECTIONS, so concurrent calls do not each open a
+connection, and a cancelled call closes its connection straight away.
+`aclose()` shuts the current loop's pool down, e.g. on app shutdown.
+
+Without httpx, each POST runs `requests.post` on the loop's default executor.
+The async API behaves the same, but cancelling a call only abandons the
+blocking request rather than closing its connection.
+
+Responses come back whatever their status; network failures raise
+TransportTimeout or TransportError.
+"""
+
+import os
+import json
+import asyncio
+import logging
+import weakref
+from functools import partial
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_CONNECTIONS = int(os.environ.get('ASYNC_HTTP_MAX_CONNECTIONS', 64))
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('ASYNC_HTTP_MAX_KEEPALIVE', 16))
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+
+class TransportError(Exception):
+    """The request did not get an HTTP response (connection refused, reset, DNS...)."""
+
+
+class TransportTimeout(TransportError):
+    """No response within the timeout."""
+
+
+class AsyncResponse:
+    __slots__ = ('status_code', 'text')
+
+    def __init__(self, status_code: int, text: str):
+        self.status_code = status_code
+        self.text = text
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+def _httpx():
+    try:
+        import httpx
+    except ImportError:
+        return None
+    return httpx
+
+
+def _client(httpx):
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS)
+        client = _clients[loop] = httpx.AsyncClient(limits=limits)
+    return client
+
+
+async def post_json(url: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None,
+                    timeout: float = 30.0) -> AsyncResponse:
+    """POST `payload` as JSON on the current loop's shared pool."""
+    httpx = _httpx()
+    if httpx is None:
+        return await _post_in_executor(url, payload, headers, timeout)
+    try:
+        response = await _client(httpx).post(url, json=payload, headers=headers, timeout=timeout)
+    except httpx.TimeoutException as e:
+        raise TransportTimeout(str(e) or "timed out") from e
+    except httpx.TransportError as e:
+        raise TransportError(str(e)) from e
+    return AsyncResponse(response.status_code, response.text)
+
+
+async def _post_in_executor(url, payload, headers, timeout) -> AsyncResponse:
+    import requests  # only needed for the fallback
+
+    loop = asyncio.get_running_loop()
+    try:
+        response = await loop.run_in_executor(None, partial(requests.post, url, json=payload, headers=headers, timeout=timeout))
+    except requests.exceptions.Timeout as e:
+        raise TransportTimeout(str(e)) from e
+    except requests.exceptions.RequestException as e:
+        raise TransportError(str(e)) from e
+    return AsyncResponse(response.status_code, response.text)
+
+
+async def aclose() -> None:
+    """Close the current event loop's connection pool."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,304 @@
+"""
+Record/replay of outbound HTTP calls ("cassettes").
+
+Every upstream client in the repo (the chat providers behind call_grok_api and
+call_deepseek_api, the n8n webhook in send_chat_lead_to_n8n and the enrichers'
+_call_grok_api) calls ``requests.post`` through the ``requests`` module, and
+their asyncio versions call ``async_http.post_json`` through that module, so a
+cassette patches those two attributes for the duration of a ``with`` block:
+
+    with Cassette("cassettes/chat.jsonl", mode="record"):
+        call_grok_api("What does Fluxstream do?")
+
+    with Cassette("cassettes/chat.jsonl", mode="replay", speed=10):
+        call_grok_api("What does Fluxstream do?")   # no network, 1/10 of the latency
+
+A cassette is a JSON Lines file with one interaction per line: the request
+(URL, headers, JSON body), the response (status, headers, body) or the
+exception raised, and the time it took. Authorization-style headers and the
+values of secret-looking environment variables (*_KEY, *_TOKEN, *_SECRET,
+*_PASSWORD, *_WEBHOOK_URL) are replaced by placeholders before anything is
+written, and the same scrubbing is applied to live requests before they are
+matched in replay.
+
+Both paths share one cassette format, so a run recorded with the blocking
+clients replays through the async ones and vice versa. A replay miss raises
+CassetteMiss, which is both a requests ConnectionError and an
+async_http.TransportError, so it never falls through to the network.
+
+Replay matches on method, URL and body; when nothing matches exactly (the
+prompt changed, say) the next unused interaction for the same URL is served,
+unless ``strict=True``. Each reply is delayed by its recorded duration divided
+by ``speed`` (``speed=0`` replies immediately).
+
+scripts/cassette.py runs any script (the API, load test or enrichers) under a
+cassette.
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from api.utils import async_http
+
+logger = logging.getLogger(__name__)
+
+RECORD = "record"
+REPLAY = "replay"
+# Replay when the cassette exists, record it otherwise
+ONCE = "once"
+MODES = (RECORD, REPLAY, ONCE)
+
+REDACTED = "<redacted>"
+SECRET_HEADERS = frozenset({"authorization", "proxy-authorization", "x-api-key", "api-key", "cookie", "set-cookie"})
+SECRET_ENV_RE = re.compile(r"(KEY|TOKEN|SECRET|PASSWORD|WEBHOOK_URL)$")
+# Shorter values are too likely to occur by chance in prompts and replies
+MIN_SECRET_LENGTH = 8
+
+ERRORS = {
+    "Timeout": requests.exceptions.Timeout,
+    "ReadTimeout": requests.exceptions.ReadTimeout,
+    "ConnectTimeout": requests.exceptions.ConnectTimeout,
+    "ConnectionError": requests.exceptions.ConnectionError,
+    # Recorded through async_http
+    "TransportTimeout": requests.exceptions.Timeout,
+    "TransportError": requests.exceptions.ConnectionError,
+}
+
+
+class CassetteMiss(requests.exceptions.ConnectionError, async_http.TransportError):
+    """No recorded interaction matches a request made during replay."""
+
+
+def _async_error(error_type: str) -> type:
+    return async_http.TransportTimeout if "Timeout" in error_type else async_http.TransportError
+
+
+def secret_values(environ=None) -> Dict[str, str]:
+    """Secret env values mapped to their placeholders, longest first so nested values scrub cleanly."""
+    environ = os.environ if environ is None else environ
+    secrets = {value: f"<{name}>" for name, value in environ.items()
+               if SECRET_ENV_RE.search(name) and value and len(value) >= MIN_SECRET_LENGTH}
+    return dict(sorted(secrets.items(), key=lambda item: len(item[0]), reverse=True))
+
+
+def _scrub_text(text: str, secrets: Dict[str, str]) -> str:
+    for value, placeholder in secrets.items():
+        if value in text:
+            text = text.replace(value, placeholder)
+    return text
+
+
+def _scrub(value: Any, secrets: Dict[str, str]) -> Any:
+    if isinstance(value, str):
+        return _scrub_text(value, secrets)
+    if isinstance(value, dict):
+        return {k: _scrub(v, secrets) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_scrub(v, secrets) for v in value]
+    return value
+
+
+def _scrub_headers(headers: Optional[Dict[str, str]], secrets: Dict[str, str]) -> Dict[str, str]:
+    return {k: REDACTED if k.lower() in SECRET_HEADERS else _scrub_text(str(v), secrets) for k, v in (headers or {}).items()}
+
+
+def _fingerprint(method: str, url: str, body: Any) -> str:
+    canonical = json.dumps([method, url, body], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def _build_response(url: str, recorded: Dict[str, Any]) -> requests.Response:
+    response = requests.Response()
+    response.status_code = recorded["status"]
+    response.reason = recorded.get("reason", "")
+    response.headers.update(recorded.get("headers", {}))
+    response._content = recorded.get("body", "").encode("utf-8")
+    response.encoding = "utf-8"
+    response.url = url
+    return response
+
+
+class Cassette:
+    """Context manager that records or replays every ``requests.post`` and ``async_http.post_json`` made inside it."""
+
+    def __init__(self, path, mode: str = REPLAY, speed: float = 1.0, strict: bool = False):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}; expected one of {', '.join(MODES)}")
+        self.path = str(path)
+        if mode == ONCE:
+            mode = REPLAY if os.path.exists(self.path) else RECORD
+        self.mode = mode
+        self.speed = speed
+        self.strict = strict
+        self.interactions: List[Dict[str, Any]] = []
+        self.hits = 0
+        self.fallbacks = 0
+        self.misses = 0
+        self._used: set = set()
+        self._lock = threading.Lock()
+        self._secrets: Dict[str, str] = {}
+        self._original_post = None
+        self._original_post_json = None
+        self._out = None
+        self._started = 0.0
+
+    def __enter__(self) -> "Cassette":
+        self._secrets = secret_values()
+        if self.mode == REPLAY:
+            with open(self.path, encoding="utf-8") as src:
+                self.interactions = [json.loads(line) for line in src if line.strip()]
+        else:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._out = open(self.path, "w", encoding="utf-8")
+        self._started = time.monotonic()
+        self._original_post = requests.post
+        self._original_post_json = async_http.post_json
+        requests.post = self._post
+        async_http.post_json = self._post_json
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        requests.post = self._original_post
+        async_http.post_json = self._original_post_json
+        if self._out:
+            self._out.close()
+            self._out = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "path": self.path,
+                "mode": self.mode,
+                "interactions": len(self.interactions),
+                "hits": self.hits,
+                "fallbacks": self.fallbacks,
+                "misses": self.misses,
+            }
+
+    def _request_key(self, url: str, kwargs: Dict[str, Any]):
+        scrubbed_url = _scrub_text(url, self._secrets)
+        body = _scrub(kwargs.get("json", kwargs.get("data")), self._secrets)
+        return scrubbed_url, body, _fingerprint("POST", scrubbed_url, body)
+
+    def _post(self, url, data=None, json=None, **kwargs):
+        kwargs.update(data=data, json=json)
+        if self.mode == RECORD:
+            return self._record(url, kwargs)
+        return self._replay(url, kwargs)
+
+    async def _post_json(self, url, payload, headers=None, timeout=30.0):
+        kwargs = {"json": payload, "headers": headers}
+        if self.mode == RECORD:
+            return await self._record_async(url, payload, headers, timeout)
+        entry = self._replay_entry(url, kwargs)
+        if self.speed > 0:
+            await asyncio.sleep(entry.get("elapsed", 0.0) / self.speed)
+        if "error" in entry:
+            raise _async_error(entry["error"]["type"])(entry["error"]["message"])
+        return async_http.AsyncResponse(entry["response"]["status"], entry["response"].get("body", ""))
+
+    def _new_entry(self, url: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        scrubbed_url, body, key = self._request_key(url, kwargs)
+        return {
+            "key": key,
+            "offset": round(time.monotonic() - self._started, 4),
+            "request": {
+                "method": "POST",
+                "url": scrubbed_url,
+                "headers": _scrub_headers(kwargs.get("headers"), self._secrets),
+                "body": body,
+            },
+        }
+
+    def _record_error(self, entry: Dict[str, Any], started: float, error: Exception) -> None:
+        entry["elapsed"] = round(time.monotonic() - started, 4)
+        entry["error"] = {"type": type(error).__name__, "message": _scrub_text(str(error), self._secrets)}
+        self._write(entry)
+
+    def _record_response(self, entry: Dict[str, Any], started: float, status: int, reason: str,
+                         headers: Dict[str, str], text: str) -> None:
+        entry["elapsed"] = round(time.monotonic() - started, 4)
+        entry["response"] = {
+            "status": status,
+            "reason": reason,
+            "headers": _scrub_headers({k: v for k, v in headers.items() if k.lower() != "set-cookie"}, self._secrets),
+            "body": _scrub_text(text, self._secrets),
+        }
+        self._write(entry)
+
+    def _record(self, url: str, kwargs: Dict[str, Any]):
+        entry = self._new_entry(url, kwargs)
+        started = time.monotonic()
+        try:
+            response = self._original_post(url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            self._record_error(entry, started, e)
+            raise
+        self._record_response(entry, started, response.status_code, response.reason, response.headers, response.text)
+        return response
+
+    async def _record_async(self, url: str, payload, headers, timeout):
+        entry = self._new_entry(url, {"json": payload, "headers": headers})
+        started = time.monotonic()
+        try:
+            response = await self._original_post_json(url, payload, headers, timeout=timeout)
+        except async_http.TransportError as e:
+            self._record_error(entry, started, e)
+            raise
+        # AsyncResponse carries no headers or reason
+        self._record_response(entry, started, response.status_code, "", {}, response.text)
+        return response
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self.interactions.append(entry)
+            # One line per interaction, flushed, so a crashed run keeps what it recorded
+            self._out.write(line + "\n")
+            self._out.flush()
+
+    def _claim(self, url: str, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            fallback = None
+            for index, entry in enumerate(self.interactions):
+                if index in self._used:
+                    continue
+                if entry["key"] == key:
+                    self._used.add(index)
+                    self.hits += 1
+                    return entry
+                if fallback is None and not self.strict and entry["request"]["url"] == url:
+                    fallback = index
+            if fallback is not None:
+                self._used.add(fallback)
+                self.fallbacks += 1
+                return self.interactions[fallback]
+            self.misses += 1
+            return None
+
+    def _replay_entry(self, url: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        scrubbed_url, _, key = self._request_key(url, kwargs)
+        entry = self._claim(scrubbed_url, key)
+        if entry is None:
+            raise CassetteMiss(f"No recorded interaction for POST {scrubbed_url} in {self.path}")
+        return entry
+
+    def _replay(self, url: str, kwargs: Dict[str, Any]):
+        entry = self._replay_entry(url, kwargs)
+        if self.speed > 0:
+            time.sleep(entry.get("elapsed", 0.0) / self.speed)
+        if "error" in entry:
+            error = entry["error"]
+            raise ERRORS.get(error["type"], requests.exceptions.RequestException)(error["message"])
+        return _build_response(url, entry["response"])
@@ -1,9 +1,22 @@
 import os
-import requests
 from typing import Dict, List, Any, Optional
 
+import requests  # noqa: F401 - kept so tests can patch api.utils.deepseek.requests.post
+
+from api.utils.providers import Provider, build_messages, extract_assistant_response
+from api.utils.lead_stream import LEAD_MARKER, split_lead_marker
+
 DEEPSEEK_API_KEY = os.environ.get('DEEPSEEK_API_KEY')
-DEEPSEEK_API_URL = 'https://api.deepseek.com/v1/chat/completions'  # Confirmed via docs, task details use /v1/
+DEEPSEEK_API_URL = os.environ.get('DEEPSEEK_API_URL', 'https://api.deepseek.com/v1/chat/completions')  # Confirmed via docs, task details use /v1/
+
+DEEPSEEK_PROVIDER = Provider(
+    name="deepseek",
+    display_name="DeepSeek",
+    api_url=DEEPSEEK_API_URL,
+    api_key_env='DEEPSEEK_API_KEY',
+    model="deepseek-chat",
+    max_tokens=800  # Increased from 500 to allow for more detailed responses
+)
 
 def create_system_prompt() -> str:
     """Create the system prompt defining the chatbot's persona and guidelines."""
@@ -109,128 +122,32 @@ def call_deepseek_api(
     retrieved_context: Optional[str] = None
 ) -> Dict[str, Any]:
     """Call the DeepSeek API with the user message and conversation history."""
-    if not DEEPSEEK_API_KEY:
+    if not DEEPSEEK_PROVIDER.configured:
         print("Error: DEEPSEEK_API_KEY not found in environment variables.")
         return {"error": "API key not configured."}
 
-    if conversation_history is None:
-        conversation_history = []
-        
-    # Prepare the messages array with system prompt and conversation history
-    messages = [
-        {"role": "system", "content": create_system_prompt()}
-    ]
-    
-    # Add conversation history
-    messages.extend(conversation_history)
-    
-    # Add the current user message, with retrieved context if available
-    contextual_user_message = user_message
-    if retrieved_context:
-        contextual_user_message = f"Based on the following information:\n\"{retrieved_context}\"\n\nPlease answer this user's question: \"{user_message}\""
-    
-    messages.append({"role": "user", "content": contextual_user_message})
-    
-    # Prepare the API request
-    headers = {
-        "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "model": "deepseek-chat",
-        "messages": messages,
-        "temperature": 0.7,
-        "max_tokens": 800  # Increased from 500 to allow for more detailed responses
-    }
-    
-    try:
-        response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=45)  # Increased timeout
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.HTTPError as http_err:
-        print(f"HTTP error occurred: {http_err} - {response.text}")
-        return {"error": f"HTTP error: {response.status_code} - {response.text}"}
-    except requests.exceptions.Timeout as timeout_err:
-        print(f"Timeout error occurred: {timeout_err}")
-        return {"error": "Request to DeepSeek API timed out."}
-    except requests.exceptions.RequestException as e:
-        print(f"Error calling DeepSeek API: {e}")
-        return {"error": str(e)}
+    messages = build_messages(create_system_prompt(), user_message, conversation_history, retrieved_context)
+    return DEEPSEEK_PROVIDER.complete(messages)
 
-def extract_assistant_response(api_response: Dict[str, Any]) -> Optional[str]:
-    """Extract the assistant's response from the API response."""
-    if api_response is None:
-        print("Error extracting response: API response was None.")
-        return "Error: Received no response from the AI."
+async def call_deepseek_api_async(
+    user_message: str,
+    conversation_history: List[Dict[str, str]] = None,
+    retrieved_context: Optional[str] = None,
+    deadline: Optional[float] = None
+) -> Dict[str, Any]:
+    """call_deepseek_api() for asyncio callers; `deadline` bounds the call in seconds."""
+    if not DEEPSEEK_PROVIDER.configured:
+        print("Error: DEEPSEEK_API_KEY not found in environment variables.")
+        return {"error": "API key not configured."}
 
-    if "error" in api_response:
-        return f"API Error: {api_response['error']}"
-        
-    try:
-        return api_response["choices"][0]["message"]["content"]
-    except (KeyError, IndexError, TypeError) as e:
-        print(f"Error extracting response: {e}. API Response: {api_response}")
-        return "Error: Could not extract a valid response from the AI."
+    messages = build_messages(create_system_prompt(), user_message, conversation_history, retrieved_context)
+    return await DEEPSEEK_PROVIDER.complete_async(messages, deadline=deadline)
 
 def extract_lead_info(response: str) -> Optional[Dict[str, str]]:
     """
     Extract lead information from a response containing the [LEAD_INFO_COLLECTED] marker.
     Returns a dictionary with the extracted information or None if the marker is not found.
     """
-    if not response or "[LEAD_INFO_COLLECTED]" not in response:
+    if not response or LEAD_MARKER not in response:
         return None
-    
-    try:
-        # Find the line with the marker
-        lines = response.split('\n')
-        marker_line = ""
-        for line in lines:
-            if "[LEAD_INFO_COLLECTED]" in line:
-                marker_line = line.strip()
-                break
-        
-        if not marker_line:
-            return None
-            
-        # Extract the information after the marker
-        info_part = marker_line.split("[LEAD_INFO_COLLECTED]")[1].strip()
-        
-        # Parse the fields
-        lead_info = {}
-        fields = ["FirstName", "LastName", "Email", "Phone", "Message"]
-        
-        # Start with an empty accumulator for the current field value
-        current_field = None
-        accumulated_value = ""
-        
-        # Split the info part by commas, but be careful with the Message field which might contain commas
-        parts = info_part.split(', ')
-        
-        for i, part in enumerate(parts):
-            # For the first few fields (before Message)
-            if i < len(parts) - 1 and any(f"{field}:" in part for field in fields[:-1]):
-                if current_field:
-                    lead_info[current_field] = accumulated_value.strip()
-                
-                field_name, field_value = part.split(':', 1)
-                current_field = field_name.strip()
-                accumulated_value = field_value.strip()
-            # For the Message field (which may contain commas)
-            elif "Message:" in part or current_field == "Message":
-                if "Message:" in part and current_field != "Message":
-                    if current_field:
-                        lead_info[current_field] = accumulated_value.strip()
-                    current_field = "Message"
-                    accumulated_value = part.split('Message:', 1)[1].strip()
-                else:
-                    accumulated_value += ", " + part
-        
-        # Add the last field
-        if current_field:
-            lead_info[current_field] = accumulated_value.strip()
-            
-        return lead_info
-    except Exception as e:
-        print(f"Error extracting lead info: {e}")
-        return None 
\ No newline at end of file
+    return split_lead_marker(response)[1]
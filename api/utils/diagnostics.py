@@ -0,0 +1,128 @@
+"""
+Memory diagnostics for a long-running API worker.
+
+`process_memory()` reports the worker's current and peak RSS and the garbage
+collector's state. `MemoryTracker` wraps tracemalloc: each `snapshot()`
+returns the top allocation sites and the growth since the previous snapshot,
+so two calls some minutes apart show what is accumulating. Only the latest
+snapshot is kept.
+
+tracemalloc only sees allocations made after it starts, and slows allocation
+while running. Start it at boot with DIAGNOSTICS_TRACEMALLOC=<frames> to
+account for everything, or on demand with the first snapshot request to
+watch growth from that point on.
+"""
+
+import gc
+import os
+import sys
+import threading
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Stack frames kept per allocation (more frames, more overhead)
+DEFAULT_FRAMES = 1
+DEFAULT_TOP = 25
+GROUPINGS = ("lineno", "filename", "traceback")
+
+# Allocations made by the diagnostics themselves are left out of reports
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _mb(size: float) -> float:
+    return round(size / (1024 * 1024), 2)
+
+
+def process_memory() -> Dict[str, Any]:
+    """Current and peak resident set size in MB, plus gc counters."""
+    memory: Dict[str, Any] = {"rss_mb": None, "peak_rss_mb": None}
+    try:
+        with open("/proc/self/statm") as statm:
+            memory["rss_mb"] = _mb(int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE"))
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        memory["peak_rss_mb"] = _mb(peak if sys.platform == "darwin" else peak * 1024)
+    memory["gc"] = {
+        "counts": list(gc.get_count()),
+        "collections": [generation["collections"] for generation in gc.get_stats()],
+        "uncollectable": sum(generation["uncollectable"] for generation in gc.get_stats()),
+    }
+    return memory
+
+
+def _stat(stat, group_by: str) -> Dict[str, Any]:
+    frames = stat.traceback.format() if group_by == "traceback" else [str(stat.traceback[0])]
+    entry = {"where": frames if group_by == "traceback" else frames[0], "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+    if hasattr(stat, "size_diff"):
+        entry["size_diff_kb"] = round(stat.size_diff / 1024, 1)
+        entry["count_diff"] = stat.count_diff
+    return entry
+
+
+class MemoryTracker:
+    """Start/stop tracemalloc and compare consecutive snapshots."""
+
+    def __init__(self, frames: int = DEFAULT_FRAMES):
+        self.frames = frames
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop(self) -> None:
+        with self._lock:
+            self._previous = None
+        tracemalloc.stop()
+
+    def status(self) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            return {"tracing": False}
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": True,
+            "frames": tracemalloc.get_traceback_limit(),
+            "traced_mb": _mb(current),
+            "peak_traced_mb": _mb(peak),
+            "overhead_mb": _mb(tracemalloc.get_tracemalloc_memory()),
+            "baseline": self._previous is not None,
+        }
+
+    def snapshot(self, top: int = DEFAULT_TOP, group_by: str = "lineno") -> Dict[str, Any]:
+        """
+        Take a snapshot (starting tracemalloc if needed) and report the largest
+        allocation sites and, when there is an earlier snapshot, the biggest growth.
+        """
+        if group_by not in GROUPINGS:
+            raise ValueError(f"group_by must be one of {', '.join(GROUPINGS)}")
+        self.start()
+        current = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+        with self._lock:
+            previous, self._previous = self._previous, current
+
+        report: Dict[str, Any] = {**self.status(), "top": [_stat(s, group_by) for s in current.statistics(group_by)[:top]]}
+        if previous is None:
+            report["diff"] = None
+        else:
+            growth: List = current.compare_to(previous, group_by)
+            report["diff"] = [_stat(s, group_by) for s in growth[:top]]
+            report["total_diff_kb"] = round(sum(s.size_diff for s in growth) / 1024, 1)
+        return report
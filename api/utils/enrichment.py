@@ -0,0 +1,289 @@
+"""
+Background jobs that add icebreakers to an uploaded lead CSV.
+
+This is the same pipeline as icebreakers/lead_enricher.py (same prompt, same
+required columns, rows that already have an icebreaker are kept), run on a
+small worker pool owned by the API process. Rows are enriched in order and
+each finished row is published immediately, so status polling sees per-row
+progress and the results download can stream rows as they are produced.
+Calls go through GROK_BATCH_PROVIDER, which shares only the quota broker with
+the chat provider, so a failing job cannot open the chat circuit breaker.
+
+Jobs and their worker pool live in one long-running process: a status poll or
+download served by another process would not find the job, and a serverless
+invocation ends before the pool does. Submitting is therefore refused on
+Vercel and when gunicorn runs more than one worker (API_WORKER_PROCESSES, set
+by gunicorn.conf.py); run the API with WEB_CONCURRENCY=1 to use these jobs.
+"""
+
+import io
+import os
+import csv
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Any, Iterator, Optional
+
+from api.utils.icebreaker_prompt import create_basic_prompt
+
+logger = logging.getLogger(__name__)
+
+COMPANY_COLUMN = 'employment_history/0/organization_name'
+HEADLINE_COLUMN = 'headline'
+ICEBREAKER_COLUMN = 'icebreaker'
+REQUIRED_COLUMNS = (HEADLINE_COLUMN, COMPANY_COLUMN)
+FAILED_ICEBREAKER = "Could not generate icebreaker"
+
+# Limits and pacing, overridable through the environment
+MAX_UPLOAD_BYTES = int(os.environ.get('ENRICH_MAX_UPLOAD_BYTES', 5 * 1024 * 1024))
+MAX_ROWS = int(os.environ.get('ENRICH_MAX_ROWS', 5000))
+WORKERS = int(os.environ.get('ENRICH_WORKERS', 2))
+ROW_DELAY_SECONDS = float(os.environ.get('ENRICH_ROW_DELAY', 1.0))  # be nice to the API, as the CLI does
+MAX_RETAINED_JOBS = int(os.environ.get('ENRICH_MAX_JOBS', 50))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class InvalidLeadFile(ValueError):
+    """The uploaded CSV cannot be enriched (bad encoding, missing columns, too many rows)."""
+
+
+class TooManyJobs(RuntimeError):
+    """Every retained job slot is taken by a job that has not finished yet."""
+
+
+class JobsUnavailable(RuntimeError):
+    """This deployment cannot keep a job's state and worker pool in one process."""
+
+
+def unsupported_deployment() -> Optional[str]:
+    """Why enrichment jobs cannot run in this deployment, or None if they can."""
+    if os.environ.get('VERCEL'):
+        return "Enrichment jobs need a long-running server and are not available on serverless deployments"
+    processes = int(os.environ.get('API_WORKER_PROCESSES', 1))
+    if processes > 1:
+        return f"Enrichment jobs need a single API worker process (running {processes}); set WEB_CONCURRENCY=1"
+    return None
+
+
+def build_icebreaker_prompt(company_name: str, headline: str) -> str:
+    """The icebreaker prompt used by icebreakers/lead_enricher.py."""
+    return create_basic_prompt(company_name or "Unknown Company", headline or "Professional")
+
+
+def generate_icebreaker(company_name: str, headline: str) -> str:
+    """Ask Grok for one icebreaker. Returns FAILED_ICEBREAKER on any API error."""
+    from api.utils.grok import GROK_BATCH_PROVIDER  # pulls in requests; only needed once a job runs
+
+    prompt = build_icebreaker_prompt(company_name, headline)
+    # Batch priority: live chat turns take precedence for the shared API quota
+    response = GROK_BATCH_PROVIDER.complete([{"role": "user", "content": prompt}], priority="batch")
+    if "error" in response:
+        logger.warning(f"Icebreaker API error for {company_name}: {response['error']}")
+        return FAILED_ICEBREAKER
+    try:
+        return response["choices"][0]["message"]["content"].strip()
+    except (KeyError, IndexError, TypeError, AttributeError) as e:
+        logger.warning(f"Unexpected icebreaker response for {company_name}: {e}")
+        return FAILED_ICEBREAKER
+
+
+def parse_lead_csv(data: bytes, max_rows: int = MAX_ROWS):
+    """Decode an uploaded CSV into (fieldnames, rows). Raises InvalidLeadFile."""
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise InvalidLeadFile("CSV must be UTF-8 encoded")
+
+    reader = csv.DictReader(io.StringIO(text, newline=''))
+    fieldnames = list(reader.fieldnames or [])
+    missing = [col for col in REQUIRED_COLUMNS if col not in fieldnames]
+    if missing:
+        raise InvalidLeadFile(f"Missing required columns: {missing}")
+
+    rows = []
+    for row in reader:
+        if len(rows) >= max_rows:
+            raise InvalidLeadFile(f"CSV has more than {max_rows} rows")
+        rows.append(row)
+    if not rows:
+        raise InvalidLeadFile("CSV has no rows")
+
+    if ICEBREAKER_COLUMN not in fieldnames:
+        fieldnames.append(ICEBREAKER_COLUMN)
+    return fieldnames, rows
+
+
+class EnrichmentJob:
+    """One uploaded file and its progress. Finished rows are appended to `results` in input order."""
+
+    def __init__(self, job_id: str, filename: str, fieldnames: List[str], rows: List[Dict[str, str]]):
+        self.id = job_id
+        self.filename = filename
+        self.fieldnames = fieldnames
+        self.rows = rows
+        self.results: List[Dict[str, str]] = []
+        self.status = QUEUED
+        self.generated = 0
+        self.skipped = 0
+        self.failed = 0
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._cancel = threading.Event()
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def publish(self, row: Dict[str, str]) -> None:
+        with self._changed:
+            self.results.append(row)
+            self._changed.notify_all()
+
+    def finish(self, status: str, error: Optional[str] = None) -> None:
+        with self._changed:
+            self.status = status
+            self.error = error
+            self.finished_at = time.time()
+            self._changed.notify_all()
+
+    def wait_for_rows(self, start: int, timeout: float) -> List[Dict[str, str]]:
+        """Rows from index `start` on, waiting up to `timeout` seconds for at least one unless the job has finished."""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.results) > start or self.finished, timeout=timeout)
+            return self.results[start:]
+
+    def stream_csv(self, poll_timeout: float = 15.0) -> Iterator[str]:
+        """CSV text of the results, yielded row by row as they are produced, until the job finishes."""
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=self.fieldnames, extrasaction='ignore')
+
+        def take() -> str:
+            text = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return text
+
+        writer.writeheader()
+        yield take()
+        sent = 0
+        while True:
+            rows = self.wait_for_rows(sent, poll_timeout)
+            for row in rows:
+                writer.writerow(row)
+            sent += len(rows)
+            if rows:
+                yield take()
+            if self.finished and sent >= len(self.results):
+                return
+
+    def to_dict(self) -> Dict[str, Any]:
+        total = len(self.rows)
+        processed = len(self.results)
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "total": total,
+            "processed": processed,
+            "progress": round(processed / total, 4) if total else 1.0,
+            "generated": self.generated,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Runs enrichment jobs on a background thread pool, outside the request threads."""
+
+    def __init__(
+        self,
+        workers: int = WORKERS,
+        row_delay: float = ROW_DELAY_SECONDS,
+        max_jobs: int = MAX_RETAINED_JOBS,
+        generate: Callable[[str, str], str] = generate_icebreaker
+    ):
+        self.workers = workers
+        self.row_delay = row_delay
+        self.max_jobs = max_jobs
+        self._generate = generate
+        self._jobs: Dict[str, EnrichmentJob] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def submit(self, filename: str, fieldnames: List[str], rows: List[Dict[str, str]]) -> EnrichmentJob:
+        reason = unsupported_deployment()
+        if reason:
+            raise JobsUnavailable(reason)
+        job = EnrichmentJob(os.urandom(8).hex(), filename, fieldnames, rows)
+        with self._lock:
+            self._evict_finished()
+            if len(self._jobs) >= self.max_jobs:
+                raise TooManyJobs(f"{len(self._jobs)} enrichment jobs are still queued or running")
+            self._jobs[job.id] = job
+            if self._executor is None:
+                # Created on first use so importing the API does not start threads
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="enrich")
+            self._executor.submit(self._run, job)
+        logger.info(f"Queued enrichment job {job.id} ({len(rows)} rows from {filename})")
+        return job
+
+    def get(self, job_id: str) -> Optional[EnrichmentJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        """Retained jobs by status, and the rows they hold in memory."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        stats = {"jobs": len(jobs), "max_jobs": self.max_jobs, "rows": sum(len(job.rows) for job in jobs)}
+        for job in jobs:
+            stats[job.status] = stats.get(job.status, 0) + 1
+        return stats
+
+    def _evict_finished(self) -> None:
+        # Caller holds the lock; the oldest finished jobs go first
+        finished = sorted((job for job in self._jobs.values() if job.finished), key=lambda job: job.created_at)
+        while len(self._jobs) >= self.max_jobs and finished:
+            del self._jobs[finished.pop(0).id]
+
+    def _run(self, job: EnrichmentJob) -> None:
+        job.status = RUNNING
+        try:
+            for row in job.rows:
+                if job._cancel.is_set():
+                    job.finish(CANCELLED)
+                    return
+
+                row = dict(row)
+                if (row.get(ICEBREAKER_COLUMN) or "").strip():
+                    job.skipped += 1
+                else:
+                    icebreaker = self._generate(row.get(COMPANY_COLUMN, ""), row.get(HEADLINE_COLUMN, ""))
+                    row[ICEBREAKER_COLUMN] = icebreaker
+                    if icebreaker == FAILED_ICEBREAKER:
+                        job.failed += 1
+                    else:
+                        job.generated += 1
+                    if self.row_delay:
+                        job._cancel.wait(self.row_delay)  # paced like the CLI, but wakes up on cancel
+                job.publish(row)
+            job.finish(DONE)
+            logger.info(f"Enrichment job {job.id} finished: {job.generated} generated, {job.failed} failed, {job.skipped} skipped")
+        except Exception as e:
+            logger.error(f"Enrichment job {job.id} failed: {e}")
+            job.finish(FAILED, str(e))
@@ -0,0 +1,34 @@
+"""
+The icebreaker prompt shared by the enrichment API (api/utils/enrichment.py)
+and the enricher CLIs (icebreakers/lead_enricher.py, lead_enricher_single.py).
+
+Standard library only: the CLIs load this file by path, so they do not need
+the API's dependencies installed.
+"""
+
+
+def create_basic_prompt(company_name: str, headline: str) -> str:
+    """
+    The original (v1) icebreaker prompt: short, casual and company-focused.
+    
+    Args:
+        company_name (str): The company name
+        headline (str): The person's headline/title
+        
+    Returns:
+        str: The prompt to send to Grok
+    """
+    return f'''You are "Flux", an expert AI sales assistant. Your task is to generate a short, casual, one-sentence icebreaker to start a professional outreach email.
+
+**Rules:**
+- The icebreaker must be a single sentence.
+- It should sound natural and human, not like a robot.
+- It should be based on the provided company name and headline.
+- DO NOT use generic phrases like "I was impressed by," "I came across your profile," or "Hope you're having a great day."
+- Be complimentary and specific where possible. If the headline is generic, focus on the company.
+
+**Lead's Information:**
+- Company Name: "{company_name}"
+- Headline: "{headline}"
+
+**Generated Icebreaker:**'''
@@ -0,0 +1,167 @@
+"""
+Idempotency keys for chat turns.
+
+A client that may send the same turn twice (a retry after a dropped
+connection, a double submit) sets an `Idempotency-Key` header. The first
+request with a key runs the turn. Identical requests arriving while it runs
+wait for it and get its response, and for `ttl` seconds afterwards a
+successful response is replayed from memory instead of calling the LLM
+again. A key reused with a different message or history is refused.
+
+Responses that are not worth replaying (errors, "busy, try again", the
+fallback reply sent while the LLM circuit is open) are handed
+to the requests already waiting and then dropped, so a later retry runs the
+turn again. Leads are tracked separately and for longer (`lead_ttl`), so a
+lead is dispatched at most once per key even if the turn itself is re-run; a
+claim whose dispatch failed is released so the retry sends it.
+
+Like the response cache, the store is per process; both the key count and the
+lead record are capped.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_TTL_SECONDS = 600
+DEFAULT_LEAD_TTL_SECONDS = 24 * 3600
+DEFAULT_MAX_KEYS = 10000
+# Longest wait for an identical in-flight request before answering 409
+DEFAULT_WAIT_SECONDS = 60.0
+MAX_KEY_LENGTH = 255
+
+Result = Tuple[Dict[str, Any], int, Dict[str, str]]
+
+
+def fingerprint(*parts: Any) -> str:
+    """Stable digest of a request's content, compared when a key is reused."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class KeyReused(Exception):
+    """The idempotency key was already used for a request with different content."""
+
+
+class _Entry:
+    __slots__ = ('fingerprint', 'done', 'result', 'expires_at')
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.result: Optional[Result] = None
+        self.expires_at = float("inf")  # set once the result is stored
+
+
+class IdempotencyStore:
+    """In-flight coalescing and short-lived replay of responses by idempotency key."""
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TTL_SECONDS,
+        lead_ttl: float = DEFAULT_LEAD_TTL_SECONDS,
+        max_keys: int = DEFAULT_MAX_KEYS,
+        clock=time.monotonic
+    ):
+        self.ttl = ttl
+        self.lead_ttl = lead_ttl
+        self.max_keys = max_keys
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._leads: "OrderedDict[str, float]" = OrderedDict()
+        # (expires_at, key, entry) for stored results, in finish order and so in expiry order
+        self._expiry: deque = deque()
+        self._lock = threading.Lock()
+        self._stats = {"runs": 0, "coalesced": 0, "replayed": 0, "reused": 0, "leads_suppressed": 0, "evictions": 0}
+
+    @classmethod
+    def from_env(cls) -> "IdempotencyStore":
+        """Build a store configured from IDEMPOTENCY_* environment variables."""
+        return cls(
+            ttl=float(os.environ.get('IDEMPOTENCY_TTL', DEFAULT_TTL_SECONDS)),
+            lead_ttl=float(os.environ.get('IDEMPOTENCY_LEAD_TTL', DEFAULT_LEAD_TTL_SECONDS)),
+            max_keys=int(os.environ.get('IDEMPOTENCY_MAX_KEYS', DEFAULT_MAX_KEYS)),
+        )
+
+    def begin(self, key: str, request_fingerprint: str) -> Tuple[_Entry, bool]:
+        """
+        Register a request. Returns (entry, True) when the caller should run it
+        and then call finish(), or (entry, False) when an identical request ran
+        or is running; wait() for its result then. Raises KeyReused on a mismatch.
+        """
+        now = self._clock()
+        with self._lock:
+            self._purge(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.fingerprint != request_fingerprint:
+                    self._stats["reused"] += 1
+                    raise KeyReused(key)
+                self._stats["replayed" if entry.done.is_set() else "coalesced"] += 1
+                return entry, False
+            entry = self._entries[key] = _Entry(request_fingerprint)
+            self._stats["runs"] += 1
+            self._evict(self._entries, self.max_keys)
+            return entry, True
+
+    def wait(self, entry: _Entry, timeout: float = DEFAULT_WAIT_SECONDS) -> Optional[Result]:
+        """The result of the request that owns `entry`, or None if it is still running after `timeout`."""
+        return entry.result if entry.done.wait(timeout) else None
+
+    def finish(self, key: str, entry: _Entry, result: Result, keep: bool) -> None:
+        """Hand the result to waiting duplicates; keep it for replay only if `keep`."""
+        entry.result = result
+        with self._lock:
+            if keep:
+                entry.expires_at = self._clock() + self.ttl
+                self._expiry.append((entry.expires_at, key, entry))
+            elif self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.done.set()
+
+    def claim_lead(self, key: str) -> bool:
+        """
+        True the first time a lead is dispatched for `key` (within lead_ttl), False after that.
+        Call release_lead() if the dispatch then fails, so a retry can send it.
+        """
+        now = self._clock()
+        with self._lock:
+            expires_at = self._leads.get(key)
+            if expires_at is not None and expires_at > now:
+                self._stats["leads_suppressed"] += 1
+                return False
+            self._leads.pop(key, None)
+            self._leads[key] = now + self.lead_ttl
+            self._evict(self._leads, self.max_keys)
+            return True
+
+    def release_lead(self, key: str) -> None:
+        """Undo claim_lead() after a failed dispatch."""
+        with self._lock:
+            self._leads.pop(key, None)
+
+    def _purge(self, now: float) -> None:
+        # Caller holds the lock. In-flight entries never expire; they are only evicted by the cap.
+        while self._expiry and self._expiry[0][0] <= now:
+            _, key, entry = self._expiry.popleft()
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        while self._leads and next(iter(self._leads.values())) <= now:
+            self._leads.popitem(last=False)
+
+    def _evict(self, entries: OrderedDict, limit: int) -> None:
+        # Caller holds the lock; the oldest keys go first
+        while len(entries) > limit:
+            entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["keys"] = len(self._entries)
+            stats["leads"] = len(self._leads)
+            stats["max_keys"] = self.max_keys
+        return stats
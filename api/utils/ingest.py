@@ -0,0 +1,91 @@
+import os
+import logging
+import threading
+from collections import Counter
+from typing import Dict, List, Any, Tuple
+
+from api.utils import fastjson
+
+logger = logging.getLogger(__name__)
+
+# Limits for /api/chatbot payloads, overridable through the environment
+MAX_BODY_BYTES = int(os.environ.get('CHAT_MAX_BODY_BYTES', 64 * 1024))
+MAX_MESSAGE_CHARS = int(os.environ.get('CHAT_MAX_MESSAGE_CHARS', 2000))
+MAX_HISTORY_ITEMS = int(os.environ.get('CHAT_MAX_HISTORY_ITEMS', 40))
+MAX_HISTORY_ITEM_CHARS = int(os.environ.get('CHAT_MAX_HISTORY_ITEM_CHARS', 4000))
+
+_rejections = Counter()
+_rejections_lock = threading.Lock()
+
+
+class PayloadRejected(Exception):
+    """A chat request that failed the ingestion checks. `reason` is the counter name."""
+
+    def __init__(self, reason: str, message: str, status: int = 400):
+        super().__init__(message)
+        self.reason = reason
+        self.message = message
+        self.status = status
+
+
+def _reject(reason: str, message: str, status: int = 400) -> PayloadRejected:
+    with _rejections_lock:
+        _rejections[reason] += 1
+    logger.warning(f"Rejected chat payload ({reason}): {message}")
+    return PayloadRejected(reason, message, status)
+
+
+def read_body(request, max_bytes: int = MAX_BODY_BYTES) -> bytes:
+    """Read the raw request body, refusing anything over `max_bytes` before it is buffered."""
+    if request.content_length is not None and request.content_length > max_bytes:
+        raise _reject("body_too_large", "Request body too large", 413)
+
+    # Content-Length can be absent (chunked uploads), so cap the read as well
+    body = request.stream.read(max_bytes + 1)
+    if len(body) > max_bytes:
+        raise _reject("body_too_large", "Request body too large", 413)
+    return body
+
+
+def parse_chat_request(request) -> Tuple[str, List[Dict[str, str]]]:
+    """
+    Validate a /api/chatbot request and return (user_message, conversation_history).
+    Raises PayloadRejected with the HTTP status to answer with.
+    """
+    body = read_body(request)
+    try:
+        data = fastjson.loads(body) if body else None
+    except ValueError:
+        raise _reject("invalid_json", "Invalid JSON body")
+
+    if not isinstance(data, dict) or 'message' not in data:
+        raise _reject("missing_message", "No message provided")
+
+    user_message = data.get('message')
+    if not isinstance(user_message, str):
+        raise _reject("missing_message", "No message provided")
+    if len(user_message) > MAX_MESSAGE_CHARS:
+        raise _reject("message_too_long", f"Message exceeds {MAX_MESSAGE_CHARS} characters", 413)
+
+    conversation_history = data.get('conversation_history', [])
+    if not isinstance(conversation_history, list):
+        raise _reject("invalid_history", "Invalid conversation history format")
+    if len(conversation_history) > MAX_HISTORY_ITEMS:
+        raise _reject("history_too_long", f"Conversation history exceeds {MAX_HISTORY_ITEMS} messages", 413)
+
+    for item in conversation_history:
+        if not isinstance(item, dict) or \
+           not isinstance(item.get('role'), str) or \
+           not isinstance(item.get('content'), str):
+            raise _reject("invalid_history", "Invalid conversation history format")
+        if len(item['content']) > MAX_HISTORY_ITEM_CHARS or len(item['role']) > 32:
+            raise _reject("history_item_too_large", "Conversation history item too large", 413)
+
+    return user_message.strip(), conversation_history
+
+
+def rejection_stats() -> Dict[str, Any]:
+    """Counts of rejected payloads by reason since the process started."""
+    with _rejections_lock:
+        counts = dict(_rejections)
+    return {"rejected_total": sum(counts.values()), "rejected_by_reason": counts}
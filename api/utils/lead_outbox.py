@@ -0,0 +1,122 @@
+"""
+Durable outbox for chat leads that could not be delivered to n8n.
+
+A lead is a customer's contact request, so it is never shed: when the n8n
+webhook is at capacity, its circuit is open or the POST fails, the lead is
+written to a local SQLite file (N8N_LEAD_OUTBOX) and retried with exponential
+back-off by a background thread in api/utils/n8n_handler.py. Every worker on
+the host shares the file; a worker claims due leads for `CLAIM_LEASE_SECONDS`
+before sending them, so two workers never retry the same lead at once.
+
+A lead that still fails after `max_attempts` tries is kept in the file,
+marked dead, for manual replay; nothing is deleted until n8n accepts it.
+
+Leads are identified in logs by a random reference, never by their contents.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from typing import Any, Dict, List, Tuple
+
+DEFAULT_PATH = "/tmp/fluxstreams-lead-outbox.db"
+DEFAULT_MAX_ATTEMPTS = 20
+# First retry after this long, doubling per attempt up to MAX_RETRY_DELAY_SECONDS
+BASE_RETRY_DELAY_SECONDS = 30.0
+MAX_RETRY_DELAY_SECONDS = 1800.0
+# A claimed lead is offered to other workers again if not settled within this time
+CLAIM_LEASE_SECONDS = 120.0
+
+
+def new_lead_ref() -> str:
+    """Opaque identifier for a lead in logs (no name, email or message)."""
+    return uuid.uuid4().hex[:12]
+
+
+class LeadOutbox:
+    """SQLite-backed queue of undelivered leads, shared by the workers on one host."""
+
+    def __init__(self, path: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS, clock=time.time):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._clock = clock
+        # One connection per process, serialized by a lock (sqlite3 connections are not
+        # safe for concurrent use, and a connection per thread/greenlet is wasteful)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    @classmethod
+    def from_env(cls) -> "LeadOutbox":
+        return cls(
+            os.environ.get('N8N_LEAD_OUTBOX', DEFAULT_PATH),
+            max_attempts=int(os.environ.get('N8N_LEAD_OUTBOX_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)),
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # Caller holds the lock
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leads (ref TEXT PRIMARY KEY, payload TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL, "
+                "dead INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL)"
+            )
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def add(self, ref: str, payload: Dict[str, Any], attempts: int = 1) -> None:
+        """Queue a lead whose first `attempts` deliveries failed; raises sqlite3.Error if it cannot be stored."""
+        now = self._clock()
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR IGNORE INTO leads (ref, payload, attempts, next_attempt, created) VALUES (?, ?, ?, ?, ?)",
+                (ref, json.dumps(payload), attempts, now + self._delay(attempts), now),
+            )
+
+    def claim_due(self, limit: int = 10) -> List[Tuple[str, Dict[str, Any], int]]:
+        """Leads due for a retry as (ref, payload, attempts so far), leased to this worker."""
+        now = self._clock()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT ref, payload, attempts FROM leads WHERE dead = 0 AND next_attempt <= ? "
+                    "ORDER BY next_attempt LIMIT ?", (now, limit)
+                ).fetchall()
+                conn.executemany("UPDATE leads SET next_attempt = ? WHERE ref = ?",
+                                 [(now + CLAIM_LEASE_SECONDS, ref) for ref, _, _ in rows])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return [(ref, json.loads(payload), attempts) for ref, payload, attempts in rows]
+
+    def delivered(self, ref: str) -> None:
+        with self._lock:
+            self._connection().execute("DELETE FROM leads WHERE ref = ?", (ref,))
+
+    def retry_failed(self, ref: str, attempts: int) -> bool:
+        """Reschedule a lead after its `attempts`-th failed delivery; False once it is marked dead."""
+        dead = attempts >= self.max_attempts
+        with self._lock:
+            self._connection().execute(
+                "UPDATE leads SET attempts = ?, next_attempt = ?, dead = ? WHERE ref = ?",
+                (attempts, self._clock() + self._delay(attempts), int(dead), ref),
+            )
+        return not dead
+
+    def _delay(self, attempts: int) -> float:
+        return min(BASE_RETRY_DELAY_SECONDS * 2 ** max(attempts - 1, 0), MAX_RETRY_DELAY_SECONDS)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending, dead = self._connection().execute(
+                "SELECT COALESCE(SUM(dead = 0), 0), COALESCE(SUM(dead = 1), 0) FROM leads"
+            ).fetchone()
+        return {"pending": pending, "dead": dead}
@@ -0,0 +1,104 @@
+import re
+from typing import Dict, Optional
+
+LEAD_MARKER = '[LEAD_INFO_COLLECTED]'
+LEAD_FIELDS = ("FirstName", "LastName", "Email", "Phone", "Message")
+
+# "Field:" labels in the marker line. Message is last and may itself contain commas.
+_FIELD_LABEL = re.compile(r"(?:^|,)\s*(FirstName|LastName|Email|Phone|Message)\s*:")
+
+
+def parse_lead_fields(text: str) -> Dict[str, str]:
+    """
+    Parse the text after the marker, e.g.
+    "FirstName: Jane, LastName: N/A, Email: jane@example.com, Phone: N/A, Message: Hi, call me"
+    into a record with every LEAD_FIELDS key present. "N/A" values become "".
+    """
+    lead = {field: "" for field in LEAD_FIELDS}
+    labels = []
+    for match in _FIELD_LABEL.finditer(text):
+        labels.append(match)
+        if match.group(1) == "Message":
+            break
+
+    for i, match in enumerate(labels):
+        end = labels[i + 1].start() if i + 1 < len(labels) else len(text)
+        value = text[match.end():end].strip().strip(',').strip()
+        if value.upper() != "N/A" and not lead[match.group(1)]:
+            lead[match.group(1)] = value
+    return lead
+
+
+def _marker_prefix_len(text: str) -> int:
+    """Length of the longest suffix of `text` that could be the start of the marker."""
+    for size in range(min(len(text), len(LEAD_MARKER) - 1), 0, -1):
+        if LEAD_MARKER.startswith(text[-size:]):
+            return size
+    return 0
+
+
+class LeadMarkerParser:
+    """
+    Incremental filter for assistant replies that may contain the lead marker.
+
+    feed() takes chunks as they arrive and returns the text that can be shown to
+    the user right away. Everything from the marker to the end of its line is
+    removed, and the first such line is parsed into `lead`. Only a possible
+    partial marker (at most len(LEAD_MARKER) - 1 characters) or the marker line
+    itself is held back, so the work per chunk does not grow with the reply.
+    """
+
+    def __init__(self):
+        self.lead: Optional[Dict[str, str]] = None
+        self._pending = ""       # possible start of a marker, not yet emitted
+        self._capturing = False  # inside a marker line
+        self._captured = ""      # marker line text after the marker
+
+    def feed(self, chunk: str) -> str:
+        output = []
+        while chunk:
+            if self._capturing:
+                newline = chunk.find('\n')
+                if newline == -1:
+                    self._captured += chunk
+                    return "".join(output)
+                self._captured += chunk[:newline]
+                self._finish_line()
+                chunk = chunk[newline + 1:]
+                continue
+
+            text = self._pending + chunk
+            self._pending = ""
+            index = text.find(LEAD_MARKER)
+            if index != -1:
+                output.append(text[:index])
+                self._capturing = True
+                self._captured = ""
+                chunk = text[index + len(LEAD_MARKER):]
+                continue
+
+            held = _marker_prefix_len(text)
+            output.append(text[:len(text) - held])
+            self._pending = text[len(text) - held:]
+            chunk = ""
+        return "".join(output)
+
+    def close(self) -> str:
+        """Flush held-back text at the end of the stream."""
+        if self._capturing:
+            self._finish_line()
+        remainder, self._pending = self._pending, ""
+        return remainder
+
+    def _finish_line(self) -> None:
+        if self.lead is None:
+            self.lead = parse_lead_fields(self._captured)
+        self._capturing = False
+        self._captured = ""
+
+
+def split_lead_marker(response: str):
+    """Convenience wrapper for a complete reply: returns (visible text, lead or None)."""
+    parser = LeadMarkerParser()
+    visible = parser.feed(response or "") + parser.close()
+    return visible, parser.lead
@@ -0,0 +1,84 @@
+import os
+import time
+import logging
+from typing import Dict, List, Any, Optional
+
+from api.utils.providers import ProviderRouter, build_messages
+from api.utils.grok import GROK_PROVIDER, create_system_prompt
+from api.utils.deepseek import DEEPSEEK_PROVIDER
+from api.utils.model_tiers import classify_turn, tier_stats, TIER_MAX_TOKENS, MAIN
+from api.utils.retrieval import retrieve_context
+from api.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Chat replies are kept short regardless of which backend answers; quick turns
+# routed to the fast tier get an even smaller budget
+CHAT_MAX_TOKENS = TIER_MAX_TOKENS[MAIN]
+
+PROVIDERS = {
+    GROK_PROVIDER.name: GROK_PROVIDER,
+    DEEPSEEK_PROVIDER.name: DEEPSEEK_PROVIDER,
+}
+
+
+def _build_router() -> ProviderRouter:
+    """Build the chat router from LLM_PROVIDERS (priority order) and LLM_HEDGE."""
+    names = [n.strip() for n in os.environ.get('LLM_PROVIDERS', 'grok,deepseek').split(',') if n.strip()]
+    unknown = [n for n in names if n not in PROVIDERS]
+    if unknown:
+        logger.warning(f"Ignoring unknown LLM providers: {unknown}")
+
+    return ProviderRouter(
+        [PROVIDERS[n] for n in names if n in PROVIDERS],
+        hedge=os.environ.get('LLM_HEDGE', '').lower() in ('1', 'true', 'yes'),
+        hedge_min_delay=float(os.environ.get('LLM_HEDGE_MIN_DELAY', 1.0)),
+    )
+
+
+chat_router = _build_router()
+
+
+def call_chat_api(
+    user_message: str,
+    conversation_history: List[Dict[str, str]] = None,
+    retrieved_context: Optional[str] = None
+) -> Dict[str, Any]:
+    """Answer a chat turn with the Flux persona on the fastest healthy provider, using the model tier the turn needs."""
+    tier, reason, messages = _prepare_turn(user_message, conversation_history, retrieved_context)
+
+    started = time.monotonic()
+    result = chat_router.complete(messages, max_tokens=TIER_MAX_TOKENS[tier], tier=tier)
+    _record_turn(tier, reason, started, result)
+    return result
+
+
+async def call_chat_api_async(
+    user_message: str,
+    conversation_history: List[Dict[str, str]] = None,
+    retrieved_context: Optional[str] = None,
+    deadline: Optional[float] = None
+) -> Dict[str, Any]:
+    """call_chat_api() for asyncio callers; `deadline` bounds the turn, failovers included, in seconds."""
+    tier, reason, messages = _prepare_turn(user_message, conversation_history, retrieved_context)
+
+    started = time.monotonic()
+    result = await chat_router.complete_async(messages, deadline=deadline, max_tokens=TIER_MAX_TOKENS[tier], tier=tier)
+    _record_turn(tier, reason, started, result)
+    return result
+
+
+def _prepare_turn(user_message, conversation_history, retrieved_context):
+    tier, reason = classify_turn(user_message, conversation_history)
+    if retrieved_context is None:
+        # Only the knowledge passages relevant to this turn are sent, not the whole company brief
+        with span("retrieve"):
+            retrieved_context = retrieve_context(user_message, conversation_history)
+    messages = build_messages(create_system_prompt(), user_message, conversation_history, retrieved_context)
+    return tier, reason, messages
+
+
+def _record_turn(tier, reason, started, result) -> None:
+    latency = time.monotonic() - started
+    tier_stats.record(tier, reason, latency, "error" not in result)
+    logger.info(f"Chat turn routed to {tier} tier ({reason}): {latency * 1000:.0f} ms, ok={'error' not in result}")
@@ -0,0 +1,114 @@
+"""
+Picks a model tier for each chat turn with cheap local heuristics.
+
+Short acknowledgements ("thanks!", "ok cool") and form-filling turns during
+lead capture (a name, an email or phone number, a reply to "what's your
+email?") go to the fast tier: a smaller, quicker model with a lower
+max_tokens. Everything else stays on the main model, including the reply to
+the lead confirmation summary ("Just to confirm: ... Does that all look
+correct?"), which must carry the full [LEAD_INFO_COLLECTED] line.
+"""
+
+import os
+import re
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from api.utils.providers import ProviderStats
+
+logger = logging.getLogger(__name__)
+
+MAIN = "main"
+FAST = "fast"
+
+TIERED_ROUTING = os.environ.get('LLM_TIERED_ROUTING', '1') != '0'
+TIER_MAX_TOKENS = {
+    MAIN: 250,
+    FAST: int(os.environ.get('LLM_FAST_MAX_TOKENS', 120)),
+}
+
+# Turns this long or longer always go to the main model
+MAX_FAST_WORDS = 12
+
+# A turn made only of these words is an acknowledgement ("ok cool thanks", "got it, bye")
+ACKNOWLEDGEMENT_WORDS = {
+    "thanks", "thank", "you", "thx", "ty", "ok", "okay", "k", "cool", "great", "nice", "awesome",
+    "perfect", "sounds", "good", "got", "it", "yes", "yep", "yeah", "sure", "no", "nope", "bye",
+    "goodbye", "cheers", "hi", "hello", "hey", "a", "lot", "much", "so", "that's", "thats", "all",
+    "will", "do", "lol", "haha", "alright", "appreciate", "it's", "fine",
+}
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+PHONE_RE = re.compile(r"\+?\d[\d\s().-]{6,}\d")
+# The assistant is collecting contact details when its last turn asked for them
+CONTACT_REQUEST_RE = re.compile(r"\b(your )?(name|e-?mail|phone|number|reach you)\b", re.IGNORECASE)
+# The assistant's summary of a collected lead; the next turn emits the lead marker
+CONFIRMATION_SUMMARY_RE = re.compile(r"\bjust to confirm\b|\blooks? correct\b", re.IGNORECASE)
+QUESTION_WORDS_RE = re.compile(r"^(what|how|why|when|where|who|which|can|could|do|does|is|are|should|would|tell|explain)\b", re.IGNORECASE)
+
+
+def _normalize(message: str) -> str:
+    return " ".join(re.sub(r"[^\w\s'@.+-]", " ", message.lower()).split())
+
+
+def _last_assistant_message(history: Optional[List[Dict[str, str]]]) -> str:
+    for item in reversed(history or []):
+        if item.get('role') == 'assistant':
+            return item.get('content') or ""
+    return ""
+
+
+def classify_turn(user_message: str, history: Optional[List[Dict[str, str]]] = None) -> Tuple[str, str]:
+    """Return (tier, reason) for a chat turn."""
+    if not TIERED_ROUTING:
+        return MAIN, "tiering disabled"
+
+    normalized = _normalize(user_message)
+    words = normalized.split()
+    if not words or len(words) >= MAX_FAST_WORDS:
+        return MAIN, "long message"
+    if "?" in user_message or QUESTION_WORDS_RE.match(normalized):
+        return MAIN, "question"
+
+    last_reply = _last_assistant_message(history)
+    if CONFIRMATION_SUMMARY_RE.search(last_reply):
+        return MAIN, "lead confirmation"
+
+    if all(word.strip(".") in ACKNOWLEDGEMENT_WORDS for word in words):
+        return FAST, "acknowledgement"
+    if EMAIL_RE.search(user_message) or PHONE_RE.search(user_message):
+        return FAST, "contact details"
+
+    if "?" in last_reply and CONTACT_REQUEST_RE.search(last_reply.rsplit("?", 1)[0][-200:]):
+        return FAST, "answering a contact-details question"
+
+    return MAIN, "open-ended"
+
+
+class TierStats:
+    """Rolling latency and error profile per tier, for the routing log and stats endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {MAIN: ProviderStats(), FAST: ProviderStats()}
+        self._reasons: Dict[str, int] = {}
+
+    def record(self, tier: str, reason: str, latency: float, ok: bool) -> None:
+        self._stats[tier].record(latency, ok)
+        with self._lock:
+            self._reasons[reason] = self._reasons.get(reason, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            reasons = dict(self._reasons)
+        snapshot = {}
+        for tier, stats in self._stats.items():
+            tier_stats = stats.snapshot()
+            tier_stats.pop("healthy")
+            snapshot[tier] = tier_stats
+        snapshot["reasons"] = reasons
+        return snapshot
+
+
+tier_stats = TierStats()
@@ -1,27 +1,150 @@
 import requests
 import os
+import time
+import sqlite3
+import asyncio
 import logging
+import threading
+from typing import Optional
+
+from api.utils import async_http
+from api.utils.tracing import span
+from api.utils.resilience import CircuitBreaker, Bulkhead
+from api.utils.lead_outbox import LeadOutbox, new_lead_ref
 
 logger = logging.getLogger(__name__)
 
 # IMPORTANT: You'll set this environment variable with the new webhook URL from n8n
 N8N_CHAT_LEAD_WEBHOOK_URL = os.environ.get('N8N_CHAT_LEAD_WEBHOOK_URL') 
 
+# Fail fast while n8n is down and cap concurrent webhook calls, so a degraded
+# n8n cannot hold chat requests for the full 15 s timeout each
+n8n_breaker = CircuitBreaker("n8n", failure_threshold=3, reset_timeout=60.0)
+n8n_bulkhead = Bulkhead("n8n", int(os.environ.get('N8N_MAX_CONCURRENCY', 8)))
+
+# Leads are never shed: undelivered ones wait in the outbox, checked this often
+RETRY_POLL_SECONDS = float(os.environ.get('N8N_LEAD_RETRY_POLL', 15))
+_outbox: Optional[LeadOutbox] = None
+_outbox_lock = threading.Lock()
+_retrier_pid = None
+
 def send_chat_lead_to_n8n(lead_details: dict):
     """
     Sends collected lead details to the n8n workflow for AI Chat Leads.
+    A lead that cannot be delivered right now (n8n at capacity, circuit open,
+    POST failed) is queued in the lead outbox and retried in the background.
     Args:
         lead_details (dict): A dictionary containing lead information. 
                              Expected keys: "FirstName", "Email", "Message".
                              Optional: "LastName", "Phone", "InquiryType".
+    Returns:
+        bool: True once the lead is delivered or safely queued for retry.
+    """
+    if not N8N_CHAT_LEAD_WEBHOOK_URL:
+        logger.error("N8N_CHAT_LEAD_WEBHOOK_URL is not set in environment variables. Cannot send chat lead.")
+        return False
+
+    _start_retrier()
+    payload = _lead_payload(lead_details)
+    ref = new_lead_ref()
+    if _deliver(payload, ref):
+        return True
+    return _queue(payload, ref)
+
+async def send_chat_lead_to_n8n_async(lead_details: dict, deadline: Optional[float] = None) -> bool:
+    """
+    send_chat_lead_to_n8n() for asyncio callers, on the shared connection pool
+    (api/utils/async_http.py). `deadline` (seconds) shortens the 15 s webhook timeout;
+    a cancelled send frees its slot without counting against the n8n circuit, and
+    its lead is queued for retry since n8n may not have received it.
     """
     if not N8N_CHAT_LEAD_WEBHOOK_URL:
         logger.error("N8N_CHAT_LEAD_WEBHOOK_URL is not set in environment variables. Cannot send chat lead.")
         return False
 
+    _start_retrier()
+    payload = _lead_payload(lead_details)
+    ref = new_lead_ref()
+
+    if not n8n_bulkhead.try_acquire():
+        logger.warning(f"n8n webhook at capacity; chat lead {ref} not sent now")
+        return _queue(payload, ref)
+    try:
+        if not n8n_breaker.allow():
+            logger.warning(f"n8n circuit open; chat lead {ref} not sent now")
+            return _queue(payload, ref)
+        try:
+            sent = await _post_lead_async(payload, ref, timeout=15 if deadline is None else min(15, deadline))
+        except asyncio.CancelledError:
+            n8n_breaker.record_cancelled()
+            _queue(payload, ref)
+            raise
+    finally:
+        n8n_bulkhead.release()
+    return sent or _queue(payload, ref)
+
+def lead_outbox() -> LeadOutbox:
+    """The outbox of leads waiting for a retry (created on first use)."""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = LeadOutbox.from_env()
+        return _outbox
+
+def retry_pending_leads() -> int:
+    """Retry the outbox leads that are due; returns how many were delivered."""
+    outbox = lead_outbox()
+    delivered = 0
+    for ref, payload, attempts in outbox.claim_due():
+        if _deliver(payload, ref):
+            outbox.delivered(ref)
+            delivered += 1
+        elif not outbox.retry_failed(ref, attempts + 1):
+            logger.error(f"Chat lead {ref} still undelivered after {attempts + 1} attempts; kept in the outbox as dead")
+    return delivered
+
+def _deliver(payload: dict, ref: str) -> bool:
+    if not n8n_bulkhead.try_acquire():
+        logger.warning(f"n8n webhook at capacity; chat lead {ref} not sent now")
+        return False
+    try:
+        if not n8n_breaker.allow():
+            logger.warning(f"n8n circuit open; chat lead {ref} not sent now")
+            return False
+        return _post_lead(payload, ref)
+    finally:
+        n8n_bulkhead.release()
+
+def _queue(payload: dict, ref: str) -> bool:
+    try:
+        lead_outbox().add(ref, payload)
+    except sqlite3.Error as e:
+        logger.error(f"Chat lead {ref} could not be delivered or queued for retry: {e}")
+        return False
+    logger.warning(f"Chat lead {ref} queued for retry")
+    return True
+
+def _start_retrier() -> None:
+    # One background retry loop per process; it also picks up leads queued before a restart
+    global _retrier_pid
+    with _outbox_lock:
+        if _retrier_pid == os.getpid():
+            return
+        _retrier_pid = os.getpid()
+    threading.Thread(target=_retry_loop, name="n8n-lead-retry", daemon=True).start()
+
+def _retry_loop() -> None:
+    while True:
+        time.sleep(RETRY_POLL_SECONDS)
+        try:
+            retry_pending_leads()
+        except Exception as e:
+            logger.error(f"Retrying queued chat leads failed: {e}")
+
+def _lead_payload(lead_details: dict) -> dict:
     # Prepare payload matching what the n8n "Set" node expects in $json.body
     # The n8n "Set" node will use expressions like {{ $json.body.FirstName || "" }}
-    payload = {
+    return {
         "FirstName": lead_details.get("FirstName", ""),
         "LastName": lead_details.get("LastName", ""), # AI not prompted for this, likely empty
         "Email": lead_details.get("Email", ""),
@@ -29,17 +152,42 @@ def send_chat_lead_to_n8n(lead_details: dict):
         "InquiryType": lead_details.get("InquiryType", "AI Chat Lead"), # Default if not specified
         "Message": lead_details.get("Message", "")
     }
-    
+
+async def _post_lead_async(payload: dict, ref: str, timeout: float) -> bool:
     try:
-        response = requests.post(N8N_CHAT_LEAD_WEBHOOK_URL, json=payload, timeout=15)
-        response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
-        logger.info(f"Successfully sent chat lead to n8n: {payload.get('Email')}")
+        with span("n8n"):
+            response = await async_http.post_json(N8N_CHAT_LEAD_WEBHOOK_URL, payload, timeout=timeout)
+    except async_http.TransportTimeout:
+        logger.error(f"Timeout error sending chat lead {ref} to n8n.")
+        n8n_breaker.record_failure()
+        return False
+    except async_http.TransportError as e:
+        logger.error(f"Error sending chat lead {ref} to n8n: {e}")
+        n8n_breaker.record_failure()
+        return False
+    if not response.ok:
+        logger.error(f"Error sending chat lead {ref} to n8n: HTTP {response.status_code}, text: {response.text[:200]}")
+        n8n_breaker.record_failure()
+        return False
+    logger.info(f"Successfully sent chat lead {ref} to n8n")
+    n8n_breaker.record_success()
+    return True
+
+def _post_lead(payload: dict, ref: str) -> bool:
+    try:
+        with span("n8n"):
+            response = requests.post(N8N_CHAT_LEAD_WEBHOOK_URL, json=payload, timeout=15)
+            response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
+        logger.info(f"Successfully sent chat lead {ref} to n8n")
+        n8n_breaker.record_success()
         return True
     except requests.exceptions.Timeout:
-        logger.error(f"Timeout error sending chat lead to n8n for {payload.get('Email')}.")
+        logger.error(f"Timeout error sending chat lead {ref} to n8n.")
+        n8n_breaker.record_failure()
         return False
     except requests.exceptions.RequestException as e:
-        logger.error(f"Error sending chat lead to n8n for {payload.get('Email')}: {e}")
+        logger.error(f"Error sending chat lead {ref} to n8n: {type(e).__name__}")
         if hasattr(e, 'response') and e.response is not None:
-            logger.error(f"n8n response status: {e.response.status_code}, text: {e.response.text}")
-        return False 
\ No newline at end of file
+            logger.error(f"n8n response status: {e.response.status_code}, text: {e.response.text[:200]}")
+        n8n_breaker.record_failure()
+        return False
@@ -0,0 +1,254 @@
+"""
+On-demand profiling for the API and the enrichment CLIs.
+
+StackSampler is a wall-clock sampling profiler: a background thread reads the
+target threads' Python stacks every few milliseconds through
+sys._current_frames() and counts them. The overhead is a few percent at the
+default 5 ms interval and nothing is instrumented, so it is safe to use on a
+production request. Results are written as collapsed stacks ("a;b;c 42" per
+line), which flamegraph.pl, inferno and speedscope.app read directly. Frames
+are labelled ``module:function``, so a run splits into pandas.*, requests.*,
+the enricher's own prompt building and so on.
+
+Under gevent (the gunicorn workers) every request is a greenlet on one OS
+thread, so the sampler runs on a native thread and follows the profiled
+request's greenlet only: its live stack while it runs, and the stack it is
+suspended in (usually waiting on I/O) while other greenlets run.
+
+In the Flask app (PROFILING_ENABLED=1), a request carrying an ``X-Profile``
+header is profiled on its own and the response names the file written under
+PROFILING_DIR in ``X-Profile-File``. If PROFILING_TOKEN is set, the header
+value must equal it. PROFILING_MODE=sample (default) uses the sampler;
+PROFILING_MODE=cprofile records a deterministic cProfile/pstats file instead,
+which is more detailed but too slow to leave on in production. One request is
+profiled at a time; the header is ignored while another profile is running.
+
+This module only uses the standard library so the enrichers can load it by
+path (see icebreakers/profiler.py).
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterable, List, Optional, Tuple
+
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '0') == '1'
+PROFILING_MODE = os.environ.get('PROFILING_MODE', 'sample')
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+PROFILING_DIR = os.environ.get('PROFILING_DIR', os.path.join(tempfile.gettempdir(), 'fluxstream-profiles'))
+PROFILING_INTERVAL = float(os.environ.get('PROFILING_INTERVAL', 0.005))
+
+PROFILE_HEADER = "X-Profile"
+# Deep recursion (pandas internals) would otherwise make unbounded stack strings
+MAX_STACK_DEPTH = 128
+
+
+def _frame_label(frame) -> str:
+    module = frame.f_globals.get('__name__') or os.path.basename(frame.f_code.co_filename)
+    return f"{module}:{frame.f_code.co_name}"
+
+
+def _gevent_monkey():
+    """gevent.monkey when gevent has patched threading (the gunicorn gevent workers), else None."""
+    monkey = sys.modules.get("gevent.monkey")
+    return monkey if monkey is not None and monkey.is_module_patched("threading") else None
+
+
+class StackSampler:
+    """Periodically samples the Python stacks of some threads into collapsed-stack counts."""
+
+    def __init__(self, interval: float = PROFILING_INTERVAL, thread_ids: Optional[Iterable[int]] = None):
+        """Samples `thread_ids`, or the thread that calls start() when omitted."""
+        self.interval = interval
+        self.thread_ids = set(thread_ids) if thread_ids is not None else None
+        self.all_threads = False
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.started = 0.0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Under gevent: the greenlet being sampled, its OS thread, and native sleep/ident
+        self._greenlet = None
+        self._os_thread: Optional[int] = None
+        self._native_sleep = None
+        self._get_ident = threading.get_ident
+        self._stopping = False
+        self._running = False
+
+    def start(self, all_threads: bool = False) -> "StackSampler":
+        self.all_threads = all_threads
+        self.started = time.perf_counter()
+        monkey = _gevent_monkey()
+        if monkey is None:
+            if self.thread_ids is None and not all_threads:
+                self.thread_ids = {threading.get_ident()}
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+            return self
+
+        # Under gevent, threading.get_ident() is a greenlet id that sys._current_frames() never
+        # reports, and a threading.Thread is a greenlet that only runs while the request yields.
+        # Sample from a real OS thread instead and follow the calling greenlet alone, so other
+        # requests sharing the worker's thread are not mixed in.
+        self._get_ident = monkey.get_original('_thread', 'get_ident')
+        if self.thread_ids is None and not all_threads:
+            import greenlet
+            self._greenlet = greenlet.getcurrent()
+            self._os_thread = self._get_ident()
+        self._native_sleep = monkey.get_original('time', 'sleep')
+        self._running = True
+        monkey.get_original('_thread', 'start_new_thread')(self._run, ())
+        return self
+
+    def stop(self) -> "StackSampler":
+        self._stop.set()
+        self._stopping = True
+        if self._thread is not None:
+            self._thread.join()
+        while self._running:
+            time.sleep(self.interval)  # cooperative under gevent
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def _wait(self) -> bool:
+        """Sleep one interval; False once stop() has been called."""
+        if self._native_sleep is None:
+            return not self._stop.wait(self.interval)
+        self._native_sleep(self.interval)
+        return not self._stopping
+
+    def _greenlet_frame(self):
+        # A suspended greenlet keeps its stack in gr_frame; a running one (gr_frame None) is the
+        # OS thread's current stack, trusted only if it was still running after the snapshot
+        glet = self._greenlet
+        frame = glet.gr_frame
+        if frame is not None or glet.dead:
+            return frame
+        frame = sys._current_frames().get(self._os_thread)
+        return frame if glet.gr_frame is None else None
+
+    def _run(self) -> None:
+        own = self._get_ident()
+        names = {}
+        try:
+            while self._wait():
+                if self._greenlet is not None:
+                    frame = self._greenlet_frame()
+                    targets = {self._os_thread: frame} if frame is not None else {}
+                else:
+                    frames = sys._current_frames()
+                    if self.all_threads:
+                        targets = {tid: frame for tid, frame in frames.items() if tid != own}
+                        multiple = len(targets) > 1 and self._native_sleep is None
+                        names = {t.ident: t.name for t in threading.enumerate()} if multiple else {}
+                    else:
+                        targets = {tid: frames[tid] for tid in self.thread_ids if tid in frames}
+                for tid, frame in targets.items():
+                    labels: List[str] = []
+                    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                        labels.append(_frame_label(frame))
+                        frame = frame.f_back
+                    if tid in names:
+                        labels.append(names[tid])
+                    self.counts[";".join(reversed(labels))] += 1
+                self.samples += 1
+        finally:
+            self._running = False
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+    def write(self, path: str) -> str:
+        with open(path, "w", encoding="utf-8") as out:
+            out.write(self.collapsed())
+        return path
+
+    def summary(self, top: int = 8, skip: Tuple[str, ...] = ("__main__", "runpy", "threading")) -> List[Tuple[str, float]]:
+        """Share of samples in which each top-level package appears anywhere on the stack."""
+        total = sum(self.counts.values())
+        if not total:
+            return []
+        packages: Counter = Counter()
+        for stack, count in self.counts.items():
+            seen = {frame.split(":", 1)[0].split(".", 1)[0] for frame in stack.split(";")}
+            for package in seen.difference(skip):
+                packages[package] += count
+        return [(package, count / total) for package, count in packages.most_common(top)]
+
+
+@contextmanager
+def profile_run(path: str, interval: float = PROFILING_INTERVAL, all_threads: bool = False):
+    """Sample the calling thread (or all threads) for the duration of the block and write collapsed stacks to `path`."""
+    sampler = StackSampler(interval).start(all_threads=all_threads)
+    try:
+        yield sampler
+    finally:
+        sampler.stop()
+        sampler.write(path)
+
+
+def _profile_filename(suffix: str) -> str:
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    return os.path.join(PROFILING_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(3).hex()}{suffix}")
+
+
+def init_app(app, enabled: bool = PROFILING_ENABLED, mode: str = PROFILING_MODE, token: Optional[str] = PROFILING_TOKEN) -> None:
+    """Register request hooks that profile requests sent with the X-Profile header."""
+    if not enabled:
+        return
+    if mode not in ("sample", "cprofile"):
+        raise ValueError(f"PROFILING_MODE must be 'sample' or 'cprofile', not {mode!r}")
+
+    from flask import g, request
+
+    slot = threading.Lock()
+
+    @app.before_request
+    def _start_request_profile():
+        requested = request.headers.get(PROFILE_HEADER)
+        if not requested or (token and requested != token):
+            return
+        if not slot.acquire(blocking=False):
+            return
+        if mode == "cprofile":
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler().start()
+        g._profiler = profiler
+
+    @app.after_request
+    def _finish_request_profile(response):
+        profiler = g.pop("_profiler", None)
+        if profiler is None:
+            return response
+        try:
+            if mode == "cprofile":
+                profiler.disable()
+                path = _profile_filename(".prof")
+                profiler.dump_stats(path)
+            else:
+                path = profiler.stop().write(_profile_filename(".collapsed"))
+                response.headers["X-Profile-Samples"] = str(profiler.samples)
+        finally:
+            slot.release()
+        response.headers["X-Profile-File"] = os.path.basename(path)
+        return response
+
+    @app.teardown_request
+    def _abandon_request_profile(exc):
+        # after_request is skipped when the view raised; release the slot here instead
+        profiler = g.pop("_profiler", None)
+        if profiler is not None:
+            if mode == "cprofile":
+                profiler.disable()
+            else:
+                profiler.stop()
+            slot.release()
+
@@ -0,0 +1,521 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Any, Optional
+
+import requests
+
+from api.utils import async_http
+from api.utils.tracing import span
+from api.utils.resilience import CircuitBreaker, Bulkhead, OPEN, CIRCUIT_OPEN, OVERLOADED
+from api.utils.quota_broker import QuotaClient, CHAT, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Rolling window used for each provider's latency/error profile
+STATS_WINDOW = 50
+# Minimum samples before a provider's p95 is trusted for hedging decisions
+MIN_HEDGE_SAMPLES = 5
+# Consecutive failures before a provider is benched, and for how long
+FAILURE_THRESHOLD = 3
+COOLDOWN_SECONDS = 30.0
+# In-flight requests allowed per provider (per worker process) before excess load is shed
+MAX_CONCURRENT_CALLS = int(os.environ.get('LLM_MAX_CONCURRENCY', 32))
+
+
+def build_messages(
+    system_prompt: str,
+    user_message: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    retrieved_context: Optional[str] = None
+) -> List[Dict[str, str]]:
+    """Build the chat-completions messages array shared by every provider."""
+    messages = [{"role": "system", "content": system_prompt}]
+    messages.extend(conversation_history or [])
+
+    # Add the current user message, with retrieved context if available
+    contextual_user_message = user_message
+    if retrieved_context:
+        contextual_user_message = f"Based on the following information:\n\"{retrieved_context}\"\n\nPlease answer this user's question: \"{user_message}\""
+
+    messages.append({"role": "user", "content": contextual_user_message})
+    return messages
+
+
+def extract_assistant_response(api_response: Dict[str, Any]) -> Optional[str]:
+    """Extract the assistant's response from the API response."""
+    if api_response is None:
+        print("Error extracting response: API response was None.")
+        return "Error: Received no response from the AI."
+
+    if "error" in api_response:
+        return f"API Error: {api_response['error']}"
+
+    try:
+        # Ensure proper markdown is preserved
+        return api_response["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError) as e:
+        print(f"Error extracting response: {e}. API Response: {api_response}")
+        return "Error: Could not extract a valid response from the AI."
+
+
+def _usage_tokens(result: Optional[Dict[str, Any]]) -> int:
+    return ((result or {}).get("usage") or {}).get("total_tokens", 0)
+
+
+def _checked(display_name: str, result: Any, upstream_failed: bool):
+    """(result, upstream_failed), with a JSON body that is not an object turned into a failure."""
+    if isinstance(result, dict):
+        return result, upstream_failed
+    print(f"Invalid response from {display_name} API: {str(result)[:200]}")
+    return {"error": f"{display_name} API returned an invalid response."}, True
+
+
+class ProviderStats:
+    """Rolling latency and error profile for one provider."""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.consecutive_failures = 0
+        self.benched_until = 0.0
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            self._outcomes.append(ok)
+            if ok:
+                self._latencies.append(latency)
+                self.consecutive_failures = 0
+            else:
+                self.consecutive_failures += 1
+                if self.consecutive_failures >= FAILURE_THRESHOLD:
+                    self.benched_until = time.monotonic() + COOLDOWN_SECONDS
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+    @property
+    def sample_count(self) -> int:
+        return len(self._latencies)
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            outcomes = list(self._outcomes)
+        return outcomes.count(False) / len(outcomes) if outcomes else 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.benched_until
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "error_rate": round(self.error_rate, 4),
+            "samples": self.sample_count,
+            "healthy": self.healthy,
+        }
+
+
+class Provider:
+    """
+    An OpenAI-compatible chat-completions backend.
+
+    The API key is read from `api_key_env` on every call so a key added to the
+    environment after import is picked up without a restart. Calls go through a
+    circuit breaker and a concurrency cap; when either refuses, complete() returns
+    at once with an error result carrying an "unavailable" reason.
+
+    `tier_models` maps a tier name (passed as complete(..., tier=...)) to the model
+    to use for it; tiers without an entry use `model`. `quota_clients` maps a
+    priority (chat or batch, passed as complete(..., priority=...)) to the quota
+    broker client permits are drawn from before each call.
+
+    complete_async() is the asyncio version, sharing one connection pool per event
+    loop (see api/utils/async_http.py); complete() keeps using requests.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        api_url: str,
+        api_key_env: str,
+        model: str,
+        max_tokens: int,
+        temperature: float = 0.7,
+        timeout: float = 45,
+        display_name: Optional[str] = None,
+        extra_payload: Optional[Dict[str, Any]] = None,
+        max_concurrent: int = MAX_CONCURRENT_CALLS,
+        tier_models: Optional[Dict[str, str]] = None,
+        quota_clients: Optional[Dict[str, QuotaClient]] = None
+    ):
+        self.name = name
+        self.api_url = api_url
+        self.api_key_env = api_key_env
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.timeout = timeout
+        self.display_name = display_name or name
+        self.extra_payload = extra_payload or {}
+        self.tier_models = tier_models or {}
+        self.quota_clients = quota_clients or {}
+        self.stats = ProviderStats()
+        self.breaker = CircuitBreaker(name, failure_threshold=FAILURE_THRESHOLD, reset_timeout=COOLDOWN_SECONDS)
+        self.bulkhead = Bulkhead(name, max_concurrent)
+
+    @property
+    def api_key(self) -> Optional[str]:
+        return os.environ.get(self.api_key_env)
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    def complete(
+        self,
+        messages: List[Dict[str, str]],
+        tier: Optional[str] = None,
+        priority: str = CHAT,
+        **overrides
+    ) -> Dict[str, Any]:
+        """POST a chat completion. Returns the decoded JSON or an {"error": ...} dict."""
+        headers, payload = self._request(messages, tier, overrides)
+
+        if not self.bulkhead.try_acquire():
+            return {"error": f"{self.display_name} API is at capacity.", "unavailable": OVERLOADED}
+        try:
+            quota = self.quota_clients.get(priority)
+            permit = quota.acquire(estimate_tokens(messages, payload["max_tokens"])) if quota else None
+            if quota and permit is None:
+                return {"error": f"{self.display_name} API quota is exhausted.", "unavailable": OVERLOADED}
+            if not self.breaker.allow():
+                if quota:
+                    quota.cancel(permit)  # no call made: refund the request slot and the tokens
+                return {"error": f"{self.display_name} API is temporarily unavailable.", "unavailable": CIRCUIT_OPEN}
+            result = None
+            try:
+                result = self._post(headers, payload)
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            finally:
+                # Settle the permit whatever happened, or its tokens stay reserved
+                if quota:
+                    quota.report(permit, _usage_tokens(result))
+            return result
+        finally:
+            self.bulkhead.release()
+
+    async def complete_async(
+        self,
+        messages: List[Dict[str, str]],
+        tier: Optional[str] = None,
+        priority: str = CHAT,
+        deadline: Optional[float] = None,
+        **overrides
+    ) -> Dict[str, Any]:
+        """
+        complete() for asyncio callers, with the same concurrency cap, quota,
+        circuit breaker and results.
+
+        `deadline` bounds the whole call, quota wait included, in seconds. A call
+        that is cancelled or runs past its deadline frees its concurrency slot,
+        refunds its quota permit and does not count against the circuit.
+        """
+        if deadline is None:
+            return await self._complete_async(messages, tier, priority, overrides)
+        try:
+            async with asyncio.timeout(deadline):
+                return await self._complete_async(messages, tier, priority, overrides)
+        except TimeoutError:
+            return {"error": f"{self.display_name} API did not answer within {deadline:g}s."}
+
+    async def _complete_async(self, messages, tier, priority, overrides) -> Dict[str, Any]:
+        headers, payload = self._request(messages, tier, overrides)
+
+        if not self.bulkhead.try_acquire():
+            return {"error": f"{self.display_name} API is at capacity.", "unavailable": OVERLOADED}
+        quota = self.quota_clients.get(priority)
+        permit = None
+        allowed = False
+        result = None
+        try:
+            if quota:
+                # The broker client blocks on a socket, so it waits off the event loop
+                permit = await asyncio.to_thread(quota.acquire, estimate_tokens(messages, payload["max_tokens"]))
+                if permit is None:
+                    return {"error": f"{self.display_name} API quota is exhausted.", "unavailable": OVERLOADED}
+            if not self.breaker.allow():
+                return {"error": f"{self.display_name} API is temporarily unavailable.", "unavailable": CIRCUIT_OPEN}
+            allowed = True
+            result = await self._post_async(headers, payload)
+            return result
+        except asyncio.CancelledError:
+            if allowed and result is None:
+                self.breaker.record_cancelled()
+            raise
+        except Exception:
+            if allowed and result is None:
+                self.breaker.record_failure()
+            raise
+        finally:
+            # Settle the permit whatever happened: report usage if the call was made,
+            # otherwise refund the request slot and the tokens
+            if quota and permit:
+                if allowed:
+                    quota.report(permit, _usage_tokens(result))
+                else:
+                    quota.cancel(permit)
+            self.bulkhead.release()
+
+    def _request(self, messages, tier, overrides):
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+        payload = {
+            "model": self.tier_models.get(tier, self.model),
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            **self.extra_payload,
+        }
+        payload.update(overrides)
+        return headers, payload
+
+    def _post(self, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.monotonic()
+        response = None
+        upstream_failed = True
+        with span(f"llm.{self.name}", model=payload["model"]) as provider_span:
+            try:
+                response = requests.post(self.api_url, headers=headers, json=payload, timeout=self.timeout)
+                response.raise_for_status()
+                result = response.json()
+                upstream_failed = False
+            except requests.exceptions.HTTPError as http_err:
+                print(f"HTTP error occurred: {http_err} - {response.text}")
+                result = {"error": f"HTTP error: {response.status_code} - {response.text}"}
+                # Client errors (bad request, bad key) say nothing about the upstream's health
+                upstream_failed = response.status_code >= 500 or response.status_code == 429
+            except requests.exceptions.Timeout as timeout_err:
+                print(f"Timeout error occurred: {timeout_err}")
+                result = {"error": f"Request to {self.display_name} API timed out."}
+            except requests.exceptions.RequestException as e:
+                print(f"Error calling {self.display_name} API: {e}")
+                result = {"error": str(e)}
+            except ValueError as e:
+                # A 200 whose body is not JSON (a proxy error page, a truncated reply)
+                print(f"Invalid response from {self.display_name} API: {e}")
+                result = {"error": f"{self.display_name} API returned an invalid response."}
+            result, upstream_failed = _checked(self.display_name, result, upstream_failed)
+            provider_span.set(ok="error" not in result)
+
+        self._record(started, result, upstream_failed)
+        return result
+
+    async def _post_async(self, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.monotonic()
+        upstream_failed = True
+        with span(f"llm.{self.name}", model=payload["model"]) as provider_span:
+            try:
+                response = await async_http.post_json(self.api_url, payload, headers, timeout=self.timeout)
+                if response.ok:
+                    result = response.json()
+                    upstream_failed = False
+                else:
+                    print(f"HTTP error occurred: {response.status_code} - {response.text}")
+                    result = {"error": f"HTTP error: {response.status_code} - {response.text}"}
+                    upstream_failed = response.status_code >= 500 or response.status_code == 429
+            except async_http.TransportTimeout as timeout_err:
+                print(f"Timeout error occurred: {timeout_err}")
+                result = {"error": f"Request to {self.display_name} API timed out."}
+            except async_http.TransportError as e:
+                print(f"Error calling {self.display_name} API: {e}")
+                result = {"error": str(e)}
+            except ValueError as e:
+                print(f"Invalid response from {self.display_name} API: {e}")
+                result = {"error": f"{self.display_name} API returned an invalid response."}
+            result, upstream_failed = _checked(self.display_name, result, upstream_failed)
+            provider_span.set(ok="error" not in result)
+
+        self._record(started, result, upstream_failed)
+        return result
+
+    def _record(self, started: float, result: Dict[str, Any], upstream_failed: bool) -> None:
+        self.stats.record(time.monotonic() - started, "error" not in result)
+        if upstream_failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+
+class ProviderRouter:
+    """
+    Routes each completion to the fastest healthy provider and fails over on errors.
+
+    With hedging enabled, a duplicate request is sent to the next-ranked provider
+    once the primary has been silent for longer than its observed p95 latency;
+    whichever answers successfully first wins. complete_async() does the same on
+    the event loop and cancels the losing request.
+    """
+
+    def __init__(
+        self,
+        providers: List[Provider],
+        hedge: bool = False,
+        hedge_min_delay: float = 1.0,
+        hedge_default_delay: float = 10.0,
+        max_workers: int = 16
+    ):
+        self.providers = providers
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-hedge") if hedge else None
+
+    def ranked(self) -> List[Provider]:
+        """Configured providers, healthy ones first, then by median latency."""
+        candidates = [p for p in self.providers if p.configured]
+
+        def sort_key(item):
+            index, provider = item
+            # Providers without samples rank as fast so they get explored once
+            available = provider.stats.healthy and provider.breaker.state != OPEN
+            return (not available, provider.stats.percentile(50) or 0.0, index)
+
+        return [p for _, p in sorted(enumerate(candidates), key=sort_key)]
+
+    def complete(self, messages: List[Dict[str, str]], **overrides) -> Dict[str, Any]:
+        candidates = self.ranked()
+        if not candidates:
+            print("Error: no LLM provider has an API key configured.")
+            return {"error": "API key not configured."}
+
+        if self._executor is not None and len(candidates) > 1:
+            return self._complete_hedged(candidates, messages, overrides)
+        return self._complete_sequential(candidates, messages, overrides)
+
+    def _complete_sequential(self, candidates, messages, overrides) -> Dict[str, Any]:
+        result = None
+        for provider in candidates:
+            result = provider.complete(messages, **overrides)
+            if "error" not in result:
+                return result
+            logger.warning(f"Provider {provider.name} failed, failing over: {result['error']}")
+        return result
+
+    def hedge_delay(self, provider: Provider) -> float:
+        if provider.stats.sample_count < MIN_HEDGE_SAMPLES:
+            return self.hedge_default_delay
+        return max(self.hedge_min_delay, provider.stats.percentile(95))
+
+    def _submit(self, provider: Provider, messages, overrides):
+        # Run in a copy of the caller's context so provider spans land in the request's trace
+        return self._executor.submit(copy_context().run, provider.complete, messages, **overrides)
+
+    def _complete_hedged(self, candidates, messages, overrides) -> Dict[str, Any]:
+        primary, backup, rest = candidates[0], candidates[1], candidates[2:]
+        pending = {self._submit(primary, messages, overrides): primary}
+
+        done, _ = wait(pending, timeout=self.hedge_delay(primary))
+        if not done:
+            logger.info(f"Hedging: {primary.name} exceeded its p95, also asking {backup.name}")
+            pending[self._submit(backup, messages, overrides)] = backup
+        else:
+            # The primary finished (successfully or not) before the hedge fired
+            rest = [backup] + rest
+
+        result = None
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                provider = pending.pop(future)
+                result = future.result()
+                if "error" not in result:
+                    return result
+                logger.warning(f"Provider {provider.name} failed, failing over: {result['error']}")
+
+        if rest:
+            return self._complete_sequential(rest, messages, overrides)
+        return result
+
+    async def complete_async(self, messages: List[Dict[str, str]], deadline: Optional[float] = None,
+                             **overrides) -> Dict[str, Any]:
+        """complete() for asyncio callers; `deadline` bounds the whole call, failovers included, in seconds."""
+        candidates = self.ranked()
+        if not candidates:
+            print("Error: no LLM provider has an API key configured.")
+            return {"error": "API key not configured."}
+
+        if deadline is None:
+            return await self._route_async(candidates, messages, overrides)
+        try:
+            async with asyncio.timeout(deadline):
+                return await self._route_async(candidates, messages, overrides)
+        except TimeoutError:
+            return {"error": f"No LLM provider answered within {deadline:g}s."}
+
+    async def _route_async(self, candidates, messages, overrides) -> Dict[str, Any]:
+        if self.hedge and len(candidates) > 1:
+            return await self._complete_hedged_async(candidates, messages, overrides)
+        return await self._complete_sequential_async(candidates, messages, overrides)
+
+    async def _complete_sequential_async(self, candidates, messages, overrides) -> Dict[str, Any]:
+        result = None
+        for provider in candidates:
+            result = await provider.complete_async(messages, **overrides)
+            if "error" not in result:
+                return result
+            logger.warning(f"Provider {provider.name} failed, failing over: {result['error']}")
+        return result
+
+    async def _complete_hedged_async(self, candidates, messages, overrides) -> Dict[str, Any]:
+        primary, backup, rest = candidates[0], candidates[1], candidates[2:]
+        pending = {asyncio.ensure_future(primary.complete_async(messages, **overrides)): primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_delay(primary))
+            if not done:
+                logger.info(f"Hedging: {primary.name} exceeded its p95, also asking {backup.name}")
+                pending[asyncio.ensure_future(backup.complete_async(messages, **overrides))] = backup
+            else:
+                rest = [backup] + rest
+
+            result = None
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    provider = pending.pop(task)
+                    result = task.result()
+                    if "error" not in result:
+                        return result
+                    logger.warning(f"Provider {provider.name} failed, failing over: {result['error']}")
+        finally:
+            # The slower request is no longer needed (or the caller gave up)
+            for task in pending:
+                task.cancel()
+
+        if rest:
+            return await self._complete_sequential_async(rest, messages, overrides)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            p.name: {**p.stats.snapshot(), "circuit": p.breaker.snapshot(), "concurrency": p.bulkhead.snapshot()}
+            for p in self.providers
+        }
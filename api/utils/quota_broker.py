@@ -0,0 +1,329 @@
+"""
+Local quota broker shared by the chatbot and the icebreaker enrichers.
+
+Both sides use the same XAI_API_KEY, so they draw request and token permits
+from one broker process instead of each pacing itself. Permits come from two
+token buckets (requests per minute and tokens per minute) and are granted by
+priority: while any chat request is waiting, batch requests wait too, and a
+small reserve of each bucket is held back for chat. Batch work gets everything
+else, so it soaks up whatever capacity chat leaves unused.
+
+The broker speaks line-delimited JSON over TCP:
+
+    {"op": "acquire", "priority": "chat", "tokens": 900, "timeout": 2}
+        -> {"ok": true, "permit": "..."} or {"ok": false, "error": "timeout", "retry_after": 1.5}
+    {"op": "report", "permit": "...", "tokens": 612}   (actual usage, corrects the estimate)
+    {"op": "cancel", "permit": "..."}                  (no call was made: refunds the request and its tokens)
+    {"op": "stats"}
+
+This module only uses the standard library so the enrichers can load it
+without the Flask app. Run the broker with scripts/quota_broker.py.
+"""
+
+import os
+import json
+import time
+import socket
+import logging
+import threading
+import socketserver
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHAT = "chat"
+BATCH = "batch"
+PRIORITIES = (CHAT, BATCH)
+
+DEFAULT_PORT = 7421
+# Permits whose usage was never reported are forgotten after this long
+PERMIT_TTL_SECONDS = 600.0
+# Broker connections a client opens at most (per process); calls beyond that wait their turn
+MAX_CONNECTIONS = int(os.environ.get('QUOTA_BROKER_CONNECTIONS', 8))
+
+
+class QuotaBroker:
+    """Priority-aware request/token buckets. Thread-safe; acquire() blocks up to its timeout."""
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        chat_reserve: float = 0.1,
+        clock=time.monotonic
+    ):
+        self.request_capacity = float(requests_per_minute)
+        self.token_capacity = float(tokens_per_minute)
+        self.chat_reserve = chat_reserve
+        self._clock = clock
+        self._requests = self.request_capacity
+        self._tokens = self.token_capacity
+        self._refilled_at = clock()
+        self._cond = threading.Condition()
+        self._waiting = {CHAT: 0, BATCH: 0}
+        self._permits: Dict[str, Tuple[float, float]] = {}
+        self._granted = {CHAT: 0, BATCH: 0}
+        self._timed_out = {CHAT: 0, BATCH: 0}
+
+    def _refill(self) -> None:
+        # Caller holds the lock
+        now = self._clock()
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._requests = min(self.request_capacity, self._requests + elapsed * self.request_capacity / 60.0)
+        self._tokens = min(self.token_capacity, self._tokens + elapsed * self.token_capacity / 60.0)
+
+    def _shortfall(self, priority: str, tokens: float) -> Optional[float]:
+        """Seconds of refill needed before the request can be granted, or None if it can be granted now."""
+        if priority == BATCH:
+            if self._waiting[CHAT]:
+                return 0.05  # chat goes first; re-check once it has been served
+            need_requests = 1 + self.chat_reserve * self.request_capacity
+            need_tokens = tokens + self.chat_reserve * self.token_capacity
+        else:
+            need_requests, need_tokens = 1, tokens
+        if self._requests >= need_requests and self._tokens >= need_tokens:
+            return None
+        return max(
+            (need_requests - self._requests) * 60.0 / self.request_capacity,
+            (need_tokens - self._tokens) * 60.0 / self.token_capacity,
+            0.01,
+        )
+
+    def acquire(self, priority: str, tokens: float, timeout: float) -> Tuple[Optional[str], float]:
+        """Wait for a permit. Returns (permit_id, 0) or (None, seconds until one might be available)."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}")
+        tokens = min(max(float(tokens), 0.0), self.token_capacity)
+        deadline = self._clock() + timeout
+
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    self._refill()
+                    wait = self._shortfall(priority, tokens)
+                    if wait is None:
+                        self._requests -= 1
+                        self._tokens -= tokens
+                        self._granted[priority] += 1
+                        return self._issue_permit(tokens), 0.0
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        self._timed_out[priority] += 1
+                        return None, wait
+                    self._cond.wait(min(wait, remaining))
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+    def _issue_permit(self, tokens: float) -> str:
+        # Caller holds the lock
+        now = self._clock()
+        if len(self._permits) > 10000:
+            self._permits = {pid: p for pid, p in self._permits.items() if now - p[1] < PERMIT_TTL_SECONDS}
+        permit = os.urandom(8).hex()
+        self._permits[permit] = (tokens, now)
+        return permit
+
+    def report(self, permit: str, tokens: float) -> None:
+        """Replace a permit's token estimate with the tokens the call actually used."""
+        with self._cond:
+            estimate = self._permits.pop(permit, None)
+            if estimate is None:
+                return
+            # Over-estimates are refunded; under-estimates become debt the bucket pays off
+            self._tokens = min(self.token_capacity, self._tokens + estimate[0] - float(tokens))
+            self._cond.notify_all()
+
+    def cancel(self, permit: str) -> None:
+        """Return an unused permit: both its request slot and its tokens go back to the buckets."""
+        with self._cond:
+            estimate = self._permits.pop(permit, None)
+            if estimate is None:
+                return
+            self._requests = min(self.request_capacity, self._requests + 1)
+            self._tokens = min(self.token_capacity, self._tokens + estimate[0])
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            self._refill()
+            return {
+                "requests_available": round(self._requests, 2),
+                "tokens_available": round(self._tokens, 1),
+                "requests_per_minute": self.request_capacity,
+                "tokens_per_minute": self.token_capacity,
+                "waiting": dict(self._waiting),
+                "granted": dict(self._granted),
+                "timed_out": dict(self._timed_out),
+            }
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        broker: QuotaBroker = self.server.broker
+        for line in self.rfile:
+            try:
+                message = json.loads(line)
+                op = message.get("op")
+                if op == "acquire":
+                    permit, retry_after = broker.acquire(
+                        message.get("priority", BATCH), message.get("tokens", 0), float(message.get("timeout", 30))
+                    )
+                    reply = {"ok": True, "permit": permit} if permit else {"ok": False, "error": "timeout", "retry_after": round(retry_after, 3)}
+                elif op == "report":
+                    broker.report(message.get("permit", ""), message.get("tokens", 0))
+                    reply = {"ok": True}
+                elif op == "cancel":
+                    broker.cancel(message.get("permit", ""))
+                    reply = {"ok": True}
+                elif op == "stats":
+                    reply = {"ok": True, "stats": broker.stats()}
+                else:
+                    reply = {"ok": False, "error": f"unknown op {op!r}"}
+            except (ValueError, TypeError, AttributeError) as e:
+                reply = {"ok": False, "error": str(e)}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+            self.wfile.flush()
+
+
+class BrokerServer(socketserver.ThreadingTCPServer):
+    """TCP front end for a QuotaBroker; one thread per connected client."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, broker: QuotaBroker, host: str = '127.0.0.1', port: int = DEFAULT_PORT):
+        self.broker = broker
+        super().__init__((host, port), _Handler)
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port or DEFAULT_PORT)
+
+
+class PoolExhausted(Exception):
+    """Every broker connection stayed busy for the whole wait."""
+
+
+class QuotaClient:
+    """
+    Client for a running broker.
+
+    Connections are pooled per process: a call takes an idle connection (or
+    opens one, up to `max_connections`), uses it exclusively and hands it
+    back. A connection that fails is closed and the next call opens a fresh
+    one. Unlike a connection per thread, this stays small under gevent, where
+    every request is its own greenlet. Time spent waiting for a connection
+    counts against the permit timeout; a call that gets none in time is
+    refused like one the broker refused.
+
+    If the broker cannot be reached, acquire() fails open: it returns a
+    placeholder permit and logs a warning, so a stopped broker never takes
+    the chatbot down with it.
+    """
+
+    UNBROKERED = "unbrokered"
+
+    def __init__(self, address: str, priority: str, timeout: float, connect_timeout: float = 0.5,
+                 max_connections: int = MAX_CONNECTIONS):
+        self.address = parse_address(address)
+        self.priority = priority
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max(int(max_connections), 1)
+        self.connects = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._idle = []
+        self._slots = None
+        self._warned_at = 0.0
+
+    def _pool(self) -> threading.BoundedSemaphore:
+        with self._lock:
+            if self._pid != os.getpid():
+                # First use, or forked: the parent's sockets and slots are not ours
+                self._idle, self._pid = [], os.getpid()
+                self._slots = threading.BoundedSemaphore(self.max_connections)
+            return self._slots
+
+    def _call(self, message: Dict[str, Any], wait: float) -> Dict[str, Any]:
+        started = time.monotonic()
+        slots = self._pool()
+        if not slots.acquire(timeout=wait + self.connect_timeout):
+            raise PoolExhausted(f"no free broker connection within {wait:g}s")
+        try:
+            wait = max(wait - (time.monotonic() - started), 0.0)
+            if "timeout" in message:
+                message = {**message, "timeout": wait}
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                self.connects += 1
+                sock = socket.create_connection(self.address, timeout=self.connect_timeout)
+                conn = (sock, sock.makefile('rb'))
+            try:
+                sock, reader = conn
+                sock.settimeout(wait + self.connect_timeout)
+                sock.sendall(json.dumps(message).encode() + b"\n")
+                line = reader.readline()
+                if not line:
+                    raise ConnectionError("broker closed the connection")
+                reply = json.loads(line)
+            except BaseException:
+                # A failed or interrupted exchange may leave a reply unread: never reuse it
+                conn[0].close()
+                raise
+            with self._lock:
+                self._idle.append(conn)
+            return reply
+        finally:
+            slots.release()
+
+    def acquire(self, tokens: float, timeout: Optional[float] = None) -> Optional[str]:
+        """A permit id, or None if the broker refused within the timeout."""
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            reply = self._call({"op": "acquire", "priority": self.priority, "tokens": tokens, "timeout": timeout}, timeout)
+        except PoolExhausted:
+            return None
+        except (OSError, ValueError) as e:
+            if time.monotonic() - self._warned_at > 60:
+                self._warned_at = time.monotonic()
+                logger.warning(f"Quota broker at {self.address[0]}:{self.address[1]} unreachable, proceeding without a permit: {e}")
+            return self.UNBROKERED
+        return reply.get("permit") if reply.get("ok") else None
+
+    def report(self, permit: Optional[str], tokens: float) -> None:
+        if not permit or permit == self.UNBROKERED:
+            return
+        try:
+            self._call({"op": "report", "permit": permit, "tokens": tokens}, 1.0)
+        except (PoolExhausted, OSError, ValueError):
+            pass
+
+    def cancel(self, permit: Optional[str]) -> None:
+        """Give back a permit whose call was never made (request slot and tokens)."""
+        if not permit or permit == self.UNBROKERED:
+            return
+        try:
+            self._call({"op": "cancel", "permit": permit}, 1.0)
+        except (PoolExhausted, OSError, ValueError):
+            pass
+
+
+def estimate_tokens(messages, max_tokens: int) -> int:
+    """Rough prompt + completion token count (about 4 characters per token)."""
+    return sum(len(m.get("content") or "") for m in messages) // 4 + int(max_tokens)
+
+
+def client_from_env(priority: str) -> Optional[QuotaClient]:
+    """A client for QUOTA_BROKER_ADDR, or None when no broker is configured."""
+    address = os.environ.get('QUOTA_BROKER_ADDR')
+    if not address:
+        return None
+    default_timeout = '2' if priority == CHAT else '300'
+    timeout = float(os.environ.get(f'QUOTA_{priority.upper()}_TIMEOUT', default_timeout))
+    return QuotaClient(address, priority, timeout)
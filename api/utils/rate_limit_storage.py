@@ -0,0 +1,330 @@
+"""
+Rate-limit storage backends shared across worker processes.
+
+Importing this module registers extra storage schemes with the `limits`
+library (and therefore with Flask-Limiter's `storage_uri`):
+
+- ``bounded+memory://`` - the per-process ``memory://`` storage with a hard
+  cap on the number of tracked keys (``max_keys`` storage option).
+- ``sqlite:///path/to/ratelimit.db`` - a local SQLite file shared by every
+  worker on the host.
+- ``prealloc+redis://host:port/db`` - any Redis-compatible server, for workers
+  spread across hosts. Requires the optional ``redis`` package.
+
+The shared schemes pre-allocate counter slots in batches: a worker reserves a block of hits
+from the shared counter in one round trip and then serves later hits for the
+same key from that block in-process. Slots are handed out in global order, so
+the shared counter never admits more than the configured limit; unused slots
+in a block simply expire with the window, which can only make the limit
+slightly stricter. The block size starts at one and doubles on each refill
+within a window, so keys that only see a few hits never over-reserve.
+"""
+
+import os
+import sys
+import time
+import heapq
+import sqlite3
+import threading
+from typing import Dict, Tuple
+
+from limits.storage import Storage, MemoryStorage
+
+# Upper bound on the block of hits reserved per round trip
+DEFAULT_RESERVE_BATCH = 8
+# Local leases are purged once this many keys are tracked
+MAX_LOCAL_LEASES = 10000
+# Expired SQLite rows are deleted every this many reservations
+SQLITE_PURGE_EVERY = 1000
+# Keys tracked by bounded+memory:// before the soonest-expiring ones are evicted
+DEFAULT_MAX_KEYS = 20000
+# Share of max_keys evicted at once, so a full store is not re-scanned on every new key
+EVICT_FRACTION = 0.1
+
+
+class BoundedMemoryStorage(MemoryStorage):
+    """
+    In-process storage with a cap on tracked keys.
+
+    `memory://` keeps a counter per limit and client until its window ends, so
+    "200 per day" holds every client IP seen in the last 24 hours. Once
+    `max_keys` counters (or moving-window entries) are tracked, expired keys
+    are dropped and then the ones closest to expiry are evicted. An evicted
+    client starts a fresh window, so the cap can only make limits more lenient
+    for the clients closest to a reset, never stricter.
+    """
+
+    STORAGE_SCHEME = ["bounded+memory"]
+
+    def __init__(self, uri: str = None, wrap_exceptions: bool = False, max_keys: int = DEFAULT_MAX_KEYS, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.max_keys = max(1, int(max_keys))
+        self.evictions = 0
+        self._evict_lock = threading.Lock()
+
+    @property
+    def key_count(self) -> int:
+        return len(self.expirations) + len(self.events)
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        if key not in self.expirations and self.key_count >= self.max_keys:
+            self._make_room()
+        return super().incr(key, expiry, amount)
+
+    def acquire_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if key not in self.events and self.key_count >= self.max_keys:
+            self._make_room()
+        return super().acquire_entry(key, limit, expiry, amount)
+
+    def _make_room(self) -> None:
+        with self._evict_lock:
+            if self.key_count < self.max_keys:
+                return
+            now = time.time()
+            for key in [k for k, expires_at in list(self.expirations.items()) if expires_at <= now]:
+                self.clear(key)
+            # Moving-window entries are newest first; a key whose newest entry expired is empty
+            for key in [k for k, entries in list(self.events.items()) if not entries or entries[0].expiry <= now]:
+                self.clear(key)
+            if self.key_count < self.max_keys:
+                return
+            excess = self.key_count - self.max_keys + max(1, int(self.max_keys * EVICT_FRACTION))
+            candidates = list(self.expirations.items()) + [
+                (k, entries[0].expiry) for k, entries in list(self.events.items()) if entries
+            ]
+            for key, _ in heapq.nsmallest(excess, candidates, key=lambda item: item[1]):
+                self.clear(key)
+                self.evictions += 1
+
+
+class _Lease:
+    __slots__ = ('next', 'end', 'expires_at', 'batch')
+
+    def __init__(self, next_slot: int, end: int, expires_at: float, batch: int):
+        self.next = next_slot
+        self.end = end
+        self.expires_at = expires_at
+        self.batch = batch
+
+
+class PreallocatingStorage(Storage):
+    """Fixed-window counter storage that reserves hits from a shared store in blocks."""
+
+    STORAGE_SCHEME = None
+
+    def __init__(self, uri: str = None, wrap_exceptions: bool = False, reserve_batch: int = DEFAULT_RESERVE_BATCH, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.reserve_batch = max(1, int(reserve_batch))
+        self._leases: Dict[str, _Lease] = {}
+        self._lease_lock = threading.Lock()
+        self.round_trips = 0
+
+    def _reserve(self, key: str, expiry: float, amount: int) -> Tuple[int, float]:
+        """Atomically add `amount` to the shared counter. Returns (new count, window expiry)."""
+        raise NotImplementedError
+
+    def _read(self, key: str) -> Tuple[int, float]:
+        """Return the shared (count, window expiry) for a key, (0, 0) if absent or expired."""
+        raise NotImplementedError
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        with self._lease_lock:
+            lease = self._leases.get(key)
+            if lease is not None and lease.expires_at > now and lease.next + amount - 1 <= lease.end:
+                value = lease.next + amount - 1
+                lease.next += amount
+                return value
+
+        # Slow path: reserve a new block from the shared store outside the lock
+        batch = min(self.reserve_batch, lease.batch * 2) if lease is not None and lease.expires_at > now else 1
+        size = max(batch, amount)
+        end, expires_at = self._reserve(key, expiry, size)
+        self.round_trips += 1
+        start = end - size + 1
+
+        with self._lease_lock:
+            if len(self._leases) >= MAX_LOCAL_LEASES:
+                self._purge_leases(now)
+            self._leases[key] = _Lease(start + amount, end, expires_at, batch)
+        return start + amount - 1
+
+    def get(self, key: str) -> int:
+        return self._read(key)[0]
+
+    def get_expiry(self, key: str) -> float:
+        expires_at = self._read(key)[1]
+        return expires_at or time.time()
+
+    def clear(self, key: str) -> None:
+        with self._lease_lock:
+            self._leases.pop(key, None)
+        self._delete(key)
+
+    def _delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def _purge_leases(self, now: float) -> None:
+        # Caller holds the lease lock
+        expired = [k for k, lease in self._leases.items() if lease.expires_at <= now]
+        for k in expired:
+            del self._leases[k]
+        if len(self._leases) >= MAX_LOCAL_LEASES:
+            self._leases.clear()
+
+
+def _gevent_threadpool():
+    """The gevent hub's thread pool when gevent has patched threading, else None."""
+    monkey = sys.modules.get("gevent.monkey")
+    if monkey is None or not monkey.is_module_patched("threading"):
+        return None
+    import gevent
+    return gevent.get_hub().threadpool
+
+
+class SQLiteStorage(PreallocatingStorage):
+    """
+    Shared counters in a local SQLite database file (WAL mode).
+
+    Each process uses one connection, one statement at a time. Under gevent
+    the statements run on the hub's thread pool, so a write waiting on the
+    file lock blocks only the calling greenlet rather than the whole worker.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, reserve_batch: int = DEFAULT_RESERVE_BATCH, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, reserve_batch=reserve_batch, **options)
+        # SQLAlchemy-style: sqlite:///relative.db or sqlite:////absolute/path.db
+        self.path = uri[len("sqlite:///"):] or ":memory:"
+        self._db_lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self) -> sqlite3.Connection:
+        # Caller holds _db_lock
+        if self._conn is None or self._pid != os.getpid():
+            # Connections must not be shared with forked worker processes
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _execute(self, sql: str, params=(), fetch: bool = False):
+        """Run one statement; returns its first row when `fetch`, else its rowcount."""
+        def run():
+            cursor = self._connection().execute(sql, params)
+            return cursor.fetchone() if fetch else cursor.rowcount
+
+        with self._db_lock:
+            pool = _gevent_threadpool()
+            return run() if pool is None else pool.apply(run)
+
+    def _reserve(self, key: str, expiry: float, amount: int) -> Tuple[int, float]:
+        now = time.time()
+        row = self._execute(
+            """
+            INSERT INTO counters (key, count, expires_at) VALUES (:key, :amount, :new_expiry)
+            ON CONFLICT(key) DO UPDATE SET
+                count = CASE WHEN expires_at <= :now THEN :amount ELSE count + :amount END,
+                expires_at = CASE WHEN expires_at <= :now THEN :new_expiry ELSE expires_at END
+            RETURNING count, expires_at
+            """,
+            {"key": key, "amount": amount, "now": now, "new_expiry": now + expiry},
+            fetch=True,
+        )
+        if self.round_trips % SQLITE_PURGE_EVERY == SQLITE_PURGE_EVERY - 1:
+            self.purge_expired()
+        return row[0], row[1]
+
+    def _read(self, key: str) -> Tuple[int, float]:
+        row = self._execute(
+            "SELECT count, expires_at FROM counters WHERE key = ? AND expires_at > ?", (key, time.time()), fetch=True
+        )
+        return (row[0], row[1]) if row else (0, 0.0)
+
+    def _delete(self, key: str) -> None:
+        self._execute("DELETE FROM counters WHERE key = ?", (key,))
+
+    def check(self) -> bool:
+        try:
+            self._execute("SELECT 1", fetch=True)
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        with self._lease_lock:
+            self._leases.clear()
+        return self._execute("DELETE FROM counters")
+
+    def purge_expired(self) -> int:
+        """Delete counters whose window has passed. Safe to call from any worker."""
+        return self._execute("DELETE FROM counters WHERE expires_at <= ?", (time.time(),))
+
+
+# INCRBY the counter, start the window on first use, return (count, ms left in window)
+_RESERVE_SCRIPT = """
+local count = redis.call('INCRBY', KEYS[1], ARGV[1])
+if count == tonumber(ARGV[1]) then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return {count, redis.call('PTTL', KEYS[1])}
+"""
+
+
+class RedisPreallocatingStorage(PreallocatingStorage):
+    """Shared counters on a Redis-compatible server, reserved with a single Lua call."""
+
+    STORAGE_SCHEME = ["prealloc+redis", "prealloc+rediss"]
+    DEPENDENCIES = ["redis"]
+    PREFIX = "FLUX_LIMITER"
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, reserve_batch: int = DEFAULT_RESERVE_BATCH, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, reserve_batch=reserve_batch)
+        redis = self.dependencies["redis"].module
+        self._client = redis.from_url(uri[len("prealloc+"):], **options)
+        self._reserve_script = self._client.register_script(_RESERVE_SCRIPT)
+
+    @property
+    def base_exceptions(self):
+        return self.dependencies["redis"].module.RedisError
+
+    def _key(self, key: str) -> str:
+        return f"{self.PREFIX}:{key}"
+
+    def _reserve(self, key: str, expiry: float, amount: int) -> Tuple[int, float]:
+        count, ttl_ms = self._reserve_script(keys=[self._key(key)], args=[amount, int(expiry * 1000)])
+        return int(count), time.time() + max(int(ttl_ms), 0) / 1000.0
+
+    def _read(self, key: str) -> Tuple[int, float]:
+        pipe = self._client.pipeline()
+        pipe.get(self._key(key))
+        pipe.pttl(self._key(key))
+        count, ttl_ms = pipe.execute()
+        if count is None or ttl_ms is None or int(ttl_ms) <= 0:
+            return 0, 0.0
+        return int(count), time.time() + int(ttl_ms) / 1000.0
+
+    def _delete(self, key: str) -> None:
+        self._client.delete(self._key(key))
+
+    def check(self) -> bool:
+        try:
+            return bool(self._client.ping())
+        except self.base_exceptions:
+            return False
+
+    def reset(self) -> int:
+        with self._lease_lock:
+            self._leases.clear()
+        keys = list(self._client.scan_iter(f"{self.PREFIX}:*"))
+        return self._client.delete(*keys) if keys else 0
@@ -0,0 +1,180 @@
+import os
+import re
+import time
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, FrozenSet
+
+from api.utils.lead_stream import LEAD_MARKER
+
+logger = logging.getLogger(__name__)
+
+# Defaults can be overridden through the environment (see ResponseCache.from_env)
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_SIMILARITY_THRESHOLD = 0.0  # 0 disables the lexical-similarity lookup
+
+
+def normalize_message(message: str) -> str:
+    """Normalize a user message so trivially different phrasings share a cache key."""
+    text = unicodedata.normalize('NFKC', message or '').lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def _trigrams(normalized: str) -> FrozenSet[str]:
+    """Character trigrams of a normalized message, used for the similarity lookup."""
+    padded = f"  {normalized} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def is_context_free(conversation_history: List[Dict[str, str]]) -> bool:
+    """True when the user has not said anything yet (only the greeting may be present)."""
+    return not any(item.get('role') == 'user' for item in conversation_history or [])
+
+
+class _CacheEntry:
+    __slots__ = ('response', 'expires_at', 'trigrams')
+
+    def __init__(self, response: str, expires_at: float, trigrams: FrozenSet[str]):
+        self.response = response
+        self.expires_at = expires_at
+        self.trigrams = trigrams
+
+
+class ResponseCache:
+    """
+    In-process cache of assistant replies to first-turn (context-free) questions.
+
+    Lookups try the normalized message first and, if a similarity threshold is set,
+    fall back to the closest cached question by character-trigram Jaccard similarity.
+    Entries expire after `ttl` seconds and the least recently used entry is evicted
+    once `max_entries` is reached.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        clock=time.monotonic
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self._clock = clock
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "similar_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "rejected": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        """Build a cache configured from CHAT_CACHE_* environment variables."""
+        return cls(
+            ttl=float(os.environ.get('CHAT_CACHE_TTL', DEFAULT_TTL_SECONDS)),
+            max_entries=int(os.environ.get('CHAT_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)),
+            similarity_threshold=float(os.environ.get('CHAT_CACHE_SIMILARITY', DEFAULT_SIMILARITY_THRESHOLD)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def get(self, user_message: str) -> Optional[str]:
+        """Return a cached reply for the message, or None on a miss."""
+        if not self.enabled:
+            return None
+
+        key = normalize_message(user_message)
+        if not key:
+            return None
+
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                entry = None
+
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry.response
+
+            if self.similarity_threshold > 0:
+                similar_key = self._find_similar(_trigrams(key), now)
+                if similar_key is not None:
+                    self._entries.move_to_end(similar_key)
+                    self._stats["similar_hits"] += 1
+                    return self._entries[similar_key].response
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, user_message: str, response: str) -> bool:
+        """Cache a reply. Replies carrying the lead marker are never stored."""
+        if not self.enabled or not response:
+            return False
+
+        if LEAD_MARKER in response:
+            with self._lock:
+                self._stats["rejected"] += 1
+            return False
+
+        key = normalize_message(user_message)
+        if not key:
+            return False
+
+        now = self._clock()
+        with self._lock:
+            self._purge_expired(now)
+            self._entries[key] = _CacheEntry(response, now + self.ttl, _trigrams(key))
+            self._entries.move_to_end(key)
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the cache counters, including the overall hit rate."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["similar_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["similar_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _find_similar(self, trigrams: FrozenSet[str], now: float) -> Optional[str]:
+        # Caller holds the lock. The cache is small, so a linear scan is cheap.
+        best_key, best_score = None, self.similarity_threshold
+        for key, entry in self._entries.items():
+            if entry.expires_at <= now:
+                continue
+            union = len(trigrams | entry.trigrams)
+            score = len(trigrams & entry.trigrams) / union if union else 0.0
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def _purge_expired(self, now: float) -> None:
+        # Caller holds the lock
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        self._stats["expirations"] += len(expired)
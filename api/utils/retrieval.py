@@ -0,0 +1,195 @@
+"""
+Local BM25 retrieval over Fluxstream content.
+
+The chat system prompt only carries the persona and the lead-capture rules;
+company, service and consultation details live in api/knowledge/*.md and the
+few passages relevant to a turn are passed to the model as retrieved context.
+
+The index is built once per process on first use (a few milliseconds for the
+bundled content). It can also be built ahead of time with
+scripts/build_knowledge_index.py and loaded from KNOWLEDGE_INDEX_PATH.
+Extra plain-text or markdown sources can be added with KNOWLEDGE_EXTRA_SOURCES
+(comma separated paths), e.g. scripts/prd.txt.
+"""
+
+import os
+import re
+import json
+import math
+import logging
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_DIR = Path(__file__).resolve().parent.parent / "knowledge"
+TOP_K = int(os.environ.get('KNOWLEDGE_TOP_K', 2))
+MIN_SCORE = float(os.environ.get('KNOWLEDGE_MIN_SCORE', 1.0))
+MAX_CONTEXT_CHARS = int(os.environ.get('KNOWLEDGE_MAX_CHARS', 1500))
+# Passages longer than this many words are split
+MAX_PASSAGE_WORDS = 160
+
+STOPWORDS = frozenset("""
+a about an and are as at be but by can could do does for from get had has have how i if in into is it its
+me my of on or our so that the their them there these they this to us was we what when where which who
+why will with would you your yours i'm it's can't don't
+hi hello hey thanks thank yes yeah ok okay please want like tell know just
+""".split())
+
+HEADING_RE = re.compile(r"^(#{1,3})\s+(.*)$")
+WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def _stem(word: str) -> str:
+    # Light suffix stripping so "automations"/"automating"/"automated" meet "automation"
+    for suffix, replacement in (("ies", "y"), ("ing", ""), ("ed", ""), ("s", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)] + replacement
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(w) for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS]
+
+
+class Passage:
+    __slots__ = ('title', 'text', 'source')
+
+    def __init__(self, title: str, text: str, source: str):
+        self.title = title
+        self.text = text
+        self.source = source
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"title": self.title, "text": self.text, "source": self.source}
+
+
+def split_passages(text: str, source: str) -> List[Passage]:
+    """Split markdown/plain text into passages at headings, capping each at MAX_PASSAGE_WORDS."""
+    passages = []
+    headings: List[str] = []
+    body: List[str] = []
+
+    def flush():
+        content = "\n".join(body).strip()
+        body.clear()
+        if not content:
+            return
+        title = " > ".join(h for h in headings if h)
+        words = content.split()
+        if len(words) <= MAX_PASSAGE_WORDS:
+            passages.append(Passage(title, content, source))
+            return
+        # Long sections are split on paragraph boundaries
+        chunk: List[str] = []
+        for paragraph in re.split(r"\n\s*\n", content):
+            if chunk and len(" ".join(chunk).split()) + len(paragraph.split()) > MAX_PASSAGE_WORDS:
+                passages.append(Passage(title, "\n\n".join(chunk), source))
+                chunk = []
+            chunk.append(paragraph.strip())
+        if chunk:
+            passages.append(Passage(title, "\n\n".join(chunk), source))
+
+    for line in text.splitlines():
+        match = HEADING_RE.match(line.strip())
+        if match:
+            flush()
+            level = len(match.group(1))
+            headings[level - 1:] = [match.group(2).strip()]
+            continue
+        body.append(line)
+    flush()
+    return passages
+
+
+class BM25Index:
+    """Okapi BM25 over an inverted index of passages (titles count toward each passage's terms)."""
+
+    def __init__(self, passages: List[Passage], k1: float = 1.2, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.lengths: List[int] = []
+        for index, passage in enumerate(passages):
+            # Titles are counted twice so a passage about a topic outranks one that only mentions it
+            terms = Counter(tokenize(f"{passage.title}\n{passage.title}\n{passage.text}"))
+            self.lengths.append(sum(terms.values()))
+            for term, freq in terms.items():
+                self.postings.setdefault(term, []).append((index, freq))
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        n = len(passages)
+        self.idf = {term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5)) for term, docs in self.postings.items()}
+
+    def search(self, query: str, k: int = TOP_K, min_score: float = MIN_SCORE) -> List[Tuple[Passage, float]]:
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for index, freq in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[index] / self.avg_length)
+                scores[index] = scores.get(index, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [(self.passages[i], score) for i, score in ranked[:k] if score >= min_score]
+
+    def save(self, path) -> None:
+        """Write the passages; postings are rebuilt on load, which is cheap."""
+        with open(path, "w", encoding="utf-8") as out:
+            json.dump({"k1": self.k1, "b": self.b, "passages": [p.to_dict() for p in self.passages]}, out)
+
+    @classmethod
+    def load(cls, path) -> "BM25Index":
+        with open(path, encoding="utf-8") as src:
+            data = json.load(src)
+        return cls([Passage(**p) for p in data["passages"]], k1=data["k1"], b=data["b"])
+
+
+def knowledge_sources() -> List[Path]:
+    sources = sorted(KNOWLEDGE_DIR.glob("*.md"))
+    extra = os.environ.get('KNOWLEDGE_EXTRA_SOURCES', '')
+    sources.extend(Path(p.strip()) for p in extra.split(',') if p.strip())
+    return sources
+
+
+def build_index(sources: Optional[List[Path]] = None) -> BM25Index:
+    passages = []
+    for path in sources if sources is not None else knowledge_sources():
+        try:
+            passages.extend(split_passages(Path(path).read_text(encoding="utf-8"), Path(path).name))
+        except OSError as e:
+            logger.warning(f"Skipping knowledge source {path}: {e}")
+    return BM25Index(passages)
+
+
+@lru_cache(maxsize=1)
+def get_index() -> BM25Index:
+    """The process-wide index: the prebuilt KNOWLEDGE_INDEX_PATH if set, otherwise built from the sources."""
+    prebuilt = os.environ.get('KNOWLEDGE_INDEX_PATH')
+    if prebuilt:
+        try:
+            return BM25Index.load(prebuilt)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not load knowledge index {prebuilt}, rebuilding: {e}")
+    index = build_index()
+    logger.info(f"Built knowledge index: {len(index.passages)} passages, {len(index.postings)} terms")
+    return index
+
+
+def retrieve_context(user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> Optional[str]:
+    """Relevant knowledge passages for a chat turn, formatted for the prompt, or None if nothing matches."""
+    # The assistant's last turn gives short replies ("yes, tell me more") their topic
+    last_reply = next((m.get("content") or "" for m in reversed(conversation_history or []) if m.get("role") == "assistant"), "")
+    query = f"{user_message} {last_reply[-300:]}"
+
+    sections = []
+    used = 0
+    for passage, _ in get_index().search(query):
+        section = f"{passage.title}:\n{passage.text}" if passage.title else passage.text
+        if used + len(section) > MAX_CONTEXT_CHARS and sections:
+            break
+        sections.append(section[:MAX_CONTEXT_CHARS])
+        used += len(section)
+    return "\n\n".join(sections) or None
@@ -0,0 +1,199 @@
+"""
+Lightweight per-request tracing.
+
+Code marks stages with ``with span("llm"):``. When TRACING_ENABLED=1, each
+Flask request gets a trace; on the way out its stage timings are added as a
+``Server-Timing`` header and logged as one JSON line on the ``api.trace``
+logger. With TRACE_SAMPLE_RATE > 0, that fraction of traces is also appended
+to TRACE_EXPORT_PATH (JSON Lines) by a background thread.
+
+When tracing is disabled, or outside a request, ``span()`` returns a shared
+no-op context manager after a single context-variable lookup.
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+trace_logger = logging.getLogger("api.trace")
+
+TRACING_ENABLED = os.environ.get('TRACING_ENABLED', '0') == '1'
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0.0))
+TRACE_EXPORT_PATH = os.environ.get('TRACE_EXPORT_PATH', 'traces.jsonl')
+
+
+class Trace:
+    """Spans recorded while handling one request."""
+
+    __slots__ = ('trace_id', 'name', 'started', 'spans')
+
+    def __init__(self, name: str):
+        self.trace_id = os.urandom(8).hex()
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+
+    def record(self, name: str, started: float, duration: float, attrs: Dict[str, Any]) -> None:
+        entry = {"name": name, "start_ms": round((started - self.started) * 1000, 3), "dur_ms": round(duration * 1000, 3)}
+        if attrs:
+            entry.update(attrs)
+        self.spans.append(entry)  # list.append is atomic, so hedged worker threads can record too
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Total milliseconds per span name, in first-seen order."""
+        totals: Dict[str, float] = {}
+        for entry in self.spans:
+            totals[entry["name"]] = totals.get(entry["name"], 0.0) + entry["dur_ms"]
+        return totals
+
+    def to_dict(self, **extra) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "spans": self.spans,
+            **extra,
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'attrs', 'started')
+
+    def __init__(self, trace: Trace, name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.trace.record(self.name, self.started, time.perf_counter() - self.started, self.attrs)
+        return False
+
+    def set(self, **attrs) -> None:
+        """Attach attributes (e.g. provider, status) to the span."""
+        self.attrs.update(attrs)
+
+
+def span(name: str, **attrs):
+    """Time a stage of the current request. A no-op when no trace is active."""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, name, attrs)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(name: str):
+    """Make a new trace current for the enclosed block (used outside Flask, e.g. in tests)."""
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def server_timing_header(trace: Trace, total_ms: float) -> str:
+    parts = [f"{name};dur={dur:.1f}" for name, dur in trace.stage_totals().items()]
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
+
+
+class SamplingExporter:
+    """Appends a random sample of traces to a JSON Lines file from a background thread."""
+
+    def __init__(self, path: str, sample_rate: float, max_queue: int = 1000):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.dropped = 0
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def offer(self, record: Dict[str, Any]) -> bool:
+        if random.random() >= self.sample_rate:
+            return False
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self) -> None:
+        while True:
+            record = self._queue.get()
+            try:
+                with open(self.path, "a", encoding="utf-8") as out:
+                    out.write(json.dumps(record) + "\n")
+            except OSError as e:
+                logger.error(f"Could not export trace to {self.path}: {e}")
+
+
+def init_app(app, enabled: bool = TRACING_ENABLED) -> None:
+    """Register request hooks that trace every request of `app`."""
+    if not enabled:
+        return
+
+    from flask import g, request
+
+    exporter = SamplingExporter(TRACE_EXPORT_PATH, TRACE_SAMPLE_RATE) if TRACE_SAMPLE_RATE > 0 else None
+
+    @app.before_request
+    def _start_request_trace():
+        trace = Trace(f"{request.method} {request.path}")
+        g._trace_token = _current_trace.set(trace)
+
+    @app.after_request
+    def _finish_request_trace(response):
+        trace = _current_trace.get()
+        if trace is None:
+            return response
+        record = trace.to_dict(status=response.status_code)
+        response.headers["Server-Timing"] = server_timing_header(trace, record["total_ms"])
+        trace_logger.info(json.dumps(record))
+        if exporter is not None:
+            exporter.offer(record)
+        return response
+
+    @app.teardown_request
+    def _clear_request_trace(exc):
+        token = g.pop("_trace_token", None)
+        if token is not None:
+            _current_trace.reset(token)
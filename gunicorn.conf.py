@@ -0,0 +1,43 @@
+"""
+Production server configuration for the Flask API.
+
+Run with:  gunicorn -c gunicorn.conf.py api.index:app   (or ./run-api.sh --prod)
+after:     pip install -r requirements-server.txt      (gunicorn and gevent; not needed on Vercel)
+
+Each worker is a gevent event loop: requests, sockets and the n8n/LLM HTTP
+calls are cooperatively scheduled, so a chat waiting 45 s on the LLM costs a
+greenlet rather than an OS thread and one worker can hold hundreds of
+concurrent chats open. Everything is overridable through the environment.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+
+# Workers are mostly idle waiting on upstream I/O, so a couple per core is plenty
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2, 8)))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+# Lets the app refuse features that keep state in one process (enrichment jobs)
+os.environ['API_WORKER_PROCESSES'] = str(workers)
+# Concurrent requests (greenlets) per worker
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 500))
+
+# Longest legitimate request: 45 s LLM call + 15 s n8n POST, plus headroom
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 90))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically so slow leaks cannot accumulate
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 500))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None  # empty disables
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+# With several workers, per-process memory:// rate limits would multiply the
+# effective limit, so default to the shared SQLite store (one connection per
+# worker, queried on gevent's thread pool). Set before the workers fork and
+# import the app.
+os.environ.setdefault('RATELIMIT_STORAGE_URI', 'sqlite:////tmp/fluxstreams-ratelimit.db')
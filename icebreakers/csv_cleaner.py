@@ -5,12 +5,15 @@ CSV Cleaner Script
 
 Removes rows with empty email addresses from CSV files.
 This ensures all leads have valid email addresses for outreach.
+Also reads and writes .jsonl and gzip/zstd-compressed files (see lead_io.py).
 """
 
 import pandas as pd
 from pathlib import Path
 import os
 
+from lead_io import read_leads, write_leads, find_lead_files, split_name, sibling_path
+
 def clean_csv_file(input_file: str, output_file: str = None) -> dict:
     """
     Clean a CSV file by removing rows with empty email addresses.
@@ -24,7 +27,7 @@ def clean_csv_file(input_file: str, output_file: str = None) -> dict:
     """
     try:
         # Read the CSV file
-        df = pd.read_csv(input_file)
+        df = read_leads(input_file)
         original_count = len(df)
         
         print(f"\n📄 Processing: {Path(input_file).name}")
@@ -51,10 +54,10 @@ def clean_csv_file(input_file: str, output_file: str = None) -> dict:
         # Generate output filename if not provided
         if not output_file:
             input_path = Path(input_file)
-            output_file = input_path.parent / f"{input_path.stem}_cleaned.csv"
+            output_file = sibling_path(input_path.parent, input_path, "_cleaned")
         
         # Save the cleaned data
-        df_cleaned.to_csv(output_file, index=False)
+        write_leads(df_cleaned, output_file)
         print(f"  ✅ Saved to: {output_file}")
         
         return {
@@ -81,7 +84,7 @@ def clean_all_csvs_in_folder(folder_path: str = "input_data"):
         print(f"❌ Folder '{folder_path}' does not exist")
         return
     
-    csv_files = list(folder.glob("*.csv"))
+    csv_files = find_lead_files(folder)
     if not csv_files:
         print(f"❌ No CSV files found in '{folder_path}'")
         return
@@ -97,7 +100,7 @@ def clean_all_csvs_in_folder(folder_path: str = "input_data"):
     
     for csv_file in csv_files:
         # Skip already cleaned files
-        if "_cleaned" in csv_file.stem:
+        if "_cleaned" in split_name(csv_file)[0]:
             continue
             
         result = clean_csv_file(str(csv_file))
@@ -110,7 +113,7 @@ def clean_all_csvs_in_folder(folder_path: str = "input_data"):
     
     print("\n" + "=" * 50)
     print("📊 SUMMARY:")
-    print(f"  📁 Files processed: {len([f for f in csv_files if '_cleaned' not in f.stem])}")
+    print(f"  📁 Files processed: {len([f for f in csv_files if '_cleaned' not in split_name(f)[0]])}")
     print(f"  📊 Total original rows: {total_original:,}")
     print(f"  ✨ Total final rows: {total_final:,}")
     print(f"  🗑️  Total removed: {total_removed:,}")
@@ -4,12 +4,15 @@ CSV Column Extractor
 ==================
 
 Extracts the first 8 columns from CSV files for lead processing.
+Also reads and writes .jsonl and gzip/zstd-compressed files (see lead_io.py).
 """
 
 import pandas as pd
 from pathlib import Path
 import sys
 
+from lead_io import read_leads, write_leads, sibling_path
+
 def extract_first_8_columns(input_file: str, output_file: str = None):
     """
     Extract the first 8 columns from a CSV file.
@@ -20,7 +23,7 @@ def extract_first_8_columns(input_file: str, output_file: str = None):
     """
     try:
         # Read the CSV
-        df = pd.read_csv(input_file)
+        df = read_leads(input_file)
         print(f"📊 Original file has {len(df.columns)} columns, {len(df)} rows")
         print(f"📋 Original columns: {list(df.columns)}")
         
@@ -32,10 +35,10 @@ def extract_first_8_columns(input_file: str, output_file: str = None):
         # Generate output filename if not provided
         if not output_file:
             input_path = Path(input_file)
-            output_file = f"{input_path.stem}_first_8_cols.csv"
+            output_file = sibling_path(".", input_path, "_first_8_cols")
         
         # Save the filtered data
-        df_filtered.to_csv(output_file, index=False)
+        write_leads(df_filtered, output_file)
         print(f"✅ Saved filtered data to: {output_file}")
         
     except Exception as e:
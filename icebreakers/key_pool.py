@@ -0,0 +1,239 @@
+"""
+A pool of Grok API keys for the enrichers.
+
+With several keys in XAI_API_KEYS (comma separated; XAI_API_KEY is added
+too), each call goes to the key with the most remaining capacity, so
+aggregate throughput is the sum of the keys' rate limits rather than one
+key's.
+
+A key's budget is learned from each response's rate-limit headers
+(x-ratelimit-remaining-requests/-tokens and the matching -reset headers) and
+counted down locally between responses, so a key whose window is spent is
+not handed out again until the window resets. A key is benched:
+- until its window resets, once it has no requests left;
+- for Retry-After (or a doubling back-off) after a 429;
+- for REVOKED_BENCH_SECONDS after a 401/403.
+When every key is benched or spent, callers wait for the first one to come back.
+
+The pool is shared by the enrichers' worker threads: `workers()` calls run at
+once, XAI_KEY_CONCURRENCY (default 2) per key.
+
+Per-key usage is printed with `print_report()` at the end of a run.
+"""
+
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+# Bench after a 429 without Retry-After: doubles per consecutive 429, up to the max
+RATE_LIMIT_BACKOFF_SECONDS = 10.0
+MAX_BACKOFF_SECONDS = 300.0
+# A key the API rejects is retried this much later (it may have been rotated back in)
+REVOKED_BENCH_SECONDS = 900.0
+# How long a call waits for any key to come off the bench
+ACQUIRE_TIMEOUT_SECONDS = 120.0
+# Calls in flight per key when enriching in parallel
+DEFAULT_CONCURRENCY_PER_KEY = 2
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset(value) -> Optional[float]:
+    """Seconds until reset from "20", "1.5s", "6m0s" or "250ms"; None when missing or unreadable."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in parts)
+
+
+def _int_header(headers, name: str) -> Optional[int]:
+    try:
+        return int(float(headers[name]))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def map_in_order(fn: Callable, items: Iterable, workers: int) -> Iterator:
+    """
+    fn(item) for every item, run on `workers` threads and yielded in input order.
+    Calls not yet started are cancelled if the caller stops iterating early.
+    """
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        yield from executor.map(fn, items)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+class ApiKey:
+    """One key's learned budget, bench state and usage counters."""
+
+    def __init__(self, secret: str, index: int):
+        self.secret = secret
+        self.label = f"key {index + 1} (…{secret[-4:]})"
+        self.remaining_requests: Optional[int] = None  # None until a response tells us
+        self.remaining_tokens: Optional[int] = None
+        self.resets_at: Optional[float] = None
+        self.benched_until = 0.0
+        self.bench_reason = ""
+        self.consecutive_429s = 0
+        self.in_flight = 0
+        self.stats = {"requests": 0, "ok": 0, "rate_limited": 0, "rejected": 0, "errors": 0, "tokens": 0, "benched": 0}
+
+    def capacity(self, tokens_per_request: float) -> float:
+        """Calls this key can still take in its current window (inf while unknown)."""
+        requests_left = float("inf") if self.remaining_requests is None else self.remaining_requests
+        if self.remaining_tokens is not None:
+            requests_left = min(requests_left, self.remaining_tokens / max(tokens_per_request, 1.0))
+        return requests_left - self.in_flight
+
+    def spent(self) -> bool:
+        """No requests left in a window whose reset time is known."""
+        return self.remaining_requests is not None and self.remaining_requests <= 0 and self.resets_at is not None
+
+
+class KeyPool:
+    """Thread-safe choice of the API key with the most remaining capacity."""
+
+    def __init__(self, secrets: List[str], clock=time.monotonic, concurrency_per_key: int = DEFAULT_CONCURRENCY_PER_KEY):
+        if not secrets:
+            raise ValueError("KeyPool needs at least one API key")
+        self.keys = [ApiKey(secret, index) for index, secret in enumerate(secrets)]
+        self.concurrency_per_key = max(int(concurrency_per_key), 1)
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._tokens_per_request = 0.0
+        self._headers_seen = False
+
+    @classmethod
+    def from_env(cls) -> Optional["KeyPool"]:
+        """A pool of the keys in XAI_API_KEYS and XAI_API_KEY, or None if neither is set."""
+        secrets = re.split(r"[\s,]+", os.environ.get("XAI_API_KEYS", "")) + [os.environ.get("XAI_API_KEY", "")]
+        unique = list(dict.fromkeys(secret.strip() for secret in secrets if secret.strip()))
+        if not unique:
+            return None
+        return cls(unique, concurrency_per_key=int(os.environ.get("XAI_KEY_CONCURRENCY", DEFAULT_CONCURRENCY_PER_KEY)))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def workers(self) -> int:
+        """How many calls the pool is sized to run at once."""
+        return len(self.keys) * self.concurrency_per_key
+
+    def tracks_rate_limits(self) -> bool:
+        """True once any response carried rate-limit headers, so the pool paces calls itself."""
+        with self._cond:
+            return self._headers_seen
+
+    def _refresh(self, key: ApiKey, now: float) -> None:
+        # Caller holds the lock: forget a spent budget once its window has reset
+        if key.resets_at is not None and now >= key.resets_at:
+            key.remaining_requests = key.remaining_tokens = key.resets_at = None
+
+    def acquire(self, timeout: float = ACQUIRE_TIMEOUT_SECONDS) -> Optional[ApiKey]:
+        """The usable key with the most capacity, waiting while all are benched or spent; None on timeout."""
+        deadline = self._clock() + timeout
+        with self._cond:
+            while True:
+                now = self._clock()
+                for key in self.keys:
+                    self._refresh(key, now)
+                # A spent key would only earn a 429; it is left out until _refresh clears it at resets_at
+                available = [key for key in self.keys if key.benched_until <= now and not key.spent()]
+                if available:
+                    # Ties (e.g. no headers seen yet) go to the least used key
+                    key = max(available, key=lambda k: (k.capacity(self._tokens_per_request), -k.stats["requests"]))
+                    key.in_flight += 1
+                    key.stats["requests"] += 1
+                    if key.remaining_requests is not None:
+                        key.remaining_requests -= 1
+                    return key
+                wait = min(max(key.benched_until, key.resets_at) if key.spent() else key.benched_until
+                           for key in self.keys) - now
+                remaining = deadline - now
+                if remaining <= 0:
+                    return None
+                self._cond.wait(min(wait, remaining))
+
+    def release(self, key: ApiKey, response=None, tokens: int = 0) -> None:
+        """Record the outcome of a call made with `key` (response None for a network error)."""
+        with self._cond:
+            now = self._clock()
+            key.in_flight -= 1
+            if response is None:
+                key.stats["errors"] += 1
+                self._cond.notify_all()
+                return
+
+            headers = response.headers
+            remaining_requests = _int_header(headers, "x-ratelimit-remaining-requests")
+            remaining_tokens = _int_header(headers, "x-ratelimit-remaining-tokens")
+            resets = [parse_reset(headers.get(name)) for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+            resets = [seconds for seconds in resets if seconds is not None]
+            if remaining_requests is not None or remaining_tokens is not None or resets:
+                self._headers_seen = True
+            if remaining_requests is not None:
+                key.remaining_requests = remaining_requests
+            if remaining_tokens is not None:
+                key.remaining_tokens = remaining_tokens
+            if resets:
+                key.resets_at = now + max(resets)
+
+            status = response.status_code
+            if status == 429:
+                key.stats["rate_limited"] += 1
+                key.consecutive_429s += 1
+                backoff = min(RATE_LIMIT_BACKOFF_SECONDS * 2 ** (key.consecutive_429s - 1), MAX_BACKOFF_SECONDS)
+                retry_after = parse_reset(headers.get("retry-after"))
+                self._bench(key, now + (retry_after if retry_after is not None else max(resets or [backoff])), "rate limited")
+            elif status in (401, 403):
+                key.stats["rejected"] += 1
+                self._bench(key, now + REVOKED_BENCH_SECONDS, f"rejected ({status})")
+            elif status >= 400:
+                key.stats["errors"] += 1
+            else:
+                key.stats["ok"] += 1
+                key.stats["tokens"] += tokens
+                key.consecutive_429s = 0
+                if tokens:
+                    # Running mean, used to turn remaining tokens into remaining calls
+                    self._tokens_per_request = tokens if not self._tokens_per_request else 0.9 * self._tokens_per_request + 0.1 * tokens
+                if key.remaining_requests == 0 and key.resets_at is not None:
+                    self._bench(key, key.resets_at, "window spent")
+            self._cond.notify_all()
+
+    def _bench(self, key: ApiKey, until: float, reason: str) -> None:
+        # Caller holds the lock
+        if until > key.benched_until:
+            key.benched_until = until
+            key.bench_reason = reason
+            key.stats["benched"] += 1
+            print(f"  🪑 Benched {key.label} for {until - self._clock():.0f}s: {reason}")
+
+    def report(self) -> List[Dict]:
+        now = self._clock()
+        with self._cond:
+            return [{
+                "key": key.label,
+                **key.stats,
+                "status": f"benched: {key.bench_reason}" if key.benched_until > now else "ok",
+            } for key in self.keys]
+
+    def print_report(self) -> None:
+        print("\n🔑 API key usage:")
+        for row in self.report():
+            print(f"  {row['key']}: {row['requests']} requests, {row['ok']} ok, {row['rate_limited']} rate limited, "
+                  f"{row['rejected']} rejected, {row['errors']} errors, {row['tokens']} tokens, "
+                  f"benched {row['benched']}x ({row['status']})")
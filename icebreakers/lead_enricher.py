@@ -8,51 +8,87 @@ personalized icebreakers generated using the Grok API.
 
 Author: Flux AI Assistant
 Requirements: pandas, requests
-Usage: python lead_enricher.py
+Usage: python lead_enricher.py [--local | --fallback-local | --upgrade-templates] [--profile run.collapsed]
 """
 
 import os
 import sys
 import time
+import argparse
+import importlib.util
 import requests
 import pandas as pd
 from pathlib import Path
 from typing import List, Optional, Dict, Any
 
+from quota_client import batch_quota_client, estimate_tokens
+from profiler import maybe_profile
+from local_icebreakers import SOURCE_COLUMN, LLM_SOURCE, fill_with_templates, template_rows
+from lead_io import read_leads, write_leads, find_lead_files, sibling_path
+from key_pool import KeyPool, map_in_order
+
+FAILED_ICEBREAKER = "Could not generate icebreaker"
+
+PROMPT_MODULE = Path(__file__).resolve().parent.parent / "api" / "utils" / "icebreaker_prompt.py"
+
+
+def _load_prompt_module():
+    # Standard library only and shared with the enrichment API; loaded by path
+    # so the enrichers do not need the API's dependencies installed
+    spec = importlib.util.spec_from_file_location("icebreaker_prompt", PROMPT_MODULE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+create_basic_prompt = _load_prompt_module().create_basic_prompt
+
 
 class LeadEnricher:
     """
     A class to handle the enrichment of lead CSV files with AI-generated icebreakers.
     """
     
-    def __init__(self, input_folder: str = "input_data", output_folder: str = "output_data"):
+    def __init__(self, input_folder: str = "input_data", output_folder: str = "output_data",
+                 local: bool = False, fallback_local: bool = False, upgrade_templates: bool = False):
         """
         Initialize the LeadEnricher with input and output folder paths.
         
         Args:
             input_folder (str): Path to folder containing input CSV files
             output_folder (str): Path to folder for output CSV files
+            local (bool): Fill icebreakers from local templates only, without calling the API
+            fallback_local (bool): Use a template icebreaker when an API call fails
+            upgrade_templates (bool): Also regenerate rows previously filled from templates
         """
         self.input_folder = Path(input_folder)
         self.output_folder = Path(output_folder)
-        self.api_key = None
-        self.api_url = 'https://api.x.ai/v1/chat/completions'
-        self._setup_grok_client()
+        self.local = local
+        self.fallback_local = fallback_local
+        self.upgrade_templates = upgrade_templates
+        self.keys: Optional[KeyPool] = None
+        # Overridable for local stand-ins such as scripts/fake_llm_server.py
+        self.api_url = os.environ.get('XAI_API_URL', 'https://api.x.ai/v1/chat/completions')
+        # Shared-quota permits when a broker is running (QUOTA_BROKER_ADDR); None otherwise
+        self.quota = None if local else batch_quota_client()
+        if not local:
+            self._setup_grok_client()
         self._ensure_output_folder_exists()
     
     def _setup_grok_client(self) -> None:
         """
-        Set up the Grok client using the API key from environment variables.
+        Set up the Grok client using the API key(s) from environment variables
+        (XAI_API_KEY, or several comma-separated keys in XAI_API_KEYS).
         """
-        api_key = os.environ.get("XAI_API_KEY")
-        if not api_key:
+        keys = KeyPool.from_env()
+        if keys is None:
             print("Error: XAI_API_KEY environment variable not found.")
             print("Please set your Grok API key as an environment variable:")
             print("export XAI_API_KEY='your-api-key-here'")
             sys.exit(1)
         
-        self.api_key = api_key
-        print("✓ Grok API client initialized successfully")
+        self.keys = keys
+        print(f"✓ Grok API client initialized successfully ({len(keys)} API key(s))")
     
     def _ensure_output_folder_exists(self) -> None:
         """
@@ -73,7 +109,8 @@ class LeadEnricher:
             print("Please create the folder and add your CSV files.")
             sys.exit(1)
         
-        csv_files = list(self.input_folder.glob("*.csv"))
+        # .csv and .jsonl, optionally .gz or .zst (see lead_io.py)
+        csv_files = find_lead_files(self.input_folder)
         if not csv_files:
             print(f"No CSV files found in '{self.input_folder}'")
             sys.exit(1)
@@ -92,7 +129,6 @@ class LeadEnricher:
             Dict[str, Any]: API response
         """
         headers = {
-            "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
         
@@ -106,12 +142,39 @@ class LeadEnricher:
             "response_format": {"type": "text"}
         }
         
+        permit = None
+        if self.quota:
+            # Waits while live chats are using the shared API key
+            permit = self.quota.acquire(estimate_tokens(payload))
+            if permit is None:
+                return {"error": "Quota broker did not grant a permit in time"}
+
+        # The pooled key with the most rate-limit headroom (see key_pool.py)
+        key = self.keys.acquire()
+        if key is None:
+            if self.quota:
+                self.quota.cancel(permit)
+            return {"error": "Every API key is rate limited or rejected"}
+        headers["Authorization"] = f"Bearer {key.secret}"
+
+        response = None
+        result = {}
         try:
             response = requests.post(self.api_url, headers=headers, json=payload, timeout=45)
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            return {"error": str(e)}
+            result = response.json()
+            if not isinstance(result, dict):
+                result = {"error": f"Unexpected response body: {response.text[:200]}"}
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # ValueError: a 200 whose body is not JSON (a proxy error page, say)
+            result = {"error": str(e)}
+        finally:
+            # Always hand back the key and the permit, or in_flight and the quota leak
+            tokens = (result.get("usage") or {}).get("total_tokens", 0)
+            self.keys.release(key, response, tokens)
+            if self.quota:
+                self.quota.report(permit, tokens)
+        return result
     
     def _generate_icebreaker(self, company_name: str, headline: str) -> str:
         """
@@ -128,34 +191,21 @@ class LeadEnricher:
         company_name = company_name if pd.notna(company_name) else "Unknown Company"
         headline = headline if pd.notna(headline) else "Professional"
         
-        prompt = f'''You are "Flux", an expert AI sales assistant. Your task is to generate a short, casual, one-sentence icebreaker to start a professional outreach email.
-
-**Rules:**
-- The icebreaker must be a single sentence.
-- It should sound natural and human, not like a robot.
-- It should be based on the provided company name and headline.
-- DO NOT use generic phrases like "I was impressed by," "I came across your profile," or "Hope you're having a great day."
-- Be complimentary and specific where possible. If the headline is generic, focus on the company.
-
-**Lead's Information:**
-- Company Name: "{company_name}"
-- Headline: "{headline}"
-
-**Generated Icebreaker:**'''
+        prompt = create_basic_prompt(company_name, headline)
 
         try:
             response = self._call_grok_api(prompt)
             
             if "error" in response:
                 print(f"  ⚠️  API error for {company_name}: {response['error']}")
-                return "Could not generate icebreaker"
+                return FAILED_ICEBREAKER
             
             icebreaker = response["choices"][0]["message"]["content"].strip()
             return icebreaker
             
         except Exception as e:
             print(f"  ⚠️  API error for {company_name}: {str(e)}")
-            return "Could not generate icebreaker"
+            return FAILED_ICEBREAKER
     
     def _process_csv_file(self, csv_file: Path) -> None:
         """
@@ -168,7 +218,7 @@ class LeadEnricher:
         
         try:
             # Read the CSV file
-            df = pd.read_csv(csv_file)
+            df = read_leads(csv_file)
             print(f"  📊 Loaded {len(df)} rows")
             
             # Check for required columns
@@ -187,46 +237,69 @@ class LeadEnricher:
             else:
                 print("  ✅ Found existing 'icebreaker' column")
             
-            # Count how many rows need icebreakers (empty or NaN)
-            empty_icebreakers = df['icebreaker'].isna() | (df['icebreaker'] == "") | (df['icebreaker'].str.strip() == "")
+            # Count how many rows need icebreakers (empty or NaN, plus template rows when upgrading).
+            # An all-empty column is read as floats, so normalise it to strings first
+            df['icebreaker'] = df['icebreaker'].fillna('').astype(str)
+            empty_icebreakers = df['icebreaker'].str.strip() == ""
+            if self.upgrade_templates:
+                empty_icebreakers |= template_rows(df)
             leads_to_process = empty_icebreakers.sum()
             
             if leads_to_process == 0:
                 print("  ℹ️  All leads already have icebreakers. Skipping this file.")
                 return
             
-            print(f"  🎯 Will generate icebreakers for {leads_to_process} leads (skipping {len(df) - leads_to_process} existing)")
-            
-            # Process each row that needs an icebreaker
-            processed_count = 0
-            for index, row in df.iterrows():
-                # Skip if this row already has an icebreaker
-                if pd.notna(row['icebreaker']) and str(row['icebreaker']).strip() != "":
-                    continue
-                
-                company_name = row['employment_history/0/organization_name']
-                headline = row['headline']
-                processed_count += 1
-                
-                print(f"  🔄 Processing lead {processed_count}/{leads_to_process}: {company_name}")
-                
-                # Generate icebreaker
-                icebreaker = self._generate_icebreaker(company_name, headline)
-                df.at[index, 'icebreaker'] = icebreaker
-                
-                # Rate limiting - be nice to the API
-                time.sleep(1)
+            if self.local:
+                filled = fill_with_templates(df, empty_icebreakers)
+                print(f"  ⚡ Filled {filled} icebreakers from local templates (marked '{SOURCE_COLUMN}=template')")
+            else:
+                print(f"  🎯 Will generate icebreakers for {leads_to_process} leads (skipping {len(df) - leads_to_process} existing)")
+                self._generate_with_api(df, empty_icebreakers)
             
             # Save the enriched data
-            output_filename = csv_file.stem + "_with_icebreakers.csv"
-            output_path = self.output_folder / output_filename
+            output_path = sibling_path(self.output_folder, csv_file, "_with_icebreakers")
             
-            df.to_csv(output_path, index=False)
+            write_leads(df, output_path)
             print(f"  ✅ Saved enriched data to: {output_path}")
             
         except Exception as e:
             print(f"  ❌ Error processing {csv_file.name}: {str(e)}")
     
+    def _generate_with_api(self, df: pd.DataFrame, to_process: pd.Series) -> None:
+        """
+        Fill the selected rows with Grok icebreakers, in place.
+        
+        Args:
+            df (pd.DataFrame): The leads
+            to_process (pd.Series): Boolean mask of the rows to generate icebreakers for
+        """
+        upgrading = template_rows(df) & to_process
+        rows = list(df[to_process].iterrows())
+        # API calls run on worker threads sharing the key pool; df is only written here
+        icebreakers = map_in_order(self._generate_paced, [row for _, row in rows], self.keys.workers())
+        for processed_count, ((index, row), icebreaker) in enumerate(zip(rows, icebreakers), 1):
+            print(f"  🔄 Processed lead {processed_count}/{len(rows)}: {row['employment_history/0/organization_name']}")
+            
+            if icebreaker != FAILED_ICEBREAKER:
+                df.at[index, 'icebreaker'] = icebreaker
+                if SOURCE_COLUMN in df.columns:
+                    df.at[index, SOURCE_COLUMN] = LLM_SOURCE
+            elif upgrading[index]:
+                pass  # Keep the template rather than replace it with an error
+            elif self.fallback_local:
+                fill_with_templates(df, df.index == index)
+            else:
+                df.at[index, 'icebreaker'] = icebreaker
+
+    def _generate_paced(self, row: pd.Series) -> str:
+        """Generate one row's icebreaker on a worker thread."""
+        icebreaker = self._generate_icebreaker(row['employment_history/0/organization_name'], row['headline'])
+        # Rate limiting - be nice to the API, unless the quota broker or the key pool's
+        # rate-limit headers are pacing calls
+        if not self.quota and not self.keys.tracks_rate_limits():
+            time.sleep(1)
+        return icebreaker
+    
     def run(self) -> None:
         """
         Main method to run the lead enrichment process.
@@ -243,6 +316,8 @@ class LeadEnricher:
         
         print("\n" + "=" * 50)
         print("🎉 Lead enrichment process completed!")
+        if self.keys:
+            self.keys.print_report()
         print(f"📁 Check your results in: {self.output_folder}")
 
 
@@ -250,8 +325,17 @@ def main():
     """
     Main function to run the lead enricher.
     """
-    enricher = LeadEnricher()
-    enricher.run()
+    parser = argparse.ArgumentParser(description="Enrich every CSV in input_data with Grok icebreakers.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--local', action='store_true', help='fill icebreakers from local templates, with no API calls')
+    mode.add_argument('--fallback-local', action='store_true', help='use a template icebreaker when an API call fails')
+    mode.add_argument('--upgrade-templates', action='store_true', help='regenerate rows filled from templates with the API')
+    parser.add_argument('--profile', metavar='PATH', help='sample the whole run and write flamegraph collapsed stacks to PATH')
+    args = parser.parse_args()
+
+    with maybe_profile(args.profile):
+        enricher = LeadEnricher(local=args.local, fallback_local=args.fallback_local, upgrade_templates=args.upgrade_templates)
+        enricher.run()
 
 
 if __name__ == "__main__":
@@ -9,15 +9,31 @@ generated using the Grok API. Allows for customizable prompts and better cost co
 Author: Flux AI Assistant
 Requirements: pandas, requests
 Usage: python lead_enricher_single.py filename.csv
+       python lead_enricher_single.py filename.csv --shard-dir /mnt/shared   (on each machine)
+       python lead_enricher_single.py filename.csv --shard-dir /mnt/shared --merge
+       python lead_enricher_single.py filename.csv --local          (templates only, no API calls)
+       python lead_enricher_single.py filename.csv --profile run.collapsed
+       python lead_enricher_single.py export.jsonl.gz                (.csv/.jsonl, optionally .gz/.zst)
 """
 
 import os
 import sys
 import time
+import argparse
 import requests
 import pandas as pd
 from pathlib import Path
-from typing import Dict, Any
+from typing import Any, Dict, Iterator, List, Tuple
+
+from quota_client import batch_quota_client, estimate_tokens
+from lead_enricher import create_basic_prompt
+from profiler import maybe_profile
+from local_icebreakers import (
+    SOURCE_COLUMN, LLM_SOURCE, address_by_first_name, fill_with_templates, template_rows
+)
+from shard_leases import ShardLeases, DEFAULT_SHARD_SIZE, DEFAULT_LEASE_SECONDS
+from lead_io import read_leads, write_leads, split_name, sibling_path
+from key_pool import KeyPool, map_in_order
 
 
 # Updated and Enhanced SingleFileLeadEnricher Class
@@ -27,23 +43,44 @@ class SingleFileLeadEnricher:
     A class to handle the enrichment of a single lead CSV file with AI-generated icebreakers.
     """
     
-    def __init__(self, output_folder: str = "output_data", model: str = "grok-3"):
+    PROMPT_VERSIONS = ("v1", "v2")
+
+    def __init__(self, output_folder: str = "output_data", model: str = "grok-3",
+                 local: bool = False, fallback_local: bool = False, upgrade_templates: bool = False,
+                 max_tokens: int = 50, temperature: float = 0.7, prompt_version: str = "v2"):
+        if prompt_version not in self.PROMPT_VERSIONS:
+            raise ValueError(f"Unknown prompt version {prompt_version!r}; expected one of {self.PROMPT_VERSIONS}")
         self.output_folder = Path(output_folder)
         # --- ENHANCEMENT: Make the model a parameter for flexibility ---
         self.model = model
-        self.api_key = None
-        self.api_url = 'https://api.x.ai/v1/chat/completions'
-        self._setup_grok_client()
+        # Sampling settings and prompt (v1: lead_enricher.py's prompt, v2: the enhanced prompt
+        # below), so model configurations can be compared (scripts/bench_icebreakers.py)
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.prompt_version = prompt_version
+        # Local templates instead of the API (local), when a call fails (fallback_local),
+        # and regenerating earlier template rows with the API (upgrade_templates)
+        self.local = local
+        self.fallback_local = fallback_local
+        self.upgrade_templates = upgrade_templates
+        self.keys = None
+        # Overridable for local stand-ins such as scripts/fake_llm_server.py
+        self.api_url = os.environ.get('XAI_API_URL', 'https://api.x.ai/v1/chat/completions')
+        # Shared-quota permits when a broker is running (QUOTA_BROKER_ADDR); None otherwise
+        self.quota = None if local else batch_quota_client()
+        if not local:
+            self._setup_grok_client()
         self._ensure_output_folder_exists()
     
     def _setup_grok_client(self) -> None:
-        api_key = os.environ.get("XAI_API_KEY")
-        if not api_key:
+        # XAI_API_KEY, or several comma-separated keys in XAI_API_KEYS
+        keys = KeyPool.from_env()
+        if keys is None:
             print("Error: XAI_API_KEY environment variable not found.")
             sys.exit(1)
         
-        self.api_key = api_key
-        print("✓ Grok API client initialized successfully")
+        self.keys = keys
+        print(f"✓ Grok API client initialized successfully ({len(keys)} API key(s))")
     
     def _ensure_output_folder_exists(self) -> None:
         self.output_folder.mkdir(exist_ok=True)
@@ -51,7 +88,6 @@ class SingleFileLeadEnricher:
     
     def _call_grok_api(self, prompt: str) -> Dict[str, Any]:
         headers = {
-            "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
         
@@ -59,18 +95,45 @@ class SingleFileLeadEnricher:
             # --- ENHANCEMENT: Use the model parameter ---
             "model": self.model,
             "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.7,
-            # --- ENHANCEMENT: Reduced max_tokens as we want a single, concise sentence ---
-            "max_tokens": 50,
+            "temperature": self.temperature,
+            # --- ENHANCEMENT: Reduced max_tokens (default 50) as we want a single, concise sentence ---
+            "max_tokens": self.max_tokens,
             "response_format": {"type": "text"}
         }
         
+        permit = None
+        if self.quota:
+            # Waits while live chats are using the shared API key
+            permit = self.quota.acquire(estimate_tokens(payload))
+            if permit is None:
+                return {"error": "Quota broker did not grant a permit in time"}
+
+        # The pooled key with the most rate-limit headroom (see key_pool.py)
+        key = self.keys.acquire()
+        if key is None:
+            if self.quota:
+                self.quota.cancel(permit)
+            return {"error": "Every API key is rate limited or rejected"}
+        headers["Authorization"] = f"Bearer {key.secret}"
+
+        response = None
+        result = {}
         try:
             response = requests.post(self.api_url, headers=headers, json=payload, timeout=45)
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            return {"error": str(e)}
+            result = response.json()
+            if not isinstance(result, dict):
+                result = {"error": f"Unexpected response body: {response.text[:200]}"}
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # ValueError: a 200 whose body is not JSON (a proxy error page, say)
+            result = {"error": str(e)}
+        finally:
+            # Always hand back the key and the permit, or in_flight and the quota leak
+            tokens = (result.get("usage") or {}).get("total_tokens", 0)
+            self.keys.release(key, response, tokens)
+            if self.quota:
+                self.quota.report(permit, tokens)
+        return result
 
     # --- ENHANCEMENT: THIS IS THE CRITICAL PROMPT OVERHAUL (V2) ---
     def _create_enhanced_prompt(self, company_name: str, headline: str, first_name: str) -> str:
@@ -101,11 +164,17 @@ class SingleFileLeadEnricher:
         return prompt.strip()
 
     def _generate_icebreaker(self, row: pd.Series) -> str:
+        # Sharded runs read cells as text, where a missing cell is '' rather than NaN
+        row = row.mask(row.eq(''))
         company_name = row.get('employment_history/0/organization_name', '')
         headline = row.get('headline', '')
         first_name = row.get('first_name', '')
         
-        prompt = self._create_enhanced_prompt(company_name, headline, first_name)
+        if self.prompt_version == "v1":
+            prompt = create_basic_prompt(company_name if pd.notna(company_name) else "Unknown Company",
+                                         headline if pd.notna(headline) else "Professional")
+        else:
+            prompt = self._create_enhanced_prompt(company_name, headline, first_name)
         
         try:
             response = self._call_grok_api(prompt)
@@ -117,13 +186,51 @@ class SingleFileLeadEnricher:
             
             # --- ENHANCEMENT: Simplified post-processing. The better prompt requires less fixing. ---
             # A good icebreaker often naturally includes the name. If not, we can add it.
-            if first_name.lower() not in icebreaker.lower():
-                 icebreaker = f"{first_name}, {icebreaker[0].lower() + icebreaker[1:]}"
-            
-            return icebreaker
+            return address_by_first_name(icebreaker, first_name)
             
         except Exception as e:
             return f"SCRIPT_ERROR: {str(e)}"
+
+    def _generate_paced(self, row: pd.Series) -> str:
+        """Generate one row's icebreaker on a worker thread."""
+        icebreaker = self._generate_icebreaker(row)
+        if not self.quota and not self.keys.tracks_rate_limits():
+            time.sleep(1) # Rate limiting (the quota broker or the key pool's rate-limit headers pace calls when available)
+        return icebreaker
+
+    def _enrich_rows(self, df: pd.DataFrame, rows: List[Tuple[Any, pd.Series]], upgrading: pd.Series) -> Iterator:
+        """
+        Fill `rows` (index, row) of `df` in place, from the API or, in local and
+        fallback modes, from templates, yielding each index in order once filled.
+
+        API calls run on `keys.workers()` threads sharing the key pool; `df` is
+        only written from the calling thread. Stopping early cancels calls not
+        yet started.
+        """
+        if self.local:
+            for index, _ in rows:
+                fill_with_templates(df, df.index == index, add_first_name=True)
+                yield index
+            return
+        icebreakers = map_in_order(self._generate_paced, [row for _, row in rows], self.keys.workers())
+        try:
+            for (index, _), icebreaker in zip(rows, icebreakers):
+                self._apply_icebreaker(df, index, icebreaker, upgrading[index])
+                yield index
+        finally:
+            icebreakers.close()
+
+    def _apply_icebreaker(self, df: pd.DataFrame, index, icebreaker: str, upgrading: bool = False) -> None:
+        if not icebreaker.startswith(("API_ERROR:", "SCRIPT_ERROR:")):
+            df.at[index, 'icebreaker'] = icebreaker
+            if SOURCE_COLUMN in df.columns:
+                df.at[index, SOURCE_COLUMN] = LLM_SOURCE
+        elif upgrading:
+            pass  # Keep the template rather than replace it with an error
+        elif self.fallback_local:
+            fill_with_templates(df, df.index == index, add_first_name=True)
+        else:
+            df.at[index, 'icebreaker'] = icebreaker
     
     def process_file(self, csv_file: str, start_row: int = 0, max_rows: int = None) -> None:
         csv_path = Path(csv_file)
@@ -135,16 +242,18 @@ class SingleFileLeadEnricher:
         
         # --- ENHANCEMENT: Robust resume logic ---
         # Check for the latest progress file to resume from
-        progress_files = sorted(self.output_folder.glob(f"{csv_path.stem}_progress_*.csv"), reverse=True)
+        stem, extension = split_name(csv_path)
+        progress_files = sorted(self.output_folder.glob(f"{stem}_progress_*{extension}"), reverse=True)
         if progress_files:
             latest_progress_file = progress_files[0]
             resume_response = input(f"  ❓ Found progress file '{latest_progress_file.name}'. Resume from it? (y/n): ")
             if resume_response.lower() == 'y':
                 csv_path = latest_progress_file
+                stem = split_name(csv_path)[0]
                 print(f"  🔄 Resuming from {csv_path.name}")
 
         try:
-            df = pd.read_csv(csv_path)
+            df = read_leads(csv_path)
             print(f"  📊 Loaded {len(df)} total rows")
             
             if 'icebreaker' not in df.columns:
@@ -165,59 +274,146 @@ class SingleFileLeadEnricher:
             # --- ENHANCEMENT: Simplified way to find rows to process ---
             df['icebreaker'] = df['icebreaker'].fillna('').astype(str)
             to_process_mask = df['icebreaker'].str.strip() == ""
+            upgrading = template_rows(df) & self.upgrade_templates
+            to_process_mask |= upgrading
             leads_to_process_df = df[to_process_mask]
             
             if len(leads_to_process_df) == 0:
                 print("  ℹ️  All leads already have icebreakers. Nothing to do.")
                 return
 
+            if self.local:
+                # No API calls, so the whole file is filled at once
+                filled = fill_with_templates(df, to_process_mask, add_first_name=True)
+                output_path = self.output_folder / (stem.replace('_progress_', '_final_') + "_with_icebreakers" + extension)
+                write_leads(df, output_path)
+                print(f"  ⚡ Filled {filled} icebreakers from local templates (marked '{SOURCE_COLUMN}=template')")
+                print(f"\n  🎉 Success! Enriched data saved to: {output_path}")
+                return
+
             print(f"  🎯 Found {len(leads_to_process_df)} leads needing an icebreaker.")
             
             # (Your cost estimation and confirmation logic is great, keep it as is)
             
             processed_count = 0
-            for index, row in leads_to_process_df.iterrows():
+            rows = list(leads_to_process_df.iterrows())
+            for index in self._enrich_rows(df, rows, upgrading):
+                row = rows[processed_count][1]
                 processed_count += 1
                 company_name = row.get('employment_history/0/organization_name', 'Unknown')
-                print(f"  ⚡ Processing lead {processed_count}/{len(leads_to_process_df)}: {row['first_name']} at {company_name}")
-                
-                icebreaker = self._generate_icebreaker(row)
-                df.at[index, 'icebreaker'] = icebreaker
-                
-                time.sleep(1) # Rate limiting
+                print(f"  ⚡ Processed lead {processed_count}/{len(leads_to_process_df)}: {row['first_name']} at {company_name}")
                 
                 if processed_count % 25 == 0:
                     # --- ENHANCEMENT: Save progress back to the *main* dataframe copy ---
-                    temp_output = self.output_folder / f"{csv_path.stem}_progress_{df.index.get_loc(index) + 1}.csv"
-                    df.to_csv(temp_output, index=False)
+                    temp_output = self.output_folder / f"{stem}_progress_{df.index.get_loc(index) + 1}{extension}"
+                    write_leads(df, temp_output)
                     print(f"  💾 Progress saved: {processed_count} leads processed")
             
-            output_filename = csv_path.stem.replace('_progress_', '_final_') + "_with_icebreakers.csv"
+            output_filename = stem.replace('_progress_', '_final_') + "_with_icebreakers" + extension
             output_path = self.output_folder / output_filename
-            df.to_csv(output_path, index=False)
+            write_leads(df, output_path)
             
             print(f"\n  🎉 Success! Enriched data saved to: {output_path}")
 
         except Exception as e:
             print(f"  ❌ An unexpected error occurred: {str(e)}")
 
+    def process_shards(self, csv_file: str, shared_dir: str, shard_size: int = DEFAULT_SHARD_SIZE,
+                       lease_seconds: float = DEFAULT_LEASE_SECONDS, worker_id: str = None) -> int:
+        """
+        Enrich the file shard by shard alongside other workers sharing `shared_dir`.
+
+        Every machine runs this on its own copy of the same CSV; shards are claimed
+        through lease files (see shard_leases.py), so no two live workers process
+        the same rows and shards of dead workers are picked up once their lease
+        expires. Returns the number of shards this worker completed.
+        """
+        csv_path = Path(csv_file)
+        # Cells stay exactly as in the source, and shard outputs keep its format, so the
+        # merged file round-trips every source column (see merge_shards)
+        df = read_leads(csv_path, as_text=True)
+        if 'icebreaker' not in df.columns:
+            df['icebreaker'] = ""
+        df['icebreaker'] = df['icebreaker'].fillna('').astype(str)
+
+        leases = ShardLeases(shared_dir, csv_path.name, len(df), shard_size, lease_seconds, worker_id,
+                             output_suffix=split_name(csv_path)[1])
+        print(f"\n📄 Sharding: {csv_path.name} ({len(df)} rows, {leases.shard_count} shards of {leases.shard_size}) "
+              f"as worker {leases.worker_id}")
+
+        completed = 0
+        for shard in leases.claim_shards(poll_interval=min(30.0, lease_seconds / 4)):
+            start, end = leases.rows(shard)
+            print(f"  🔒 Claimed shard {shard + 1}/{leases.shard_count} (rows {start + 1}-{end})")
+            shard_df = df.iloc[start:end].copy()
+            lost = False
+            upgrading = template_rows(shard_df) & self.upgrade_templates
+            rows = [(index, row) for index, row in shard_df.iterrows()
+                    if not row['icebreaker'].strip() or upgrading[index]]
+            for index in self._enrich_rows(shard_df, rows, upgrading):
+                if not leases.renew(shard):
+                    lost = True
+                    break
+            if lost:
+                print(f"  ⚠️  Lease on shard {shard + 1} expired and was taken over; leaving it to the other worker")
+                continue
+            leases.complete(shard, lambda path: write_leads(shard_df, path))
+            completed += 1
+            print(f"  💾 Shard {shard + 1} done ({leases.pending()} shards left)")
+
+        print(f"\n  🎉 All shards finished ({completed} by this worker). Merge with --merge.")
+        return completed
+
+    def merge_shards(self, csv_file: str, shared_dir: str) -> Path:
+        """Stitch finished shard outputs back together in original row order."""
+        csv_path = Path(csv_file)
+        total_rows = len(read_leads(csv_path))
+        leases = ShardLeases(shared_dir, csv_path.name, total_rows, output_suffix=split_name(csv_path)[1])
+        merged = pd.concat([read_leads(path, as_text=True) for path in leases.outputs()], ignore_index=True)
+        if len(merged) != total_rows:
+            raise RuntimeError(f"Merged {len(merged)} rows but {csv_path.name} has {total_rows}")
+        output_path = sibling_path(self.output_folder, csv_path, "_with_icebreakers")
+        write_leads(merged, output_path)
+        print(f"\n  🎉 Merged {leases.shard_count} shards into: {output_path}")
+        return output_path
+
 
 def main():
-    # ... (Your main function is perfect, no changes needed) ...
-    if len(sys.argv) < 2:
-        print("Usage: python lead_enricher_single.py <csv_file> [start_row] [max_rows]")
-        sys.exit(1)
-    
-    csv_file = sys.argv[1]
-    # NOTE: With the new resume logic, start_row and max_rows are less critical but can still be used for batching
-    start_row = int(sys.argv[2]) if len(sys.argv) > 2 else 0
-    max_rows = int(sys.argv[3]) if len(sys.argv) > 3 else None
-    
+    parser = argparse.ArgumentParser(description="Enrich a single CSV file with Grok icebreakers.")
+    parser.add_argument('csv_file')
+    parser.add_argument('start_row', nargs='?', type=int, default=0)
+    parser.add_argument('max_rows', nargs='?', type=int, default=None)
+    parser.add_argument('--shard-dir', help='shared directory for multi-machine sharding (run the same command on each machine)')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help=f'rows per shard (default: {DEFAULT_SHARD_SIZE})')
+    parser.add_argument('--lease-seconds', type=float, default=DEFAULT_LEASE_SECONDS,
+                        help=f'lease expiry before a silent worker\'s shard is reclaimed (default: {DEFAULT_LEASE_SECONDS:.0f})')
+    parser.add_argument('--worker-id', help='name for this worker in lease files (default: host:pid)')
+    parser.add_argument('--merge', action='store_true', help='merge finished shards from --shard-dir into output_data')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--local', action='store_true', help='fill icebreakers from local templates, with no API calls')
+    mode.add_argument('--fallback-local', action='store_true', help='use a template icebreaker when an API call fails')
+    mode.add_argument('--upgrade-templates', action='store_true', help='regenerate rows filled from templates with the API')
+    parser.add_argument('--profile', metavar='PATH', help='sample the whole run and write flamegraph collapsed stacks to PATH')
+    args = parser.parse_args()
+    if args.merge and not args.shard_dir:
+        parser.error("--merge needs --shard-dir")
+
     print("🚀 Starting Single File Lead Enrichment with Grok 3")
     print("=" * 60)
     
-    enricher = SingleFileLeadEnricher()
-    enricher.process_file(csv_file, start_row, max_rows)
+    with maybe_profile(args.profile):
+        # Merging only stitches finished shards together, so it needs no API key or quota client
+        enricher = SingleFileLeadEnricher(local=args.local or args.merge, fallback_local=args.fallback_local,
+                                          upgrade_templates=args.upgrade_templates)
+        if args.merge:
+            enricher.merge_shards(args.csv_file, args.shard_dir)
+        elif args.shard_dir:
+            enricher.process_shards(args.csv_file, args.shard_dir, args.shard_size, args.lease_seconds, args.worker_id)
+        else:
+            # NOTE: With the new resume logic, start_row and max_rows are less critical but can still be used for batching
+            enricher.process_file(args.csv_file, args.start_row, args.max_rows)
+        if enricher.keys:
+            enricher.keys.print_report()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,109 @@
+"""
+Reading and writing lead files in every format the lead tools accept.
+
+The format is taken from the file name: `.csv` or `.jsonl` (`.ndjson`), each
+optionally compressed as `.gz` or `.zst`, e.g. `leads.csv.gz`. Compressed
+files are decompressed and compressed as a stream, so a gzipped export never
+has to be unpacked on disk. Outputs keep the input's format:
+`leads.csv.gz` -> `leads_with_icebreakers.csv.gz`.
+
+CSV is parsed with pandas' C parser. pyarrow's multithreaded reader is faster
+on large files but infers column types differently (an all-digit phone column
+becomes integers, for one), so it is opt-in: set LEAD_CSV_ENGINE to `pyarrow`,
+or to `auto` to use it whenever pyarrow is installed (`python` is also
+accepted). `.zst` files need the `zstandard` package.
+"""
+
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+CSV = "csv"
+JSONL = "jsonl"
+FORMATS = {".csv": CSV, ".jsonl": JSONL, ".ndjson": JSONL}
+COMPRESSIONS = {".gz": "gzip", ".zst": "zstd"}
+ENGINES = ("auto", "pyarrow", "c", "python")
+
+LEAD_CSV_ENGINE = os.environ.get('LEAD_CSV_ENGINE', 'c')
+
+
+def split_name(path) -> Tuple[str, str]:
+    """("leads", ".csv.gz") for leads.csv.gz; the extension covers the format and any compression."""
+    name = Path(path).name
+    suffixes = Path(name).suffixes[-2:]
+    if len(suffixes) == 2 and suffixes[0].lower() in FORMATS and suffixes[1].lower() in COMPRESSIONS:
+        extension = "".join(suffixes)
+    else:
+        extension = Path(name).suffix
+    return name[:len(name) - len(extension)], extension
+
+
+def lead_format(path) -> Tuple[str, Optional[str]]:
+    """(format, compression) for a lead file name; raises ValueError for anything else."""
+    extension = split_name(path)[1].lower()
+    base, _, compressed = extension.partition(".")[2].partition(".")
+    file_format = FORMATS.get(f".{base}")
+    if file_format is None or (compressed and f".{compressed}" not in COMPRESSIONS):
+        raise ValueError(f"Unsupported lead file {Path(path).name!r}; expected .csv or .jsonl, optionally .gz or .zst")
+    return file_format, COMPRESSIONS.get(f".{compressed}")
+
+
+def is_lead_file(path) -> bool:
+    try:
+        lead_format(path)
+    except ValueError:
+        return False
+    return True
+
+
+def find_lead_files(folder) -> List[Path]:
+    """Every lead file directly inside `folder`, sorted by name."""
+    return sorted(path for path in Path(folder).iterdir() if path.is_file() and is_lead_file(path))
+
+
+def sibling_path(folder, source, tag: str) -> Path:
+    """`folder`/<source stem><tag><source extension>, e.g. tag "_with_icebreakers"."""
+    stem, extension = split_name(source)
+    return Path(folder) / f"{stem}{tag}{extension}"
+
+
+def resolve_engine(engine: Optional[str] = None) -> str:
+    """The pandas CSV engine to use: `engine`, else LEAD_CSV_ENGINE; "auto" means pyarrow if installed."""
+    engine = engine or LEAD_CSV_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown CSV engine {engine!r}; expected one of {', '.join(ENGINES)}")
+    if engine != "auto":
+        return engine
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return "c"
+    return "pyarrow"
+
+
+def read_leads(path, engine: Optional[str] = None, as_text: bool = False) -> pd.DataFrame:
+    """
+    Load a lead file of any supported format into a DataFrame.
+
+    With `as_text`, CSV cells are read as the exact strings in the file (no
+    type inference, no NA parsing), so a file written back is unchanged:
+    phone numbers and zip codes keep their leading zeros. JSONL keeps its own
+    types either way.
+    """
+    file_format, compression = lead_format(path)
+    if file_format == JSONL:
+        return pd.read_json(path, lines=True, dtype=False, convert_dates=False, compression=compression)
+    if as_text:
+        return pd.read_csv(path, engine=resolve_engine(engine), compression=compression, dtype=str, keep_default_na=False)
+    return pd.read_csv(path, engine=resolve_engine(engine), compression=compression)
+
+
+def write_leads(df: pd.DataFrame, path) -> None:
+    """Save a DataFrame in the format (and compression) given by the file name."""
+    file_format, compression = lead_format(path)
+    if file_format == JSONL:
+        df.to_json(path, orient="records", lines=True, force_ascii=False, compression=compression)
+    else:
+        df.to_csv(path, index=False, compression=compression)
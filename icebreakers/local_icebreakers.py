@@ -0,0 +1,196 @@
+"""
+Instant icebreakers from local templates, with no API call.
+
+Used when the Grok budget is exhausted or the API is too slow (--local), or
+as a per-row fallback when a call fails (--fallback-local). Templates are
+keyed on the lead's `industry` and on the role found in their `headline`;
+every (industry, role) combination's template list is precomputed, and role
+detection is a single compiled regex, so generation is a couple of dict
+lookups and a str.format per row (tens of thousands of rows per second).
+
+The template is picked by a stable hash of the company and headline: reruns
+give the same text, while leads at different companies get varied sentences.
+
+Rows filled this way get "template" in the `icebreaker_source` column so a
+later LLM pass (--upgrade-templates) can replace only those.
+"""
+
+import re
+import zlib
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+SOURCE_COLUMN = "icebreaker_source"
+TEMPLATE_SOURCE = "template"
+LLM_SOURCE = "llm"
+
+# Normalised `industry` value -> template key
+INDUSTRY_ALIASES = {
+    "insurance": "insurance",
+    "real estate": "real_estate",
+    "commercial real estate": "real_estate",
+    "financial services": "finance",
+    "banking": "finance",
+    "investment management": "finance",
+    "marketing & advertising": "marketing",
+    "marketing and advertising": "marketing",
+    "health, wellness & fitness": "health",
+    "hospital & health care": "health",
+    "construction": "construction",
+    "information technology & services": "tech",
+    "computer software": "tech",
+}
+
+INDUSTRY_TEMPLATES = {
+    "insurance": (
+        "Helping clients at {company} make sense of coverage is no small feat in a market where rates keep moving.",
+        "Independent shops like {company} win on responsiveness, and that's where the best agencies are quietly pulling ahead.",
+        "Keeping renewals, quotes and client questions moving at {company} must make for a full inbox most weeks.",
+    ),
+    "real_estate": (
+        "Staying ahead of a market this unpredictable is exactly what sets teams like {company} apart.",
+        "Between showings, follow-ups and closings, the pace at {company} must leave little time for admin.",
+        "Buyers and sellers remember the agent who answers first, and {company} clearly knows the local market.",
+    ),
+    "finance": (
+        "Guiding clients through rate swings like this year's is where {company} really earns its trust.",
+        "Turning a pile of paperwork into a smooth approval is the kind of craft that keeps clients coming back to {company}.",
+        "Clients in today's rate environment need quick, clear answers, and {company} is well placed to give them.",
+    ),
+    "marketing": (
+        "Campaigns that actually move numbers are rare, and {company} seems to have found the formula.",
+        "Keeping clients' messaging sharp across every channel is a serious juggling act at {company}.",
+    ),
+    "health": (
+        "Building a practice around real client results is what makes {company} stand out.",
+        "Keeping bookings, follow-ups and client check-ins running smoothly at {company} is no small job.",
+    ),
+    "construction": (
+        "Keeping bids, crews and timelines in sync at {company} takes real operational discipline.",
+        "Projects that land on schedule are the best advertising, and {company} clearly has a track record.",
+    ),
+    "tech": (
+        "Shipping reliable software at the pace {company} does takes a sharp team.",
+        "Clients expect more automation every year, and {company} looks ready for it.",
+    ),
+}
+
+GENERIC_TEMPLATES = (
+    "The way {company} has built its reputation says a lot about the team behind it.",
+    "Growing a business like {company} while keeping the personal touch is no small achievement.",
+    "It's clear {company} puts real care into how it serves its clients.",
+)
+
+# Role key -> headline pattern; the first pattern to match (in this order) wins
+ROLE_PATTERNS = (
+    ("owner", r"\b(?:owner|founder|co-founder|ceo|president|principal|partner)\b"),
+    ("loan_officer", r"\b(?:loan (?:officer|originator|consultant)|mortgage|nmls|lender)\b"),
+    ("broker", r"\bbroker\b"),
+    ("agent", r"\b(?:agent|realtor|producer)\b"),
+    ("advisor", r"\b(?:advisor|adviser|consultant|planner)\b"),
+    ("leader", r"\b(?:director|vp|vice president|head of|manager|chief)\b"),
+    ("sales", r"\b(?:sales|account executive|business development)\b"),
+)
+
+ROLE_TEMPLATES = {
+    "owner": (
+        "Running {company} means wearing every hat, and it shows in how the business has grown.",
+        "Building {company} from the ground up takes the kind of drive most people only talk about.",
+    ),
+    "loan_officer": (
+        "Getting borrowers from application to closing without surprises is a real skill, and it's clearly a focus at {company}.",
+    ),
+    "broker": (
+        "Finding the right fit for each client instead of a one-size-fits-all policy is what good brokers at {company} do best.",
+    ),
+    "agent": (
+        "Being the agent clients call first takes consistency, and {company} has clearly earned that.",
+    ),
+    "advisor": (
+        "Clients trust advisors who make complex decisions simple, which is clearly the approach at {company}.",
+    ),
+    "leader": (
+        "Keeping a team at {company} aligned and hitting targets is a challenge you seem to handle well.",
+    ),
+    "sales": (
+        "Keeping a pipeline full and moving at {company} takes real persistence.",
+    ),
+}
+
+ROLE_RE = re.compile("|".join(f"(?P<{key}>{pattern})" for key, pattern in ROLE_PATTERNS), re.IGNORECASE)
+ROLE_ORDER = {key: rank for rank, (key, _) in enumerate(ROLE_PATTERNS)}
+
+
+def _compile_index() -> Dict[Tuple[Optional[str], Optional[str]], Tuple[str, ...]]:
+    # Role-specific sentences first, then the industry's, so a known role and industry both contribute
+    index = {}
+    for industry in list(INDUSTRY_TEMPLATES) + [None]:
+        for role in list(ROLE_TEMPLATES) + [None]:
+            templates = ROLE_TEMPLATES.get(role, ()) + INDUSTRY_TEMPLATES.get(industry, ())
+            index[(industry, role)] = templates or GENERIC_TEMPLATES
+    return index
+
+
+TEMPLATE_INDEX = _compile_index()
+
+
+def _text(value) -> str:
+    # pandas hands missing cells over as float NaN
+    return value.strip() if isinstance(value, str) else ""
+
+
+@lru_cache(maxsize=4096)
+def industry_key(industry: str) -> Optional[str]:
+    normalised = " ".join(industry.lower().split())
+    if normalised in INDUSTRY_ALIASES:
+        return INDUSTRY_ALIASES[normalised]
+    return next((key for alias, key in INDUSTRY_ALIASES.items() if alias in normalised), None)
+
+
+@lru_cache(maxsize=16384)
+def role_key(headline: str) -> Optional[str]:
+    matches = [m.lastgroup for m in ROLE_RE.finditer(headline)]
+    return min(matches, key=ROLE_ORDER.__getitem__) if matches else None
+
+
+def local_icebreaker(company_name, headline, industry=None) -> str:
+    """A one-sentence icebreaker for the lead from the template index."""
+    company = _text(company_name) or "your company"
+    headline = _text(headline)
+    templates = TEMPLATE_INDEX[(industry_key(_text(industry)), role_key(headline))]
+    choice = zlib.crc32(f"{company}|{headline}".encode("utf-8")) % len(templates)
+    return templates[choice].format(company=company)
+
+
+def address_by_first_name(icebreaker: str, first_name) -> str:
+    """Lead with the first name unless the sentence already uses it (as the single-file enricher does)."""
+    first_name = _text(first_name)
+    if not first_name or first_name.lower() in icebreaker.lower():
+        return icebreaker
+    return f"{first_name}, {icebreaker[0].lower() + icebreaker[1:]}"
+
+
+def fill_with_templates(df, mask, add_first_name: bool = False) -> int:
+    """Fill the DataFrame rows selected by `mask` with template icebreakers and mark them; returns the count."""
+    rows = df.loc[mask]
+    industries = rows["industry"] if "industry" in df.columns else [None] * len(rows)
+    icebreakers = [
+        local_icebreaker(company, headline, industry)
+        for company, headline, industry in zip(rows["employment_history/0/organization_name"], rows["headline"], industries)
+    ]
+    if add_first_name and "first_name" in df.columns:
+        icebreakers = [address_by_first_name(text, name) for text, name in zip(icebreakers, rows["first_name"])]
+    if SOURCE_COLUMN not in df.columns:
+        df[SOURCE_COLUMN] = ""
+    df[SOURCE_COLUMN] = df[SOURCE_COLUMN].fillna("").astype(str)
+    df.loc[mask, "icebreaker"] = icebreakers
+    df.loc[mask, SOURCE_COLUMN] = TEMPLATE_SOURCE
+    return len(icebreakers)
+
+
+def template_rows(df):
+    """Mask of rows whose icebreaker came from a template (all False when nothing was ever marked)."""
+    if SOURCE_COLUMN not in df.columns:
+        rows = df.index.to_series()
+        return rows != rows
+    return df[SOURCE_COLUMN].fillna("").astype(str) == TEMPLATE_SOURCE
@@ -0,0 +1,38 @@
+"""
+Whole-run profiling for the enrichers (--profile), using the API's stack sampler.
+
+Writes collapsed stacks ("frame;frame;frame count" per line) that
+flamegraph.pl, inferno-flamegraph or https://www.speedscope.app render as a
+flamegraph, and prints how the run's wall time splits between packages
+(pandas, requests, the enricher itself, ...).
+"""
+
+import importlib.util
+from contextlib import contextmanager
+from pathlib import Path
+
+PROFILING_MODULE = Path(__file__).resolve().parent.parent / "api" / "utils" / "profiling.py"
+
+
+def _load_profiling_module():
+    # Standard library only, like the quota broker; loaded by path so the
+    # enrichers do not need the API's dependencies installed
+    spec = importlib.util.spec_from_file_location("profiling", PROFILING_MODULE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@contextmanager
+def maybe_profile(path: str = None):
+    """Profile the block into `path` when given; a no-op otherwise."""
+    if not path:
+        yield None
+        return
+    profiling = _load_profiling_module()
+    with profiling.profile_run(path) as sampler:
+        yield sampler
+    print(f"\n⏱️  Profile: {sampler.samples} samples over {sampler.elapsed:.1f}s written to {path}")
+    for package, share in sampler.summary():
+        print(f"  {share:6.1%}  {share * sampler.elapsed:7.1f}s  {package}")
+    print("  Render with flamegraph.pl, inferno-flamegraph or https://www.speedscope.app")
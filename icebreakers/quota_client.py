@@ -0,0 +1,36 @@
+"""
+Batch-priority access to the shared quota broker (see api/utils/quota_broker.py).
+
+The enrichers share XAI_API_KEY with the website chatbot. When QUOTA_BROKER_ADDR
+is set they ask the broker for a permit before every Grok call, so live chats
+are served first and enrichment uses whatever capacity is left.
+"""
+
+import importlib.util
+from pathlib import Path
+
+BROKER_MODULE = Path(__file__).resolve().parent.parent / "api" / "utils" / "quota_broker.py"
+
+
+def _load_broker_module():
+    # The broker module only uses the standard library; load it by path so the
+    # enrichers do not need the API's dependencies installed
+    spec = importlib.util.spec_from_file_location("quota_broker", BROKER_MODULE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+quota_broker = _load_broker_module() if BROKER_MODULE.exists() else None
+
+
+def batch_quota_client():
+    """A batch-priority broker client, or None when no broker is configured."""
+    if quota_broker is None:
+        return None
+    return quota_broker.client_from_env(quota_broker.BATCH)
+
+
+def estimate_tokens(payload: dict) -> int:
+    """Rough token cost of a chat-completions payload, for the permit request."""
+    return len(str(payload.get("messages", ""))) // 4 + int(payload.get("max_tokens", 0))
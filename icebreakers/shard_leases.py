@@ -0,0 +1,234 @@
+"""
+Coordinator-free sharding of one lead file across several machines.
+
+Workers on different boxes point at the same shared directory (an NFS or
+other network mount that supports hard links). The input's rows are cut into
+fixed-size shards and each worker repeatedly claims the next unfinished shard
+by creating its lease file (exclusively, via link(), so it is never seen
+half-written), processes it, writes the shard's output and releases the lease:
+
+    <shared>/<file stem>.shards/
+        manifest.json          source name, row count and shard size (first worker writes it)
+        shard_00003.lease      {"worker": "box-b:4121", "expires": 1718000000.0}
+        shard_00003.csv        finished output (written atomically, so it exists only when complete;
+                               the suffix is `output_suffix`, e.g. .jsonl.gz to keep the input's format)
+
+Leases expire after `lease_seconds` unless renewed, which workers do after
+every row; a shard whose worker died is therefore picked up by another worker
+once its lease runs out. Lease times are wall-clock times compared across
+machines, so keep `lease_seconds` well above any clock skew between hosts, and
+above the longest a single row can take: with a quota broker running, a row
+may wait up to QUOTA_BATCH_TIMEOUT (300 s by default) for a permit before its
+API call even starts, hence the 900 s default.
+
+Delivery is at-least-once: a worker that stalls past its lease may finish a
+shard another worker has also finished. Shard outputs are replaced atomically
+and cover the same rows, so the duplicate is harmless.
+"""
+
+import os
+import json
+import time
+import socket
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+DEFAULT_SHARD_SIZE = 100
+DEFAULT_LEASE_SECONDS = 900.0
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _read_json(path: Path) -> Optional[dict]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+class ShardLeases:
+    """Lease-based claiming of row shards of one input file in a shared directory."""
+
+    def __init__(
+        self,
+        shared_dir,
+        source_name: str,
+        total_rows: int,
+        shard_size: int = DEFAULT_SHARD_SIZE,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        worker_id: Optional[str] = None,
+        clock=time.time,
+        output_suffix: str = ".csv"
+    ):
+        self.directory = Path(shared_dir) / f"{Path(source_name).stem}.shards"
+        self.output_suffix = output_suffix
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or default_worker_id()
+        self.clock = clock
+        manifest = self._load_or_create_manifest(Path(source_name).name, total_rows, shard_size)
+        # The first worker's settings win, so every worker cuts the same shards
+        self.total_rows = manifest["total_rows"]
+        self.shard_size = manifest["shard_size"]
+        if total_rows != self.total_rows:
+            raise ValueError(f"{source_name} has {total_rows} rows but the shard manifest in {self.directory} "
+                             f"was created for {self.total_rows}; use a fresh shared directory for a changed file")
+
+    def _load_or_create_manifest(self, source: str, total_rows: int, shard_size: int) -> dict:
+        path = self.directory / "manifest.json"
+        self._publish(path, json.dumps({"source": source, "total_rows": total_rows, "shard_size": shard_size}))
+        manifest = _read_json(path)
+        if manifest is None:
+            raise RuntimeError(f"Unreadable shard manifest {path}")
+        return manifest
+
+    @staticmethod
+    def _publish(path: Path, text: str) -> bool:
+        """Create `path` with `text` unless it exists; other workers never see it half-written."""
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{time.monotonic_ns()}.tmp")
+        tmp.write_text(text, encoding="utf-8")
+        try:
+            # link() never overwrites, so exactly one of several racing workers succeeds
+            os.link(tmp, path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            tmp.unlink()
+
+    @property
+    def shard_count(self) -> int:
+        return -(-self.total_rows // self.shard_size)
+
+    def rows(self, shard: int) -> Tuple[int, int]:
+        """Half-open [start, end) row range of a shard."""
+        start = shard * self.shard_size
+        return start, min(start + self.shard_size, self.total_rows)
+
+    def lease_path(self, shard: int) -> Path:
+        return self.directory / f"shard_{shard:05d}.lease"
+
+    def output_path(self, shard: int) -> Path:
+        return self.directory / f"shard_{shard:05d}{self.output_suffix}"
+
+    def is_done(self, shard: int) -> bool:
+        return self.output_path(shard).exists()
+
+    def pending(self) -> int:
+        return sum(1 for shard in range(self.shard_count) if not self.is_done(shard))
+
+    def _lease_body(self) -> str:
+        return json.dumps({"worker": self.worker_id, "expires": self.clock() + self.lease_seconds})
+
+    def try_claim(self, shard: int) -> bool:
+        """Take the shard's lease if it is free or expired."""
+        if self.is_done(shard):
+            return False
+        if not self._publish(self.lease_path(shard), self._lease_body()):
+            return self._try_reclaim(shard)
+        # A worker may have finished the shard between the check and the claim
+        if self.is_done(shard):
+            self.release(shard)
+            return False
+        return True
+
+    def _try_reclaim(self, shard: int) -> bool:
+        lease = self.lease_path(shard)
+        held = _read_json(lease)
+        if held is None or held.get("expires", 0) > self.clock():
+            return False
+        # Rename is atomic, so only one of several reclaiming workers moves the stale lease aside
+        stale = lease.with_name(f"{lease.name}.stale.{os.getpid()}.{time.monotonic_ns()}")
+        try:
+            os.rename(lease, stale)
+        except FileNotFoundError:
+            return False
+        moved = _read_json(stale)
+        if moved is not None and moved.get("expires", 0) > self.clock():
+            # Another worker reclaimed it first and we moved its fresh lease: put it back
+            try:
+                os.link(stale, lease)
+            except FileExistsError:
+                pass
+            stale.unlink()
+            return False
+        stale.unlink()
+        return self.try_claim(shard)
+
+    def owns(self, shard: int) -> bool:
+        held = _read_json(self.lease_path(shard))
+        return held is not None and held.get("worker") == self.worker_id
+
+    def renew(self, shard: int) -> bool:
+        """Extend our lease; False if it expired and another worker took the shard."""
+        lease = self.lease_path(shard)
+        # Rewrite the lease file we hold open rather than replacing whatever is at the
+        # path: a reclaiming worker renames the stale file aside before publishing its
+        # own, so a late write lands in our old file and never in the new owner's lease
+        try:
+            fd = os.open(lease, os.O_RDWR)
+        except FileNotFoundError:
+            return False
+        try:
+            try:
+                held = json.loads(os.read(fd, 4096).decode("utf-8"))
+            except ValueError:
+                return False
+            if held.get("worker") != self.worker_id:
+                return False
+            body = self._lease_body().encode("utf-8")
+            os.ftruncate(fd, 0)
+            os.pwrite(fd, body, 0)
+            # Still ours only if the file we wrote is still the one at the path
+            try:
+                return os.stat(lease).st_ino == os.fstat(fd).st_ino
+            except FileNotFoundError:
+                return False
+        finally:
+            os.close(fd)
+
+    def release(self, shard: int) -> None:
+        if self.owns(shard):
+            try:
+                self.lease_path(shard).unlink()
+            except FileNotFoundError:
+                pass
+
+    def complete(self, shard: int, write_output) -> None:
+        """Write the shard's output via write_output(tmp_path) and publish it atomically."""
+        target = self.output_path(shard)
+        # The temporary name ends like the target, so writers that pick a format by suffix still can
+        tmp = target.with_name(f".{os.getpid()}.{target.name}")
+        write_output(tmp)
+        os.replace(tmp, target)
+        self.release(shard)
+
+    def claim_shards(self, poll_interval: float = 5.0) -> Iterator[int]:
+        """
+        Yield shards as they are claimed until every shard is done.
+
+        While the remaining shards are all leased by live workers, waits and
+        polls so shards of workers that die are still picked up.
+        """
+        while True:
+            claimed_any = False
+            for shard in range(self.shard_count):
+                if self.try_claim(shard):
+                    claimed_any = True
+                    yield shard
+            if not claimed_any:
+                if self.pending() == 0:
+                    return
+                time.sleep(poll_interval)
+
+    def missing(self):
+        return [shard for shard in range(self.shard_count) if not self.is_done(shard)]
+
+    def outputs(self):
+        """Finished shard outputs in original row order; raises if any shard is unfinished."""
+        missing = self.missing()
+        if missing:
+            raise RuntimeError(f"{len(missing)} of {self.shard_count} shards are not finished yet (first: {missing[0]})")
+        return [self.output_path(shard) for shard in range(self.shard_count)]
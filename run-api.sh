@@ -1,3 +1,9 @@
 #!/bin/bash
+# Usage: ./run-api.sh          development server (auto-reload, debugger)
+#        ./run-api.sh --prod   gunicorn with gevent workers (see gunicorn.conf.py;
+#                              pip install -r requirements-server.txt first)
 export PYTHONPATH=$(pwd)
-python3 scripts/run_api.py 
\ No newline at end of file
+if [ "$1" == "--prod" ]; then
+    exec gunicorn -c gunicorn.conf.py api.index:app
+fi
+python3 scripts/run_api.py
@@ -0,0 +1,236 @@
+"""
+Model bake-off for icebreaker generation.
+
+Runs the same seeded sample of leads through several model configurations
+(model, max_tokens, temperature, prompt version) using
+SingleFileLeadEnricher's real prompt, API call and post-processing. Each
+configuration is scored on latency percentiles, tokens, cost and failure rate,
+and by local output checks: single sentence, length, duplicate rate and
+repeated openings. The comparison is printed and saved as JSON and Markdown
+under bakeoff_results/.
+
+Usage:
+    python scripts/bench_icebreakers.py --fake                       # local stand-in, no quota used
+    python scripts/bench_icebreakers.py --configs bakeoff.json --sample 100 --seed 7
+
+A configs file is a JSON list of objects with "name", "model", "max_tokens",
+"temperature" and "prompt" ("v1" or "v2"), and optionally "price_in" and
+"price_out" in USD per million tokens. Without --fake the configured
+XAI_API_URL (default: the xAI API) and XAI_API_KEY are used.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from fake_llm_server import FakeLLMServer
+from load_test import percentile, free_port, git_revision
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "bakeoff_results"
+sys.path.insert(0, str(ROOT / "icebreakers"))
+
+from lead_enricher_single import SingleFileLeadEnricher  # noqa: E402
+
+DEFAULT_CONFIGS = [
+    {"name": "grok-3 v2", "model": "grok-3", "max_tokens": 50, "temperature": 0.7, "prompt": "v2"},
+    {"name": "grok-3 v1", "model": "grok-3", "max_tokens": 100, "temperature": 0.7, "prompt": "v1"},
+    {"name": "grok-3-mini v2", "model": "grok-3-mini", "max_tokens": 50, "temperature": 0.7, "prompt": "v2"},
+    {"name": "grok-3-mini v2 t=0.3", "model": "grok-3-mini", "max_tokens": 50, "temperature": 0.3, "prompt": "v2"},
+]
+
+# USD per million (input, output) tokens; a config's price_in/price_out take precedence
+PRICES = {
+    "grok-3": (3.00, 15.00),
+    "grok-3-mini": (0.30, 0.50),
+}
+
+ERROR_PREFIXES = ("API_ERROR:", "SCRIPT_ERROR:")
+SENTENCE_BREAK_RE = re.compile(r"[.!?]+[\"')\]]*\s+(?=[A-Z0-9\"'])")
+NAME_PREFIX_RE = re.compile(r"^[^\s,]+,\s+")
+
+
+def sentence_count(text: str) -> int:
+    return len(SENTENCE_BREAK_RE.split(text.strip())) if text.strip() else 0
+
+
+def normalised(text: str) -> str:
+    # Post-processing may put the lead's first name in front; compare what follows it
+    return " ".join(NAME_PREFIX_RE.sub("", text).lower().split())
+
+
+def opening(text: str, words: int = 3) -> str:
+    return " ".join(normalised(text).split()[:words])
+
+
+def load_sample(paths, size: int, seed: int) -> pd.DataFrame:
+    df = pd.concat([pd.read_csv(path) for path in paths], ignore_index=True)
+    return df.sample(n=min(size, len(df)), random_state=seed).reset_index(drop=True)
+
+
+def run_config(config: dict, leads: pd.DataFrame, workers: int, output_folder: str) -> list:
+    """Generate an icebreaker per lead; returns one record per lead."""
+    enricher = SingleFileLeadEnricher(
+        output_folder=output_folder,
+        model=config["model"],
+        max_tokens=config["max_tokens"],
+        temperature=config["temperature"],
+        prompt_version=config["prompt"],
+    )
+    call_api = enricher._call_grok_api
+    last_call = threading.local()
+
+    def timed_call(prompt):
+        started = time.perf_counter()
+        response = call_api(prompt)
+        last_call.latency = time.perf_counter() - started
+        last_call.usage = response.get("usage") or {}
+        return response
+
+    enricher._call_grok_api = timed_call
+
+    def one(row):
+        last_call.latency, last_call.usage = 0.0, {}
+        text = enricher._generate_icebreaker(row)
+        return {
+            "text": text,
+            "ok": not text.startswith(ERROR_PREFIXES),
+            "latency": last_call.latency,
+            "prompt_tokens": last_call.usage.get("prompt_tokens", 0),
+            "completion_tokens": last_call.usage.get("completion_tokens", 0),
+        }
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(one, (row for _, row in leads.iterrows())))
+
+
+def score(config: dict, records: list, max_chars: int) -> dict:
+    ok = [r for r in records if r["ok"]]
+    texts = [r["text"] for r in ok]
+    latencies = [r["latency"] for r in ok]
+    price_in, price_out = PRICES.get(config["model"], (0.0, 0.0))
+    price_in, price_out = config.get("price_in", price_in), config.get("price_out", price_out)
+    prompt_tokens = sum(r["prompt_tokens"] for r in records)
+    completion_tokens = sum(r["completion_tokens"] for r in records)
+    cost = (prompt_tokens * price_in + completion_tokens * price_out) / 1e6
+    openings = [opening(t) for t in texts]
+    lengths = [len(t) for t in texts]
+
+    def share(count):
+        return round(count / len(texts), 3) if texts else 0.0
+
+    return {
+        "leads": len(records),
+        "failure_rate": round(1 - len(ok) / len(records), 3) if records else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "prompt_tokens": round(prompt_tokens / len(records), 1) if records else 0.0,
+        "completion_tokens": round(completion_tokens / len(records), 1) if records else 0.0,
+        "usd_per_1k_leads": round(cost / len(records) * 1000, 3) if records else 0.0,
+        "single_sentence": share(sum(1 for t in texts if sentence_count(t) == 1)),
+        "mean_chars": round(sum(lengths) / len(lengths), 1) if lengths else 0.0,
+        "over_max_chars": share(sum(1 for n in lengths if n > max_chars)),
+        "duplicate_rate": share(len(texts) - len({normalised(t) for t in texts})),
+        "repeated_opening": share(sum(1 for o in openings if openings.count(o) > 1)),
+    }
+
+
+def markdown_report(result: dict) -> str:
+    columns = list(next(iter(result["scores"].values())).keys())
+    lines = [
+        f"# Icebreaker bake-off {result['label']}",
+        "",
+        f"{result['sample']['leads']} leads (seed {result['sample']['seed']}) against {result['endpoint']}, "
+        f"revision {result['git_revision']}.",
+        "",
+        "| config | " + " | ".join(columns) + " |",
+        "|---" * (len(columns) + 1) + "|",
+    ]
+    for name, scores in result["scores"].items():
+        lines.append(f"| {name} | " + " | ".join(str(scores[c]) for c in columns) + " |")
+    lines += ["", "## Examples", ""]
+    for name, examples in result["examples"].items():
+        lines.append(f"**{name}**")
+        lines += [f"- {text}" for text in examples]
+        lines.append("")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--configs', help="JSON file with the configurations to compare (default: built-in grok-3 / grok-3-mini set)")
+    parser.add_argument('--input', nargs='+', help="lead CSVs to sample from (default: icebreakers/input_data/*.csv)")
+    parser.add_argument('--sample', type=int, default=40, help="leads per configuration")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--workers', type=int, default=4, help="concurrent API calls per configuration")
+    parser.add_argument('--max-chars', type=int, default=200, help="length above which an icebreaker counts as too long")
+    parser.add_argument('--fake', action='store_true', help="run against scripts/fake_llm_server.py instead of the real API")
+    parser.add_argument('--llm-latency', type=float, default=0.8)
+    parser.add_argument('--llm-jitter', type=float, default=0.4)
+    parser.add_argument('--llm-failure-rate', type=float, default=0.0)
+    parser.add_argument('--label', help="name for the saved report (default: timestamp)")
+    args = parser.parse_args()
+
+    configs = json.loads(Path(args.configs).read_text()) if args.configs else DEFAULT_CONFIGS
+    inputs = args.input or sorted((ROOT / "icebreakers" / "input_data").glob("*.csv"))
+    leads = load_sample(inputs, args.sample, args.seed)
+
+    llm = None
+    if args.fake:
+        llm = FakeLLMServer(port=free_port(), latency=args.llm_latency, jitter=args.llm_jitter,
+                            failure_rate=args.llm_failure_rate, seed=args.seed).start()
+        os.environ['XAI_API_URL'] = llm.url
+        os.environ.setdefault('XAI_API_KEY', 'bakeoff')
+    endpoint = os.environ.get('XAI_API_URL', 'https://api.x.ai/v1/chat/completions')
+
+    scores, examples = {}, {}
+    try:
+        with tempfile.TemporaryDirectory() as scratch:
+            for config in configs:
+                print(f"\n▶ {config['name']}: {len(leads)} leads")
+                records = run_config(config, leads, args.workers, scratch)
+                scores[config["name"]] = score(config, records, args.max_chars)
+                examples[config["name"]] = [r["text"] for r in records[:3]]
+    finally:
+        if llm:
+            llm.stop()
+
+    result = {
+        "label": args.label or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ"),
+        "git_revision": git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "endpoint": "fake_llm_server" if args.fake else endpoint,
+        "sample": {"leads": len(leads), "seed": args.seed, "inputs": [str(p) for p in inputs]},
+        "configs": configs,
+        "scores": scores,
+        "examples": examples,
+    }
+
+    print("\nIcebreaker bake-off")
+    print("=" * 40)
+    columns = list(next(iter(scores.values())).keys())
+    width = max(len(name) for name in scores)
+    print(f"  {'config':<{width}}  " + "  ".join(f"{c:>{max(len(c), 8)}}" for c in columns))
+    for name, row in scores.items():
+        print(f"  {name:<{width}}  " + "  ".join(f"{row[c]:>{max(len(c), 8)}}" for c in columns))
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    json_path = RESULTS_DIR / f"{result['label']}.json"
+    json_path.write_text(json.dumps(result, indent=2))
+    (RESULTS_DIR / f"{result['label']}.md").write_text(markdown_report(result))
+    print(f"\nSaved to {json_path.relative_to(ROOT)} (+ .md)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Cold-start benchmark for the serverless entry point (api/index.py).
+
+Imports api.index in fresh interpreters under `python -X importtime`, reports
+the median total import time and the slowest modules, and times the first
+requests served by a freshly imported app. Exits non-zero when the median
+import time exceeds the budget or when a lazily loaded module was imported
+eagerly, so it can gate CI.
+
+Usage: python scripts/bench_import_time.py [--runs 7] [--budget-ms 350] [--top 15]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that must only load when a chat turn actually needs them
+LAZY_MODULES = ("requests", "api.utils.llm", "api.utils.providers", "api.utils.n8n_handler")
+
+FIRST_REQUEST_SNIPPET = """
+import json, sys, time
+started = time.perf_counter()
+from api.index import app
+imported = time.perf_counter()
+client = app.test_client()
+timings = {"import_ms": (imported - started) * 1000}
+for path in ("/api/health", "/api/chatbot/greeting"):
+    t = time.perf_counter()
+    client.get(path)
+    timings[path] = (time.perf_counter() - t) * 1000
+timings["eager"] = [m for m in %r if m in sys.modules]
+print(json.dumps(timings))
+""" % (LAZY_MODULES,)
+
+
+def run_importtime():
+    """Return {module: (self_us, cumulative_us)} for one fresh `import api.index`."""
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import api.index"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def run_first_requests():
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    result = subprocess.run(
+        [sys.executable, "-c", FIRST_REQUEST_SNIPPET],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('IMPORT_BUDGET_MS', 350)))
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [run_importtime() for _ in range(args.runs)]
+    totals_ms = [run["api.index"][1] / 1000 for run in runs]
+    median_ms = statistics.median(totals_ms)
+
+    # Rank modules by their median cumulative time across runs
+    names = set.intersection(*(set(run) for run in runs))
+    ranked = sorted(
+        ((statistics.median(run[name][1] for run in runs) / 1000, statistics.median(run[name][0] for run in runs) / 1000, name)
+         for name in names),
+        reverse=True,
+    )
+
+    print(f"import api.index: median {median_ms:.1f} ms over {args.runs} runs "
+          f"(min {min(totals_ms):.1f}, max {max(totals_ms):.1f}); budget {args.budget_ms:.0f} ms")
+    print(f"\n{'cumulative ms':>14} {'self ms':>8}  module")
+    for cumulative, self_ms, name in ranked[:args.top]:
+        print(f"{cumulative:>14.1f} {self_ms:>8.1f}  {name}")
+
+    first = run_first_requests()
+    print("\nFresh process:")
+    print(f"  import          {first['import_ms']:.1f} ms")
+    for path in ("/api/health", "/api/chatbot/greeting"):
+        print(f"  GET {path:<22} {first[path]:.1f} ms")
+
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(f"median import time {median_ms:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+    eager = sorted(set(first["eager"]) | {m for m in LAZY_MODULES if m in names})
+    if eager:
+        failures.append(f"modules that should load lazily were imported eagerly: {', '.join(eager)}")
+
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("\nOK: within budget")
+
+
+if __name__ == '__main__':
+    main()
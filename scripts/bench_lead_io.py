@@ -0,0 +1,100 @@
+"""
+Benchmark the lead file backends in icebreakers/lead_io.py.
+
+Scales the bundled icebreakers/input_data files up by repeating their rows,
+writes the result in each format (CSV and JSONL, plain, gzip and zstd), then
+times reading it back with each CSV engine (pyarrow's multithreaded parser,
+pandas' C and python parsers) and writing it. Backends whose optional
+package (pyarrow, zstandard) is not installed are skipped.
+
+Usage:
+    python scripts/bench_lead_io.py [--scale 50] [--repeat 3] [--json results.json]
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "icebreakers"))
+
+from lead_io import read_leads, write_leads  # noqa: E402
+
+FILES = ["leads.csv", "leads.csv.gz", "leads.csv.zst", "leads.jsonl", "leads.jsonl.gz"]
+CSV_ENGINES = ["pyarrow", "c", "python"]
+
+
+def best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def load_scaled(paths, scale: int) -> pd.DataFrame:
+    df = pd.concat([pd.read_csv(path) for path in paths], ignore_index=True)
+    return pd.concat([df] * scale, ignore_index=True)
+
+
+def run(df: pd.DataFrame, directory: Path, repeat: int, engines) -> list:
+    results = []
+    for name in FILES:
+        path = directory / name
+        try:
+            write_seconds = best_of(repeat, lambda: write_leads(df, path))
+        except ImportError as e:
+            print(f"  skipping {name}: {e}")
+            continue
+        size_mb = path.stat().st_size / 1e6
+        for engine in (engines if ".csv" in name else [None]):
+            try:
+                read_seconds = best_of(repeat, lambda: read_leads(path, engine=engine))
+            except ImportError as e:
+                print(f"  skipping {name} with {engine}: {e}")
+                continue
+            results.append({
+                "file": name,
+                "engine": engine or "json",
+                "size_mb": round(size_mb, 2),
+                "read_s": round(read_seconds, 3),
+                "rows_per_s": round(len(df) / read_seconds),
+                "write_s": round(write_seconds, 3),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', nargs='+', help="lead CSVs to scale up (default: icebreakers/input_data/*.csv)")
+    parser.add_argument('--scale', type=int, default=50, help="times each row is repeated")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per measurement; the best is reported")
+    parser.add_argument('--engines', nargs='+', default=CSV_ENGINES, choices=CSV_ENGINES)
+    parser.add_argument('--json', metavar='PATH', help="also save the results as JSON")
+    args = parser.parse_args()
+
+    inputs = args.input or sorted((ROOT / "icebreakers" / "input_data").glob("*.csv"))
+    df = load_scaled(inputs, args.scale)
+    print(f"{len(df):,} rows x {len(df.columns)} columns from {len(inputs)} file(s) scaled {args.scale}x\n")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        results = run(df, Path(scratch), args.repeat, args.engines)
+
+    columns = ["file", "engine", "size_mb", "read_s", "rows_per_s", "write_s"]
+    print("  ".join(f"{c:>14}" for c in columns))
+    for row in results:
+        print("  ".join(f"{row[c]:>14}" for c in columns))
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"rows": len(df), "scale": args.scale, "results": results}, indent=2))
+        print(f"\nSaved to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
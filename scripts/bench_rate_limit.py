@@ -0,0 +1,94 @@
+"""
+Benchmark the per-request overhead of the rate-limit storage backends.
+
+Measures FixedWindowRateLimiter.hit() (what Flask-Limiter runs on every
+request) against each storage, with and without block pre-allocation, and
+the full overhead of the limiter on a trivial Flask route.
+
+Usage: PYTHONPATH=. python scripts/bench_rate_limit.py [--hits 20000] [--clients 50] [--redis redis://localhost:6379]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from flask import Flask
+from flask_limiter import Limiter
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+import api.utils.rate_limit_storage  # noqa: F401 - registers the sqlite:// and prealloc+redis:// schemes
+
+
+def bench_storage(uri: str, hits: int, clients: int, **options) -> float:
+    """Return the mean cost of one limiter hit in microseconds."""
+    storage = storage_from_string(uri, **options)
+    storage.reset()
+    limiter = FixedWindowRateLimiter(storage)
+    item = parse("1000000/hour")
+
+    started = time.perf_counter()
+    for i in range(hits):
+        limiter.hit(item, f"client-{i % clients}")
+    return (time.perf_counter() - started) / hits * 1e6
+
+
+def bench_flask(uri: str, requests_count: int, **options) -> float:
+    """Return the mean cost of a request to a trivial route, in microseconds."""
+    app = Flask(__name__)
+    if uri:
+        Limiter(lambda: "client", app=app, default_limits=["1000000/hour"], storage_uri=uri, storage_options=options)
+
+    @app.route('/ping')
+    def ping():
+        return "pong"
+
+    client = app.test_client()
+    for _ in range(200):  # warm up
+        client.get('/ping')
+    started = time.perf_counter()
+    for _ in range(requests_count):
+        client.get('/ping')
+    return (time.perf_counter() - started) / requests_count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hits', type=int, default=20000)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--redis', help="Redis URL to include, e.g. redis://localhost:6379")
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "ratelimit.db")
+    backends = [
+        ("memory://", {}),
+        (f"sqlite:///{db_path}", {"reserve_batch": 1}),
+        (f"sqlite:///{db_path}", {"reserve_batch": 8}),
+        (f"sqlite:///{db_path}", {"reserve_batch": 64}),
+    ]
+    if args.redis:
+        backends += [
+            (args.redis, {}),
+            (f"prealloc+{args.redis}", {"reserve_batch": 1}),
+            (f"prealloc+{args.redis}", {"reserve_batch": 64}),
+        ]
+
+    print(f"Limiter hit cost ({args.hits} hits across {args.clients} clients)")
+    print(f"{'storage':<45} {'batch':>6} {'us/hit':>10}")
+    for uri, options in backends:
+        cost = bench_storage(uri, args.hits, args.clients, **options)
+        print(f"{uri.split('://')[0] + '://':<45} {options.get('reserve_batch', '-'):>6} {cost:>10.1f}")
+
+    flask_requests = max(1000, args.hits // 10)
+    baseline = bench_flask(None, flask_requests)
+    print(f"\nFlask request cost ({flask_requests} requests, no limiter: {baseline:.1f} us)")
+    print(f"{'storage':<45} {'batch':>6} {'+us/req':>10}")
+    for uri, options in backends:
+        cost = bench_flask(uri, flask_requests, **options)
+        print(f"{uri.split('://')[0] + '://':<45} {options.get('reserve_batch', '-'):>6} {cost - baseline:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Build the chatbot's knowledge index ahead of time and try queries against it.
+
+Usage:
+    python scripts/build_knowledge_index.py --out knowledge_index.json [--extra scripts/prd.txt]
+    python scripts/build_knowledge_index.py --query "what is the free consultation?"
+
+Serve the result with KNOWLEDGE_INDEX_PATH=knowledge_index.json. Without it the
+API builds the same index from api/knowledge on first use.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from api.utils import retrieval  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', help='write the index to this JSON file')
+    parser.add_argument('--extra', action='append', default=[], help='additional .md/.txt source (repeatable)')
+    parser.add_argument('--query', action='append', default=[], help='show the passages retrieved for a query')
+    args = parser.parse_args()
+
+    sources = retrieval.knowledge_sources() + [Path(p) for p in args.extra]
+    index = retrieval.build_index(sources)
+    prompt_chars = sum(len(p.text) for p in index.passages)
+    print(f"{len(index.passages)} passages, {len(index.postings)} terms, {prompt_chars} characters of content "
+          f"from {', '.join(str(s) for s in sources)}")
+
+    for query in args.query:
+        print(f"\n> {query}")
+        for passage, score in index.search(query, k=retrieval.TOP_K, min_score=0):
+            marker = "" if score >= retrieval.MIN_SCORE else "  (below KNOWLEDGE_MIN_SCORE)"
+            print(f"  {score:5.2f}  {passage.title}{marker}")
+
+    if args.out:
+        index.save(args.out)
+        print(f"\nWrote {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Run a Python script with its outbound HTTP calls recorded to, or replayed from, a cassette.
+
+Usage:
+    python scripts/cassette.py record cassettes/enrich.jsonl icebreakers/lead_enricher_single.py
+    python scripts/cassette.py replay cassettes/enrich.jsonl --speed 20 icebreakers/lead_enricher_single.py
+    python scripts/cassette.py once cassettes/chat.jsonl scripts/run_api.py
+
+Arguments after the script path are passed to it. Record against the real
+APIs once (secrets are scrubbed from the file), then replay as often as needed
+with no network or quota: --speed 1 keeps the recorded latencies, --speed 20
+compresses them twentyfold and --speed 0 replies immediately. Combine with
+scripts/load_test.py or a profiler to benchmark the pipelines on real traffic.
+See api/utils/cassette.py for the file format and matching rules.
+"""
+
+import argparse
+import json
+import os
+import runpy
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from api.utils.cassette import Cassette, MODES  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('mode', choices=MODES)
+    parser.add_argument('cassette', help='cassette file (JSON Lines)')
+    parser.add_argument('script', help='Python script to run')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='arguments for the script')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay latency divisor; 0 replies immediately (default: 1)')
+    parser.add_argument('--strict', action='store_true', help='fail requests that do not match a recording exactly')
+    args = parser.parse_args()
+
+    script = os.path.abspath(args.script)
+    sys.argv = [script] + args.args
+    # Run the script as if invoked directly, so its own directory is importable
+    sys.path.insert(0, os.path.dirname(script))
+
+    cassette = Cassette(args.cassette, mode=args.mode, speed=args.speed, strict=args.strict)
+    try:
+        with cassette:
+            runpy.run_path(script, run_name='__main__')
+    finally:
+        print(f"\ncassette: {json.dumps(cassette.stats())}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
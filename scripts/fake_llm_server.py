@@ -0,0 +1,134 @@
+"""
+Local stand-in for an OpenAI-compatible /v1/chat/completions endpoint.
+
+Replies after a configurable latency and can inject failures, so the chat API
+and the enrichers can be load-tested and benchmarked without spending quota.
+
+Usage: python scripts/fake_llm_server.py [--port 5901] [--latency 0.8] [--jitter 0.4] [--failure-rate 0.02]
+Then point the app at it with XAI_API_URL=http://127.0.0.1:5901/v1/chat/completions
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class FakeLLMServer:
+    """Threaded fake chat-completions server; use start()/stop() or run serve_forever()."""
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 5901,
+        latency: float = 0.8,
+        jitter: float = 0.4,
+        failure_rate: float = 0.0,
+        seed: int = None
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.requests_served = 0
+        self.failures_injected = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def _next_outcome(self):
+        with self._lock:
+            self.requests_served += 1
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            fail = self.random.random() < self.failure_rate
+            if fail:
+                self.failures_injected += 1
+        return delay, fail
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                try:
+                    payload = json.loads(body or b"{}")
+                except ValueError:
+                    payload = {}
+
+                delay, fail = server._next_outcome()
+                time.sleep(delay)
+
+                if fail:
+                    self._send(500, {"error": {"message": "Injected failure", "type": "server_error"}})
+                    return
+
+                messages = payload.get("messages", [])
+                prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+                turn = sum(1 for m in messages if m.get("role") == "user")
+                content = f"Thanks for asking! This is simulated reply #{turn} from the stand-in model."
+                self._send(200, {
+                    "id": f"fake-{server.requests_served}",
+                    "object": "chat.completion",
+                    "model": payload.get("model", "fake"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": len(content) // 4,
+                        "total_tokens": prompt_tokens + len(content) // 4,
+                    },
+                })
+
+            def _send(self, status, data):
+                encoded = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5901)
+    parser.add_argument('--latency', type=float, default=0.8, help="Mean response latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.4, help="Uniform +/- jitter in seconds")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.host, args.port, args.latency, args.jitter, args.failure_rate, args.seed)
+    print(f"Fake LLM listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""
+Load test for /api/chatbot against a simulated LLM backend.
+
+Starts a fake chat-completions server (scripts/fake_llm_server.py) and the API
+(gunicorn by default, or the Flask dev server), then drives concurrent
+multi-turn conversations whose history grows every turn. Reports throughput,
+latency percentiles, error rate and server memory, saves the run under
+loadtest_results/ and compares it against the previous run.
+
+Usage:
+    python scripts/load_test.py [--conversations 50] [--turns 6] [--llm-latency 0.8]
+                                [--llm-failure-rate 0.02] [--server gunicorn|dev] [--label NAME]
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+
+from fake_llm_server import FakeLLMServer
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "loadtest_results"
+
+USER_TURNS = [
+    "Hi! What does Fluxstream do?",
+    "Can you tell me more about the free consultation?",
+    "We run a 12-person real estate brokerage and spend hours on follow-up emails.",
+    "How long does an implementation usually take?",
+    "What would this cost roughly?",
+    "Could Reid reach out to me? I'm Jane, jane@example.com",
+    "Yes, that's correct.",
+    "Thanks!",
+]
+
+# Metrics where a higher value is worse, used for regression checks
+LOWER_IS_BETTER = ("p50_ms", "p99_ms", "error_rate", "peak_rss_mb")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def process_tree_rss_mb(pid: int) -> float:
+    """Resident memory of a process and its children (Linux /proc), in MB."""
+    total_kb = 0
+    pids = [pid]
+    while pids:
+        current = pids.pop()
+        try:
+            with open(f"/proc/{current}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+            with open(f"/proc/{current}/task/{current}/children") as children:
+                pids.extend(int(c) for c in children.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return total_kb / 1024.0
+
+
+def start_api(server: str, port: int, llm_url: str, workers: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(ROOT),
+        XAI_API_KEY="loadtest",
+        XAI_API_URL=llm_url,
+        LLM_PROVIDERS="grok",
+        RATELIMIT_ENABLED="0",
+        CHAT_CACHE_MAX_ENTRIES="0",
+        N8N_CHAT_LEAD_WEBHOOK_URL="",
+        FLASK_DEBUG="0",
+    )
+    if server == "gunicorn":
+        env.update(BIND=f"127.0.0.1:{port}", WEB_CONCURRENCY=str(workers), GUNICORN_ACCESS_LOG="")
+        cmd = [sys.executable, "-m", "gunicorn", "-c", str(ROOT / "gunicorn.conf.py"), "api.index:app"]
+    else:
+        env.update(PORT=str(port))
+        cmd = [sys.executable, str(ROOT / "scripts" / "run_api.py")]
+
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                return proc
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"API did not become healthy on port {port}")
+
+
+class LoadRun:
+    def __init__(self, base_url: str, conversations: int, turns: int):
+        self.base_url = base_url
+        self.conversations = conversations
+        self.turns = turns
+        self.latencies = []
+        self.errors = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def _conversation(self, index: int) -> None:
+        session = requests.Session()
+        history = [{"role": "assistant", "content": "Hey! I'm Flux, the AI assistant for Fluxstream."}]
+        for turn in range(self.turns):
+            message = f"{USER_TURNS[turn % len(USER_TURNS)]} (conversation {index})"
+            started = time.perf_counter()
+            ok = False
+            try:
+                response = session.post(
+                    f"{self.base_url}/api/chatbot",
+                    json={"message": message, "conversation_history": history},
+                    timeout=120,
+                )
+                data = response.json() if response.ok else {}
+                # The API reports upstream failures in-band, so check the reply too
+                ok = response.ok and not str(data.get("response", "")).startswith(("API Error", "Error:"))
+                if response.ok:
+                    history = data.get("conversation_history", history)
+            except (requests.exceptions.RequestException, ValueError):
+                pass
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                self.requests += 1
+                self.latencies.append(elapsed)
+                self.errors += 0 if ok else 1
+
+    def run(self) -> float:
+        threads = [threading.Thread(target=self._conversation, args=(i,)) for i in range(self.conversations)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+
+def compare(current: dict, previous: dict, threshold: float) -> list:
+    """Return human-readable regressions of `current` against `previous`."""
+    regressions = []
+    for metric in LOWER_IS_BETTER:
+        before, after = previous["metrics"].get(metric), current["metrics"].get(metric)
+        if before and after is not None and after > before * (1 + threshold) and after - before > 1e-3:
+            regressions.append(f"{metric}: {before} -> {after}")
+    before, after = previous["metrics"].get("rps"), current["metrics"].get("rps")
+    if before and after is not None and after < before * (1 - threshold):
+        regressions.append(f"rps: {before} -> {after}")
+    return regressions
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conversations', type=int, default=50, help="Concurrent conversations")
+    parser.add_argument('--turns', type=int, default=6, help="Turns per conversation")
+    parser.add_argument('--llm-latency', type=float, default=0.8)
+    parser.add_argument('--llm-jitter', type=float, default=0.4)
+    parser.add_argument('--llm-failure-rate', type=float, default=0.0)
+    parser.add_argument('--server', choices=["gunicorn", "dev"], default="gunicorn")
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn workers")
+    parser.add_argument('--label', help="Name for the saved result (default: timestamp)")
+    parser.add_argument('--regression-threshold', type=float, default=0.2, help="Relative change flagged as a regression")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    llm = FakeLLMServer(port=free_port(), latency=args.llm_latency, jitter=args.llm_jitter,
+                        failure_rate=args.llm_failure_rate, seed=42).start()
+    port = free_port()
+    api = start_api(args.server, port, llm.url, args.workers)
+
+    peak_rss = [process_tree_rss_mb(api.pid)]
+    idle_rss = peak_rss[0]
+    stop_sampling = threading.Event()
+
+    def sample_memory():
+        while not stop_sampling.wait(0.25):
+            peak_rss[0] = max(peak_rss[0], process_tree_rss_mb(api.pid))
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+
+    try:
+        load = LoadRun(f"http://127.0.0.1:{port}", args.conversations, args.turns)
+        duration = load.run()
+        final_rss = process_tree_rss_mb(api.pid)
+    finally:
+        stop_sampling.set()
+        api.terminate()
+        api.wait(timeout=15)
+        llm.stop()
+
+    metrics = {
+        "requests": load.requests,
+        "duration_s": round(duration, 3),
+        "rps": round(load.requests / duration, 2) if duration else 0.0,
+        "p50_ms": round(percentile(load.latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(load.latencies, 99) * 1000, 1),
+        "error_rate": round(load.errors / load.requests, 4) if load.requests else 0.0,
+        "idle_rss_mb": round(idle_rss, 1),
+        "peak_rss_mb": round(peak_rss[0], 1),
+        "final_rss_mb": round(final_rss, 1),
+    }
+    result = {
+        "label": args.label or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ"),
+        "git_revision": git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("label", "fail_on_regression")},
+        "metrics": metrics,
+    }
+
+    print("\nLoad test results")
+    print("=" * 40)
+    for key, value in metrics.items():
+        print(f"  {key:<14} {value}")
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    previous_runs = sorted(RESULTS_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime)
+    output_path = RESULTS_DIR / f"{result['label']}.json"
+    output_path.write_text(json.dumps(result, indent=2))
+    print(f"\nSaved to {output_path.relative_to(ROOT)}")
+
+    previous_runs = [p for p in previous_runs if p != output_path]
+    if previous_runs:
+        previous = json.loads(previous_runs[-1].read_text())
+        if previous.get("params") != result["params"]:
+            print(f"Note: parameters differ from {previous_runs[-1].name}; comparison is indicative only")
+        regressions = compare(result, previous, args.regression_threshold)
+        if regressions:
+            print(f"Regressions vs {previous_runs[-1].name} ({previous.get('git_revision')}):")
+            for line in regressions:
+                print(f"  - {line}")
+            if args.fail_on_regression:
+                sys.exit(1)
+        else:
+            print(f"No regressions vs {previous_runs[-1].name} ({previous.get('git_revision')})")
+
+
+if __name__ == '__main__':
+    main()
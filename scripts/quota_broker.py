@@ -0,0 +1,58 @@
+"""
+Run the quota broker shared by the chatbot and the icebreaker enrichers.
+
+Start one broker per machine (or per API key), then point both sides at it:
+
+    python scripts/quota_broker.py --rpm 480 --tpm 200000
+    export QUOTA_BROKER_ADDR=127.0.0.1:7421
+
+Chat calls draw "chat" permits and enrichment calls "batch" permits; see
+api/utils/quota_broker.py for the scheduling rules.
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+from pathlib import Path
+
+BROKER_MODULE = Path(__file__).resolve().parent.parent / "api" / "utils" / "quota_broker.py"
+
+
+def load_broker_module():
+    # Loaded by path so the broker process does not import (and build) the Flask app
+    spec = importlib.util.spec_from_file_location("quota_broker", BROKER_MODULE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    quota_broker = load_broker_module()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=quota_broker.DEFAULT_PORT)
+    parser.add_argument('--rpm', type=float, default=float(os.environ.get('XAI_REQUESTS_PER_MINUTE', 480)),
+                        help='requests per minute allowed on the shared key')
+    parser.add_argument('--tpm', type=float, default=float(os.environ.get('XAI_TOKENS_PER_MINUTE', 200000)),
+                        help='tokens per minute allowed on the shared key')
+    parser.add_argument('--chat-reserve', type=float, default=0.1,
+                        help='fraction of each bucket batch work may not use, kept for chat bursts')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    broker = quota_broker.QuotaBroker(args.rpm, args.tpm, chat_reserve=args.chat_reserve)
+    server = quota_broker.BrokerServer(broker, args.host, args.port)
+    print(f"Quota broker on {args.host}:{args.port}: {args.rpm:g} requests/min, {args.tpm:g} tokens/min, "
+          f"chat reserve {args.chat_reserve:.0%}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(broker.stats(), indent=2))
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
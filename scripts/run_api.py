@@ -1,4 +1,7 @@
+import os
+
 from api import app
- 
+
+# Development server only. For production use gunicorn (./run-api.sh --prod).
 if __name__ == '__main__':
-    app.run(host='127.0.0.1', port=5000, debug=True) 
\ No newline at end of file
+    app.run(host='127.0.0.1', port=int(os.environ.get('PORT', 5000)), debug=os.environ.get('FLASK_DEBUG', '1') == '1')
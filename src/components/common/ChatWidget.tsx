@@ -24,12 +24,56 @@ interface ConversationStarter {
   submitText: string;
 }
 
+// Most recent messages sent as context with each turn
+const MAX_HISTORY_MESSAGES = 30;
+
+// Idempotency-Key for one chat turn: the same turn (same session, history length and message)
+// always gets the same key, so double submits and retries are answered by one upstream call.
+const newSessionId = () =>
+  typeof crypto !== 'undefined' && 'randomUUID' in crypto
+    ? crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+
+const hashText = (text: string) => {
+  let hash = 5381;
+  for (let i = 0; i < text.length; i++) {
+    hash = ((hash << 5) + hash + text.charCodeAt(i)) | 0;
+  }
+  return (hash >>> 0).toString(36);
+};
+
+// POST a chat turn, retrying once with the same key after a network error or a "busy" reply
+const postChat = async (payload: object, idempotencyKey: string): Promise<Response> => {
+  const send = () => fetch('/api/chatbot', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', 'Idempotency-Key': idempotencyKey },
+    body: JSON.stringify(payload),
+  });
+  const retryDelay = (response?: Response) =>
+    Math.min(Number(response?.headers.get('Retry-After')) || 1, 5) * 1000;
+  let response: Response;
+  try {
+    response = await send();
+  } catch {
+    await new Promise(resolve => setTimeout(resolve, retryDelay()));
+    return send();
+  }
+  if (response.status === 503 || response.status === 409) {
+    await new Promise(resolve => setTimeout(resolve, retryDelay(response)));
+    return send();
+  }
+  return response;
+};
+
 const ChatWidget: React.FC = () => {
   const [messages, setMessages] = useState<Message[]>([]);
   const [input, setInput] = useState('');
   const [isTyping, setIsTyping] = useState(false);
   const [showQuickPrompts, setShowQuickPrompts] = useState(true);
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  const sessionIdRef = useRef(newSessionId());
+  const turnKey = (kind: string, message: string) =>
+    `${sessionIdRef.current}:${kind}:${messages.length}:${hashText(message)}`;
   // REMOVED: leadCaptureMode and leadData states, as the new form handles this directly.
   // const [leadCaptureMode, setLeadCaptureMode] = useState(false);
   // const [leadData, setLeadData] = useState<Record<string, string>>({});
@@ -99,11 +143,7 @@ const ChatWidget: React.FC = () => {
         })),
       };
 
-      const aiResponse = await fetch('/api/chatbot', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(confirmationPayload),
-      });
+      const aiResponse = await postChat(confirmationPayload, turnKey('contact', aiPromptForConfirmation));
 
       if (!aiResponse.ok) {
         throw new Error('Failed to generate AI confirmation');
@@ -216,19 +256,16 @@ const ChatWidget: React.FC = () => {
   const fetchAIResponse = async (message: string) => {
     setIsTyping(true);
     try {
-      const conversationHistory = messages.map(msg => ({
+      // The API refuses histories over 40 messages (CHAT_MAX_HISTORY_ITEMS), so only the recent ones are sent
+      const conversationHistory = messages.slice(-MAX_HISTORY_MESSAGES).map(msg => ({
         role: msg.role,
         content: msg.content
       }));
       
-      const response = await fetch('/api/chatbot', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          message: message,
-          conversation_history: conversationHistory,
-        }),
-      });
+      const response = await postChat({
+        message: message,
+        conversation_history: conversationHistory,
+      }, turnKey('chat', message));
 
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# Chat endpoint tests share one client address; keep the per-minute limits out of the way
+os.environ.setdefault('RATELIMIT_ENABLED', '0')
+# Leads that fail to send in tests are queued in a throwaway outbox
+os.environ.setdefault('N8N_LEAD_OUTBOX', os.path.join(tempfile.mkdtemp(), 'lead-outbox.db'))
+# ...and retried only when a test calls retry_pending_leads()
+os.environ.setdefault('N8N_LEAD_RETRY_POLL', '3600')
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from api.utils import n8n_handler
+from api.utils.providers import Provider, ProviderRouter
+from api.utils.resilience import CircuitBreaker, HALF_OPEN
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from fake_llm_server import FakeLLMServer  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "Hi"}]
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start(latency):
+        server = FakeLLMServer(port=0, latency=latency, jitter=0.0).start()
+        started.append(server)
+        return server
+
+    with patch.dict(os.environ, {"FLUX_TEST_KEY": "test"}):
+        yield start
+    for server in started:
+        server.stop()
+
+
+def provider(name, url):
+    return Provider(name=name, api_url=url, api_key_env="FLUX_TEST_KEY", model="m", max_tokens=10)
+
+
+def test_concurrent_async_completions(servers):
+    grok = provider("grok", servers(0.1).url)
+
+    async def main():
+        return await asyncio.gather(*(grok.complete_async(MESSAGES) for _ in range(8)))
+
+    results = asyncio.run(main())
+    assert all("choices" in result for result in results)
+    assert grok.stats.sample_count == 8 and grok.bulkhead.in_flight == 0
+
+
+def test_deadline_frees_the_slot_without_opening_the_circuit(servers):
+    grok = provider("grok", servers(0.3).url)
+    grok.breaker = CircuitBreaker("grok", failure_threshold=1)
+
+    result = asyncio.run(grok.complete_async(MESSAGES, deadline=0.05))
+    assert result == {"error": "grok API did not answer within 0.05s."}
+    assert grok.bulkhead.in_flight == 0
+    assert grok.breaker.snapshot()["failures"] == 0
+
+
+def test_async_hedge_cancels_the_slow_primary(servers):
+    slow, fast = provider("slow", servers(0.4).url), provider("fast", servers(0.01).url)
+    router = ProviderRouter([slow, fast], hedge=True, hedge_default_delay=0.05)
+
+    async def main():
+        result = await router.complete_async(MESSAGES)
+        await asyncio.sleep(0.01)  # let the cancelled primary clean up
+        return result
+
+    assert "choices" in asyncio.run(main())
+    assert slow.bulkhead.in_flight == 0 and slow.stats.sample_count == 0
+    assert fast.stats.sample_count == 1
+
+
+def test_cancelled_probe_frees_half_open_slot():
+    clock = [0.0]
+    breaker = CircuitBreaker("x", failure_threshold=1, reset_timeout=1.0, clock=lambda: clock[0])
+    breaker.record_failure()
+    clock[0] = 2.0
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_cancelled()
+    assert breaker.allow()
+
+
+def test_async_n8n_lead_posts_on_shared_pool(servers):
+    webhook = servers(0.0)
+    with patch.object(n8n_handler, 'N8N_CHAT_LEAD_WEBHOOK_URL', webhook.url):
+        sent = asyncio.run(n8n_handler.send_chat_lead_to_n8n_async({"FirstName": "Jane", "Email": "jane@example.com"}))
+    assert sent and webhook.requests_served == 1
@@ -0,0 +1,45 @@
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pandas as pd
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import bench_icebreakers as bench  # noqa: E402
+from fake_llm_server import FakeLLMServer  # noqa: E402
+
+
+def test_output_checks():
+    assert bench.sentence_count("Jane, love what Acme is doing with claims.") == 1
+    assert bench.sentence_count("Great work. Wanted to run something by you.") == 2
+    assert bench.normalised("Jane, Love  this.") == bench.normalised("Omar, love this.")
+
+
+def test_bakeoff_scores_configs_against_stand_in(tmp_path):
+    leads = pd.DataFrame({
+        "first_name": ["Jane", "Omar", "Lee"],
+        "headline": ["Insurance Broker", "Realtor", "Loan Officer"],
+        "employment_history/0/organization_name": ["Acme", "Homes Inc", "Lend Co"],
+    })
+    server = FakeLLMServer(port=0, latency=0.01, jitter=0.0).start()
+    config = {"name": "mini", "model": "grok-3-mini", "max_tokens": 20, "temperature": 0.2, "prompt": "v1"}
+    try:
+        with patch.dict(os.environ, {"XAI_API_URL": server.url, "XAI_API_KEY": "test"}):
+            with patch('requests.post', wraps=requests.post) as spy:
+                records = bench.run_config(config, leads, workers=2, output_folder=str(tmp_path))
+    finally:
+        server.stop()
+
+    payload = spy.call_args.kwargs["json"]
+    assert (payload["model"], payload["max_tokens"], payload["temperature"]) == ("grok-3-mini", 20, 0.2)
+    assert "short, casual, one-sentence icebreaker" in payload["messages"][0]["content"]
+
+    scores = bench.score(config, records, max_chars=200)
+    assert scores["leads"] == 3 and scores["failure_rate"] == 0.0
+    assert scores["p50_ms"] >= 10
+    assert scores["prompt_tokens"] > 0 and scores["usd_per_1k_leads"] > 0
+    # The stand-in always gives the same two-sentence reply
+    assert scores["single_sentence"] == 0.0 and scores["duplicate_rate"] == round(2 / 3, 3)
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from api.utils import async_http, n8n_handler
+from api.utils.cassette import Cassette, CassetteMiss
+from api.utils.providers import Provider
+
+SECRET = "sk-test-secret-123456"
+WEBHOOK = "https://n8n.example.com/webhook/0c5e-private-id"
+
+
+def fake_upstream(url, json=None, **kwargs):
+    time.sleep(0.05)
+    if "n8n" in url:
+        body = '{"ok": true}'
+    else:
+        body = '{"choices": [{"message": {"content": "Reply to %s"}}], "usage": {"total_tokens": 9}}' % json["messages"][-1]["content"]
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body.encode()
+    return response
+
+
+def provider():
+    return Provider(name="grok", display_name="Grok", api_url="http://llm.test/v1/chat/completions",
+                    api_key_env="FLUX_TEST_KEY", model="m", max_tokens=10)
+
+
+@pytest.fixture
+def recorded(tmp_path):
+    path = tmp_path / "chat.jsonl"
+    with patch.dict(os.environ, {"FLUX_TEST_KEY": SECRET, "N8N_CHAT_LEAD_WEBHOOK_URL": WEBHOOK}), \
+            patch.object(n8n_handler, 'N8N_CHAT_LEAD_WEBHOOK_URL', WEBHOOK), \
+            patch('requests.post', side_effect=fake_upstream):
+        with Cassette(path, mode="record") as cassette:
+            llm = provider()
+            assert llm.complete([{"role": "user", "content": "hi"}])["usage"]["total_tokens"] == 9
+            llm.complete([{"role": "user", "content": "pricing?"}])
+            assert n8n_handler.send_chat_lead_to_n8n({"FirstName": "Jane", "Email": "jane@example.com"})
+    assert cassette.stats()["interactions"] == 3
+    return path
+
+
+def test_record_scrubs_secrets(recorded):
+    text = recorded.read_text()
+    assert SECRET not in text and "0c5e-private-id" not in text
+    assert "<N8N_CHAT_LEAD_WEBHOOK_URL>" in text and "<redacted>" in text
+
+
+@patch.dict(os.environ, {"FLUX_TEST_KEY": SECRET, "N8N_CHAT_LEAD_WEBHOOK_URL": WEBHOOK})
+def test_replay_matches_requests_offline(recorded):
+    with patch('requests.post', side_effect=AssertionError("network used")), \
+            patch.object(n8n_handler, 'N8N_CHAT_LEAD_WEBHOOK_URL', WEBHOOK):
+        with Cassette(recorded, mode="replay", speed=0) as cassette:
+            llm = provider()
+            # Out of recorded order: matched by body, not position
+            assert llm.complete([{"role": "user", "content": "pricing?"}])["choices"][0]["message"]["content"] == "Reply to pricing?"
+            assert llm.complete([{"role": "user", "content": "hi"}])["choices"][0]["message"]["content"] == "Reply to hi"
+            assert n8n_handler.send_chat_lead_to_n8n({"FirstName": "Jane", "Email": "jane@example.com"})
+    assert cassette.stats()["hits"] == 3
+
+
+@patch.dict(os.environ, {"FLUX_TEST_KEY": SECRET})
+def test_replay_timing_and_fallback(recorded):
+    with Cassette(recorded, mode="replay", speed=1) as cassette:
+        started = time.monotonic()
+        # Unseen prompt: served the next unused interaction for the URL
+        assert "error" not in provider().complete([{"role": "user", "content": "something new"}])
+        assert time.monotonic() - started >= 0.05
+    assert cassette.stats()["fallbacks"] == 1
+
+    with Cassette(recorded, mode="replay", speed=0, strict=True):
+        with pytest.raises(CassetteMiss):
+            requests.post("http://llm.test/v1/chat/completions", json={"messages": []})
+
+
+def test_recorded_errors_are_replayed(tmp_path):
+    path = tmp_path / "timeouts.jsonl"
+    with patch('requests.post', side_effect=requests.exceptions.Timeout("read timed out")):
+        with Cassette(path, mode="record"):
+            with pytest.raises(requests.exceptions.Timeout):
+                requests.post("http://llm.test", json={"a": 1})
+    with Cassette(path, mode="once", speed=0):
+        with pytest.raises(requests.exceptions.Timeout, match="read timed out"):
+            requests.post("http://llm.test", json={"a": 1})
+
+
+async def fake_post_json(url, payload, headers=None, timeout=30.0):
+    response = fake_upstream(url, json=payload)
+    return async_http.AsyncResponse(response.status_code, response.text)
+
+
+async def offline_post_json(*args, **kwargs):
+    raise AssertionError("network used")
+
+
+@patch.dict(os.environ, {"FLUX_TEST_KEY": SECRET})
+def test_async_clients_are_recorded_and_replayed(tmp_path):
+    path = tmp_path / "async.jsonl"
+    with patch.object(async_http, 'post_json', fake_post_json), \
+            patch.object(n8n_handler, 'N8N_CHAT_LEAD_WEBHOOK_URL', WEBHOOK):
+        with Cassette(path, mode="record") as cassette:
+            assert "choices" in asyncio.run(provider().complete_async([{"role": "user", "content": "hi"}]))
+            assert asyncio.run(n8n_handler.send_chat_lead_to_n8n_async({"FirstName": "Jane", "Email": "jane@example.com"}))
+        assert cassette.stats()["interactions"] == 2
+        assert async_http.post_json is fake_post_json
+    assert SECRET not in path.read_text()
+
+    with patch.object(async_http, 'post_json', offline_post_json), \
+            patch.object(n8n_handler, 'N8N_CHAT_LEAD_WEBHOOK_URL', WEBHOOK):
+        with Cassette(path, mode="replay", speed=0, strict=True) as cassette:
+            reply = asyncio.run(provider().complete_async([{"role": "user", "content": "hi"}]))
+            assert reply["choices"][0]["message"]["content"] == "Reply to hi"
+            assert asyncio.run(n8n_handler.send_chat_lead_to_n8n_async({"FirstName": "Jane", "Email": "jane@example.com"}))
+            # A miss is a transport error for async callers, never a live request
+            with pytest.raises(async_http.TransportError):
+                asyncio.run(async_http.post_json("http://llm.test/v1/chat/completions", {"messages": []}))
+    assert cassette.stats()["hits"] == 2
+
+
+@patch.dict(os.environ, {"FLUX_TEST_KEY": SECRET, "N8N_CHAT_LEAD_WEBHOOK_URL": WEBHOOK})
+def test_blocking_recording_replays_through_async_clients(recorded):
+    with patch.object(async_http, 'post_json', offline_post_json):
+        with Cassette(recorded, mode="replay", speed=0) as cassette:
+            reply = asyncio.run(provider().complete_async([{"role": "user", "content": "pricing?"}]))
+    assert reply["choices"][0]["message"]["content"] == "Reply to pricing?"
+    assert cassette.stats()["hits"] == 1
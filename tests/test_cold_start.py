@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_entry_point_defers_provider_clients():
+    """Importing the Vercel entry point must not load the LLM/n8n clients or requests."""
+    code = (
+        "import sys, api.index\n"
+        "lazy = ('requests', 'api.utils.llm', 'api.utils.providers', 'api.utils.n8n_handler')\n"
+        "print(','.join(m for m in lazy if m in sys.modules))\n"
+    )
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
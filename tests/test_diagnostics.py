@@ -0,0 +1,48 @@
+from unittest.mock import Mock, patch
+
+from limits.storage import storage_from_string
+
+from api import app
+from api.diagnostics import memory_tracker
+
+AUTH = {"Authorization": "Bearer secret"}
+
+
+def test_diagnostics_hidden_without_token():
+    assert app.test_client().get('/api/diagnostics/memory').status_code == 404
+
+
+@patch('api.diagnostics.DIAGNOSTICS_TOKEN', 'secret')
+def test_memory_report_lists_store_sizes():
+    client = app.test_client()
+    assert client.get('/api/diagnostics/memory').status_code == 401
+
+    storage = storage_from_string("bounded+memory://", max_keys=100)
+    storage.incr("LIMITER/127.0.0.1/chat", expiry=60)
+    with patch('api.diagnostics.limiter', Mock(enabled=True, storage=storage)):
+        report = client.get('/api/diagnostics/memory', headers=AUTH).get_json()
+    assert report["process"]["rss_mb"] > 0
+    assert report["stores"]["rate_limit"] == {
+        "enabled": True, "scheme": "BoundedMemoryStorage", "keys": 1, "max_keys": 100, "evictions": 0,
+    }
+    assert {"size", "max_entries"} <= set(report["stores"]["response_cache"])
+    assert "jobs" in report["stores"]["enrichment_jobs"]
+
+
+@patch('api.diagnostics.DIAGNOSTICS_TOKEN', 'secret')
+def test_snapshots_report_growth_between_calls():
+    client = app.test_client()
+    try:
+        first = client.post('/api/diagnostics/memory/snapshot', headers=AUTH).get_json()
+        assert first["tracing"] and first["diff"] is None
+
+        retained = [bytearray(1024) for _ in range(2000)]  # noqa: F841 - held across the second snapshot
+        second = client.post('/api/diagnostics/memory/snapshot?top=5', headers=AUTH).get_json()
+        assert len(second["diff"]) == 5
+        assert "test_diagnostics.py" in second["diff"][0]["where"]
+        assert second["diff"][0]["size_diff_kb"] >= 2000
+
+        assert client.post('/api/diagnostics/memory/snapshot?group_by=nope', headers=AUTH).status_code == 400
+    finally:
+        stopped = client.delete('/api/diagnostics/memory/snapshot', headers=AUTH).get_json()
+    assert stopped == {"tracing": False} and not memory_tracker.tracing
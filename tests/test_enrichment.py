@@ -0,0 +1,148 @@
+import csv
+import io
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from api import app
+from api.utils import enrichment
+from api.utils.enrichment import JobManager, InvalidLeadFile, parse_lead_csv
+
+CSV = (
+    "first_name,headline,employment_history/0/organization_name,icebreaker\n"
+    "Ada,CTO,Acme,\n"
+    "Bob,Founder,Globex,Already written\n"
+    "Cy,Engineer,Initech,\n"
+).encode()
+
+
+def fake_generate(company, headline):
+    return f"Hi {company}!"
+
+
+def wait_until_finished(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.finished
+
+
+def test_parse_lead_csv_validates_columns_and_rows():
+    fieldnames, rows = parse_lead_csv(b"headline,employment_history/0/organization_name\nCTO,Acme\n")
+    assert fieldnames[-1] == "icebreaker"
+    assert rows == [{"headline": "CTO", "employment_history/0/organization_name": "Acme"}]
+
+    with pytest.raises(InvalidLeadFile):
+        parse_lead_csv(b"first_name\nAda\n")
+    with pytest.raises(InvalidLeadFile):
+        parse_lead_csv(CSV, max_rows=2)
+
+
+def test_job_enriches_rows_and_streams_them_in_order():
+    manager = JobManager(workers=1, row_delay=0, generate=fake_generate)
+    fieldnames, rows = parse_lead_csv(CSV)
+    job = manager.submit("leads.csv", fieldnames, rows)
+
+    streamed = "".join(job.stream_csv(poll_timeout=1.0))
+    wait_until_finished(job)
+
+    result = list(csv.DictReader(io.StringIO(streamed)))
+    assert [r["icebreaker"] for r in result] == ["Hi Acme!", "Already written", "Hi Initech!"]
+    assert job.to_dict()["progress"] == 1.0
+    assert (job.generated, job.skipped, job.failed) == (2, 1, 0)
+
+
+def test_cancel_stops_job_between_rows():
+    manager = JobManager(workers=1, row_delay=5.0, generate=fake_generate)
+    job = manager.submit("leads.csv", *parse_lead_csv(CSV))
+    job.wait_for_rows(0, timeout=2.0)
+    job.cancel()
+    wait_until_finished(job)
+    assert job.status == enrichment.CANCELLED
+    assert len(job.results) == 1
+
+
+@patch('api.enrich.ENRICH_API_TOKEN', 'secret')
+def test_job_endpoints_require_token_and_report_progress():
+    client = app.test_client()
+    manager = JobManager(workers=1, row_delay=0, generate=fake_generate)
+    with patch('api.enrich.job_manager', manager):
+        assert client.post('/api/enrich/jobs', data=CSV).status_code == 401
+
+        auth = {"Authorization": "Bearer secret"}
+        resp = client.post('/api/enrich/jobs?filename=leads.csv', data=CSV, content_type='text/csv', headers=auth)
+        assert resp.status_code == 202
+        job_id = resp.get_json()["job_id"]
+
+        results = client.get(f'/api/enrich/jobs/{job_id}/results', headers=auth)
+        assert results.headers["Content-Disposition"] == 'attachment; filename="leads_with_icebreakers.csv"'
+        assert results.get_data(as_text=True).count("Hi ") == 2
+
+        status = client.get(f'/api/enrich/jobs/{job_id}', headers=auth).get_json()
+        assert status["status"] == "done" and status["processed"] == 3
+        assert client.get('/api/enrich/jobs/missing', headers=auth).status_code == 404
+
+
+def test_job_endpoints_hidden_without_token():
+    assert app.test_client().get('/api/enrich/jobs/anything').status_code == 404
+
+
+def test_submit_refuses_past_the_cap_of_unfinished_jobs():
+    release = threading.Event()
+    manager = JobManager(workers=1, row_delay=0, max_jobs=2, generate=lambda company, headline: release.wait(5) and "Hi")
+    fieldnames, rows = parse_lead_csv(CSV)
+    first = manager.submit("a.csv", fieldnames, rows)
+    manager.submit("b.csv", fieldnames, rows)
+
+    with pytest.raises(enrichment.TooManyJobs):
+        manager.submit("c.csv", fieldnames, rows)
+    assert manager.stats()["jobs"] == 2
+
+    release.set()
+    wait_until_finished(first)
+    manager.submit("c.csv", fieldnames, rows)
+
+
+def test_api_and_cli_share_the_icebreaker_prompt():
+    import sys
+    from pathlib import Path
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "icebreakers"))
+    from lead_enricher import create_basic_prompt
+
+    assert enrichment.build_icebreaker_prompt("Acme", "CTO") == create_basic_prompt("Acme", "CTO")
+    assert '"Unknown Company"' in enrichment.build_icebreaker_prompt("", "")
+
+
+@pytest.mark.parametrize("env", [{"VERCEL": "1"}, {"API_WORKER_PROCESSES": "4"}])
+@patch('api.enrich.ENRICH_API_TOKEN', 'secret')
+def test_jobs_refused_without_a_single_long_running_process(env):
+    manager = JobManager(workers=1, row_delay=0, generate=fake_generate)
+    with patch.dict('os.environ', env), patch('api.enrich.job_manager', manager):
+        resp = app.test_client().post('/api/enrich/jobs', data=CSV, content_type='text/csv',
+                                      headers={"Authorization": "Bearer secret"})
+    assert resp.status_code == 503
+    assert manager.stats()["jobs"] == 0
+
+
+def test_batch_failures_do_not_touch_the_chat_provider():
+    import requests
+    from api.utils.grok import GROK_PROVIDER, GROK_BATCH_PROVIDER
+    from api.utils.providers import ProviderStats
+    from api.utils.resilience import CircuitBreaker, OPEN, CLOSED
+
+    rate_limited = Mock(status_code=429, text="slow down")
+    rate_limited.raise_for_status.side_effect = requests.HTTPError("429")
+    with patch.object(GROK_BATCH_PROVIDER, "breaker", CircuitBreaker("grok-batch-test", failure_threshold=3)), \
+            patch.object(GROK_BATCH_PROVIDER, "stats", ProviderStats()), \
+            patch("requests.post", return_value=rate_limited) as post:
+        chat_samples = len(GROK_PROVIDER.stats._outcomes)
+        results = [enrichment.generate_icebreaker("Acme", "CTO") for _ in range(5)]
+
+        assert results == [enrichment.FAILED_ICEBREAKER] * 5
+        assert post.call_count == 3  # the batch circuit opened after three 429s
+        assert post.call_args.kwargs["json"]["max_tokens"] == 100
+        assert GROK_BATCH_PROVIDER.breaker.state == OPEN
+    assert GROK_PROVIDER.breaker.state == CLOSED
+    assert len(GROK_PROVIDER.stats._outcomes) == chat_samples
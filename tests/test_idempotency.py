@@ -0,0 +1,151 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from api.utils.idempotency import IdempotencyStore, KeyReused, fingerprint
+
+REPLY = "Thanks Ada!\n[LEAD_INFO_COLLECTED] FirstName: Ada, LastName: Lovelace, Email: ada@example.com, Phone: N/A, Message: Automate invoices."
+LEAD = {"FirstName": "Ada", "LastName": "Lovelace", "Email": "ada@example.com", "Phone": "", "Message": "Automate invoices."}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_store_replays_kept_results_until_ttl():
+    clock = FakeClock()
+    store = IdempotencyStore(ttl=10, clock=clock)
+    entry, owner = store.begin("k", fingerprint("hi", []))
+    assert owner
+    store.finish("k", entry, ({"response": "hello"}, 200, {}), keep=True)
+
+    clock.now = 9
+    entry, owner = store.begin("k", fingerprint("hi", []))
+    assert not owner and store.wait(entry, timeout=0) == ({"response": "hello"}, 200, {})
+
+    clock.now = 11
+    assert store.begin("k", fingerprint("hi", []))[1]
+    assert store.stats()["replayed"] == 1
+
+
+def test_store_drops_unkept_results_and_refuses_reused_keys():
+    store = IdempotencyStore()
+    entry, _ = store.begin("k", fingerprint("hi", []))
+    with pytest.raises(KeyReused):
+        store.begin("k", fingerprint("something else", []))
+    store.finish("k", entry, ({"error": "busy"}, 503, {}), keep=False)
+    assert entry.result[1] == 503
+    assert store.begin("k", fingerprint("hi", []))[1]
+
+
+def test_store_caps_keys_and_claims_each_lead_once():
+    store = IdempotencyStore(max_keys=2)
+    for key in "abc":
+        store.begin(key, "fp")
+    assert store.stats()["keys"] == 2 and store.stats()["evictions"] == 1
+
+    assert store.claim_lead("a")
+    assert not store.claim_lead("a")
+    assert store.stats()["leads_suppressed"] == 1
+
+
+def _post(client, key, message="yes"):
+    history = [{"role": "user", "content": "Yes, that's correct."}]
+    return client.post('/api/chatbot', json={"message": message, "conversation_history": history},
+                       headers={"Idempotency-Key": key})
+
+
+@patch('api.chatbot.send_chat_lead_to_n8n')
+@patch('api.chatbot.call_chat_api')
+def test_concurrent_duplicates_share_one_llm_call_and_one_lead(mock_llm, mock_send):
+    from api import app
+
+    def slow_llm(message, history):
+        time.sleep(0.2)
+        return {"choices": [{"message": {"content": REPLY}}]}
+
+    mock_llm.side_effect = slow_llm
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        responses = list(pool.map(lambda _: _post(app.test_client(), "turn-concurrent"), range(3)))
+
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert {r.get_json()["response"] for r in responses} == {"Thanks Ada!"}
+    assert sorted(r.headers.get("Idempotent-Replayed") for r in responses if r.headers.get("Idempotent-Replayed")) == ["true", "true"]
+    mock_llm.assert_called_once()
+    mock_send.assert_called_once_with(LEAD)
+
+    # A later retry is replayed from the store
+    replay = _post(app.test_client(), "turn-concurrent")
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    mock_llm.assert_called_once()
+
+
+@patch('api.chatbot.send_chat_lead_to_n8n')
+@patch('api.chatbot.call_chat_api')
+def test_failed_turn_is_retried_but_lead_still_sent_once(mock_llm, mock_send):
+    from api import app
+    from api.utils.resilience import OVERLOADED
+
+    mock_llm.return_value = {"error": "busy", "unavailable": OVERLOADED}
+    client = app.test_client()
+    assert _post(client, "turn-retry").status_code == 503
+
+    mock_llm.return_value = {"choices": [{"message": {"content": REPLY}}]}
+    assert _post(client, "turn-retry").status_code == 200
+    assert mock_llm.call_count == 2
+
+    # Even once the stored reply is gone, the lead for this key is not sent again
+    from api.chatbot import idempotency_store
+    idempotency_store._entries.clear()
+    assert _post(client, "turn-retry").status_code == 200
+    assert mock_llm.call_count == 3
+    mock_send.assert_called_once_with(LEAD)
+
+
+@patch('api.chatbot.send_chat_lead_to_n8n')
+@patch('api.chatbot.call_chat_api')
+def test_failed_lead_dispatch_is_sent_by_retry(mock_llm, mock_send):
+    from api import app
+    from api.chatbot import idempotency_store
+
+    mock_llm.return_value = {"choices": [{"message": {"content": REPLY}}]}
+    mock_send.side_effect = [False, True]
+    client = app.test_client()
+    assert _post(client, "turn-lead-failed").status_code == 200
+
+    idempotency_store._entries.clear()
+    assert _post(client, "turn-lead-failed").status_code == 200
+    assert mock_send.call_count == 2
+
+
+@patch('api.chatbot.call_chat_api')
+def test_circuit_open_fallback_is_not_replayed(mock_llm):
+    from api import app
+    from api.chatbot import FALLBACK_REPLY
+    from api.utils.resilience import CIRCUIT_OPEN
+
+    mock_llm.return_value = {"error": "down", "unavailable": CIRCUIT_OPEN}
+    client = app.test_client()
+    assert _post(client, "turn-fallback").get_json()["response"] == FALLBACK_REPLY
+
+    mock_llm.return_value = {"choices": [{"message": {"content": "Back online!"}}]}
+    resp = _post(client, "turn-fallback")
+    assert resp.get_json()["response"] == "Back online!"
+    assert "Idempotent-Replayed" not in resp.headers
+
+
+@patch('api.chatbot.call_chat_api')
+def test_key_reuse_with_different_message_is_rejected(mock_llm):
+    from api import app
+
+    mock_llm.return_value = {"choices": [{"message": {"content": "Hi!"}}]}
+    client = app.test_client()
+    assert _post(client, "turn-reuse", "first").status_code == 200
+    assert _post(client, "turn-reuse", "second").status_code == 422
+    assert _post(client, "x" * 300).status_code == 400
@@ -0,0 +1,59 @@
+import json
+from unittest.mock import patch
+
+from api import app
+from api.utils import fastjson, ingest
+
+
+def post(body, **kwargs):
+    return app.test_client().post('/api/chatbot', data=body, content_type='application/json', **kwargs)
+
+
+def test_oversized_body_rejected_before_parsing():
+    before = ingest.rejection_stats()["rejected_by_reason"].get("body_too_large", 0)
+    with patch('api.utils.ingest.fastjson.loads') as mock_loads:
+        resp = post(b"{" + b" " * (ingest.MAX_BODY_BYTES + 10) + b"}")
+        mock_loads.assert_not_called()
+    assert resp.status_code == 413
+    assert ingest.rejection_stats()["rejected_by_reason"]["body_too_large"] == before + 1
+
+
+def test_message_and_history_limits():
+    long_message = json.dumps({"message": "x" * (ingest.MAX_MESSAGE_CHARS + 1)})
+    assert post(long_message).status_code == 413
+
+    too_many = [{"role": "user", "content": "hi"}] * (ingest.MAX_HISTORY_ITEMS + 1)
+    assert post(json.dumps({"message": "hi", "conversation_history": too_many})).status_code == 413
+
+    big_item = [{"role": "user", "content": "x" * (ingest.MAX_HISTORY_ITEM_CHARS + 1)}]
+    assert post(json.dumps({"message": "hi", "conversation_history": big_item})).status_code == 413
+
+
+def test_malformed_payloads_keep_existing_errors():
+    resp = post(json.dumps({"conversation_history": []}))
+    assert resp.status_code == 400
+    assert resp.get_json() == {"error": "No message provided"}
+
+    resp = post(json.dumps({"message": "hi", "conversation_history": [{"role": "user"}]}))
+    assert resp.status_code == 400
+    assert resp.get_json() == {"error": "Invalid conversation history format"}
+
+    assert post(b"{not json").status_code == 400
+
+
+@patch('api.chatbot.call_chat_api')
+def test_valid_payload_round_trip(mock_llm):
+    mock_llm.return_value = {"choices": [{"message": {"content": "Hi! ✨"}}]}
+    history = [{"role": "user", "content": "hello"}, {"role": "assistant", "content": "hey"}]
+
+    resp = post(fastjson.dumps({"message": "  what's new?  ", "conversation_history": history}))
+    assert resp.status_code == 200
+    data = json.loads(resp.data)
+    assert data["response"] == "Hi! ✨"
+    assert data["conversation_history"][-2] == {"role": "user", "content": "what's new?"}
+
+
+def test_fastjson_codec_round_trip():
+    obj = {"b": [1, 2.5, None, True], "a": "café"}
+    assert fastjson.loads(fastjson.dumps(obj)) == obj
+    assert fastjson.loads(fastjson.dumps(obj).decode()) == obj
@@ -0,0 +1,149 @@
+import os
+import sys
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pandas as pd
+import requests
+from requests.structures import CaseInsensitiveDict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "icebreakers"))
+
+from key_pool import KeyPool, parse_reset, REVOKED_BENCH_SECONDS  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def reply(status=200, **headers):
+    return Mock(status_code=status, headers=CaseInsensitiveDict(headers))
+
+
+def test_parse_reset_formats():
+    assert parse_reset("20") == 20.0
+    assert parse_reset("6m0s") == 360.0
+    assert parse_reset("1.5s") == 1.5
+    assert parse_reset("250ms") == 0.25
+    assert parse_reset(None) is None and parse_reset("soon") is None
+
+
+def test_routes_to_key_with_most_headroom_and_benches_exhausted_keys():
+    clock = FakeClock()
+    pool = KeyPool(["sk-aaaa1111", "sk-bbbb2222"], clock=clock)
+    a, b = pool.keys
+
+    pool.release(pool.acquire(), reply(**{"x-ratelimit-remaining-requests": "2", "x-ratelimit-reset-requests": "30s"}))
+    pool.release(pool.acquire(), reply(**{"x-ratelimit-remaining-requests": "50", "x-ratelimit-reset-requests": "30s"}))
+    assert pool.acquire() is b
+
+    pool.release(b, reply(429, **{"retry-after": "20"}))
+    assert pool.acquire() is a
+    pool.release(a, reply(**{"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "30s"}))
+    # Both benched: a until its window resets, b for Retry-After
+    assert pool.acquire(timeout=0) is None
+
+    clock.now += 21
+    assert pool.acquire() is b
+    pool.release(b, reply(401))
+    clock.now += 10
+    assert pool.acquire() is a  # a's window reset; b is benched as rejected
+    assert b.benched_until == clock.now - 10 + REVOKED_BENCH_SECONDS
+
+    report = {row["key"]: row for row in pool.report()}
+    assert report["key 2 (…2222)"]["rate_limited"] == 1 and report["key 2 (…2222)"]["rejected"] == 1
+    assert report["key 2 (…2222)"]["status"] == "benched: rejected (401)"
+
+
+def test_enricher_spreads_calls_over_pooled_keys(tmp_path, capsys):
+    from lead_enricher_single import SingleFileLeadEnricher
+
+    used = []
+
+    def post(url, headers, json, timeout):
+        used.append(headers["Authorization"])
+        if headers["Authorization"] == "Bearer sk-first-0001":
+            return Mock(status_code=429, headers=CaseInsensitiveDict({"retry-after": "60"}),
+                        raise_for_status=Mock(side_effect=requests.HTTPError("429 Too Many Requests")))
+        response = reply(**{"x-ratelimit-remaining-requests": "99"})
+        response.json.return_value = {"choices": [{"message": {"content": "Hi."}}], "usage": {"total_tokens": 12}}
+        return response
+
+    with patch.dict(os.environ, {"XAI_API_KEYS": "sk-first-0001, sk-second-0002"}, clear=True), \
+            patch('requests.post', side_effect=post):
+        enricher = SingleFileLeadEnricher(output_folder=str(tmp_path))
+        results = [enricher._call_grok_api("prompt") for _ in range(4)]
+
+    assert "error" in results[0] and all("choices" in r for r in results[1:])
+    assert used == ["Bearer sk-first-0001"] + ["Bearer sk-second-0002"] * 3
+    enricher.keys.print_report()
+    assert "key 2 (…0002): 3 requests, 3 ok" in capsys.readouterr().out
+
+
+def test_enricher_returns_key_and_permit_when_the_body_is_not_json(tmp_path):
+    from lead_enricher_single import SingleFileLeadEnricher
+
+    response = reply(**{"x-ratelimit-remaining-requests": "99"})
+    response.json.side_effect = ValueError("Expecting value: line 1 column 1 (char 0)")
+
+    with patch.dict(os.environ, {"XAI_API_KEY": "sk-only-0001"}, clear=True), \
+            patch('requests.post', return_value=response):
+        enricher = SingleFileLeadEnricher(output_folder=str(tmp_path))
+        enricher.quota = Mock()
+        result = enricher._call_grok_api("prompt")
+
+    assert "error" in result
+    assert enricher.keys.keys[0].in_flight == 0
+    enricher.quota.report.assert_called_once_with(enricher.quota.acquire.return_value, 0)
+
+
+def test_spent_key_is_not_handed_out_until_its_window_resets():
+    clock = FakeClock()
+    pool = KeyPool(["sk-aaaa1111", "sk-bbbb2222"], clock=clock)
+    a, b = pool.keys
+    pool.release(pool.acquire(), reply(**{"x-ratelimit-remaining-requests": "1", "x-ratelimit-reset-requests": "30s"}))
+    pool.release(pool.acquire(), reply(**{"x-ratelimit-remaining-requests": "1", "x-ratelimit-reset-requests": "60s"}))
+
+    # Both last calls are still in flight, so neither key has a request left
+    assert {pool.acquire(), pool.acquire()} == {a, b}
+    assert pool.acquire(timeout=0) is None
+
+    clock.now += 31
+    assert pool.acquire(timeout=0) is a
+
+
+def test_enricher_runs_calls_in_parallel_across_the_pool(tmp_path):
+    import threading
+    from lead_enricher_single import SingleFileLeadEnricher
+
+    source = tmp_path / "leads.csv"
+    pd.DataFrame({
+        "first_name": [f"Lead{i}" for i in range(8)],
+        "headline": ["CTO"] * 8,
+        "employment_history/0/organization_name": [f"Co{i}" for i in range(8)],
+    }).to_csv(source, index=False)
+    # Only returns once four calls are in flight at the same time
+    all_in_flight = threading.Barrier(4, timeout=5)
+
+    def post(url, headers, json, timeout):
+        all_in_flight.wait()
+        company = json["messages"][0]["content"].split('Company Name: "')[1].split('"')[0]
+        response = reply(**{"x-ratelimit-remaining-requests": "99", "x-ratelimit-reset-requests": "60s"})
+        response.json.return_value = {"choices": [{"message": {"content": f"Nice work at {company}."}}]}
+        return response
+
+    with patch.dict(os.environ, {"XAI_API_KEYS": "sk-first-0001,sk-second-0002", "XAI_KEY_CONCURRENCY": "2"}, clear=True), \
+            patch('requests.post', side_effect=post), \
+            patch('lead_enricher_single.time') as mock_time:
+        enricher = SingleFileLeadEnricher(output_folder=str(tmp_path / "out"), prompt_version="v1")
+        assert enricher.keys.workers() == 4
+        enricher.process_file(str(source))
+
+    out = pd.read_csv(tmp_path / "out" / "leads_with_icebreakers.csv")
+    assert list(out["icebreaker"]) == [f"Lead{i}, nice work at Co{i}." for i in range(8)]
+    # The pool paces calls from the rate-limit headers, so there is no fixed sleep per row
+    mock_time.sleep.assert_not_called()
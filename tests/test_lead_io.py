@@ -0,0 +1,71 @@
+import gzip
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "icebreakers"))
+
+import lead_io  # noqa: E402
+from lead_io import read_leads, write_leads, split_name, lead_format, find_lead_files  # noqa: E402
+
+COMPANY = 'employment_history/0/organization_name'
+
+
+def leads():
+    return pd.DataFrame({
+        "first_name": ["Shannon", "Andrew"],
+        "headline": ["Insurance Agent/Broker", "Loan Officer"],
+        COMPANY: ["Burns Insurance", "Atlantic Home Loans"],
+        "icebreaker": ["", "Already written — with a dash"],
+    })
+
+
+def test_format_comes_from_the_file_name():
+    assert split_name("out/Leads - I (1).csv.gz") == ("Leads - I (1)", ".csv.gz")
+    assert split_name("leads.v2.jsonl") == ("leads.v2", ".jsonl")
+    assert lead_format("leads.CSV") == ("csv", None)
+    assert lead_format("leads.ndjson.zst") == ("jsonl", "zstd")
+    with pytest.raises(ValueError):
+        lead_format("leads.xlsx")
+    with pytest.raises(ValueError):
+        lead_format("leads.csv.bz2")
+
+
+@pytest.mark.parametrize("name", ["leads.csv", "leads.csv.gz", "leads.jsonl", "leads.jsonl.gz"])
+def test_round_trip(tmp_path, name):
+    write_leads(leads(), tmp_path / name)
+    back = read_leads(tmp_path / name).fillna("")
+    assert back.to_dict("records") == leads().to_dict("records")
+    if name.endswith(".gz"):
+        assert gzip.open(tmp_path / name).read(10)
+
+
+def test_c_parser_is_the_default_and_pyarrow_is_opt_in():
+    assert lead_io.resolve_engine() == "c"
+    with patch.object(lead_io, "LEAD_CSV_ENGINE", "pyarrow"):
+        assert lead_io.resolve_engine() == "pyarrow"
+    with patch.dict(sys.modules, {"pyarrow": None}):
+        assert lead_io.resolve_engine("auto") == "c"
+    assert lead_io.resolve_engine("python") == "python"
+    with pytest.raises(ValueError):
+        lead_io.resolve_engine("polars")
+
+
+def test_enricher_reads_gzipped_export_and_keeps_its_format(tmp_path):
+    from lead_enricher import LeadEnricher
+
+    (tmp_path / "in").mkdir()
+    write_leads(leads(), tmp_path / "in" / "export.csv.gz")
+    write_leads(leads(), tmp_path / "in" / "more.jsonl")
+    (tmp_path / "in" / "notes.txt").write_text("not leads")
+    assert [p.name for p in find_lead_files(tmp_path / "in")] == ["export.csv.gz", "more.jsonl"]
+
+    LeadEnricher(str(tmp_path / "in"), str(tmp_path / "out"), local=True).run()
+
+    out = read_leads(tmp_path / "out" / "export_with_icebreakers.csv.gz")
+    assert "Burns Insurance" in out.loc[0, "icebreaker"]
+    assert out.loc[1, "icebreaker"] == "Already written — with a dash"
+    assert len(read_leads(tmp_path / "out" / "more_with_icebreakers.jsonl")) == 2
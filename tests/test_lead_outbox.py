@@ -0,0 +1,66 @@
+import logging
+from unittest.mock import patch, MagicMock
+
+import requests
+
+from api.utils import n8n_handler
+from api.utils.lead_outbox import LeadOutbox, BASE_RETRY_DELAY_SECONDS
+from api.utils.resilience import CircuitBreaker
+
+WEBHOOK = "https://n8n.example.com/webhook/leads"
+LEAD = {"FirstName": "Jane", "Email": "jane@example.com", "Phone": "555 123 4567", "Message": "Call me"}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_outbox_backs_off_and_keeps_dead_leads(tmp_path):
+    clock = FakeClock()
+    outbox = LeadOutbox(str(tmp_path / "outbox.db"), max_attempts=2, clock=clock)
+    outbox.add("ref1", {"Email": "a@example.com"})
+
+    assert outbox.claim_due() == []
+    clock.now += BASE_RETRY_DELAY_SECONDS
+    assert outbox.claim_due() == [("ref1", {"Email": "a@example.com"}, 1)]
+    # Claimed leads are leased, not offered twice
+    assert outbox.claim_due() == []
+
+    assert not outbox.retry_failed("ref1", 2)
+    assert outbox.stats() == {"pending": 0, "dead": 1}
+
+
+@patch.object(n8n_handler, 'N8N_CHAT_LEAD_WEBHOOK_URL', WEBHOOK)
+def test_lead_is_queued_while_circuit_open_and_retried(tmp_path, caplog):
+    outbox = LeadOutbox(str(tmp_path / "outbox.db"))
+    with patch.object(n8n_handler, '_outbox', outbox), \
+            patch.object(n8n_handler.n8n_breaker, 'allow', return_value=False), \
+            patch('requests.post') as mock_post, caplog.at_level(logging.INFO):
+        assert n8n_handler.send_chat_lead_to_n8n(LEAD)
+    mock_post.assert_not_called()
+    assert outbox.stats()["pending"] == 1
+    # Logs identify the lead by reference only
+    for value in LEAD.values():
+        assert value not in caplog.text
+
+    ok = MagicMock(spec=requests.Response)
+    with patch.object(n8n_handler, '_outbox', outbox), \
+            patch.object(outbox, '_clock', return_value=outbox._clock() + BASE_RETRY_DELAY_SECONDS), \
+            patch('requests.post', return_value=ok) as mock_post:
+        assert n8n_handler.retry_pending_leads() == 1
+    assert mock_post.call_args.kwargs["json"]["Email"] == "jane@example.com"
+    assert outbox.stats() == {"pending": 0, "dead": 0}
+
+
+@patch.object(n8n_handler, 'N8N_CHAT_LEAD_WEBHOOK_URL', WEBHOOK)
+def test_failed_post_is_queued(tmp_path):
+    outbox = LeadOutbox(str(tmp_path / "outbox.db"))
+    with patch.object(n8n_handler, '_outbox', outbox), \
+            patch.object(n8n_handler, 'n8n_breaker', CircuitBreaker("n8n-test")), \
+            patch('requests.post', side_effect=requests.exceptions.ConnectionError("refused")):
+        assert n8n_handler.send_chat_lead_to_n8n(LEAD)
+    assert outbox.stats()["pending"] == 1
@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+from api.utils.lead_stream import LeadMarkerParser, parse_lead_fields, split_lead_marker
+from api.utils.deepseek import extract_lead_info
+
+REPLY = (
+    "Perfect, thanks for confirming!\n"
+    "[LEAD_INFO_COLLECTED] FirstName: Jane, LastName: Doe, Email: jane@example.com, Phone: N/A, "
+    "Message: We need help automating follow-ups, invoices, and scheduling.\n"
+    "Great! I've passed your information along to Reid."
+)
+VISIBLE = "Perfect, thanks for confirming!\nGreat! I've passed your information along to Reid."
+LEAD = {
+    "FirstName": "Jane",
+    "LastName": "Doe",
+    "Email": "jane@example.com",
+    "Phone": "",
+    "Message": "We need help automating follow-ups, invoices, and scheduling.",
+}
+
+
+def stream(text, size):
+    parser = LeadMarkerParser()
+    visible = "".join(parser.feed(text[i:i + size]) for i in range(0, len(text), size)) + parser.close()
+    return visible, parser.lead
+
+
+def test_parse_lead_fields_keeps_commas_in_message():
+    assert parse_lead_fields(REPLY.split("] ", 1)[1].split("\n")[0]) == LEAD
+
+
+def test_parse_lead_fields_missing_fields_are_empty():
+    assert parse_lead_fields(" FirstName: Sam, Email: sam@example.com") == {
+        "FirstName": "Sam", "LastName": "", "Email": "sam@example.com", "Phone": "", "Message": ""
+    }
+
+
+def test_every_chunking_gives_the_same_result():
+    for size in (1, 2, 3, 7, 21, 22, 50, len(REPLY)):
+        assert stream(REPLY, size) == (VISIBLE, LEAD), size
+
+
+def test_text_passes_through_without_marker():
+    parser = LeadMarkerParser()
+    assert parser.feed("Hello there, ") == "Hello there, "
+    # A possible marker prefix is held back until it is ruled out
+    assert parser.feed("see [LEAD") == "see "
+    assert parser.feed("ERSHIP] tips") == "[LEADERSHIP] tips"
+    assert parser.close() == ""
+    assert parser.lead is None
+
+
+def test_marker_line_at_end_of_stream():
+    visible, lead = stream("Thanks!\n[LEAD_INFO_COLLECTED] FirstName: Ann, Message: Call me", 4)
+    assert visible == "Thanks!\n"
+    assert lead["FirstName"] == "Ann" and lead["Message"] == "Call me"
+
+
+def test_split_lead_marker_without_marker():
+    assert split_lead_marker("Just chatting") == ("Just chatting", None)
+
+
+def test_extract_lead_info_uses_shared_parser():
+    assert extract_lead_info(REPLY) == LEAD
+    assert extract_lead_info("no marker here") is None
+
+
+@patch('api.chatbot.send_chat_lead_to_n8n')
+@patch('api.chatbot.call_chat_api')
+def test_chat_strips_marker_and_sends_lead_record(mock_llm, mock_send):
+    from api import app
+
+    mock_llm.return_value = {"choices": [{"message": {"content": REPLY}}]}
+    history = [{"role": "user", "content": "Yes, that's correct."}]
+    resp = app.test_client().post('/api/chatbot', json={"message": "yes", "conversation_history": history})
+
+    assert resp.status_code == 200
+    assert resp.get_json()["response"] == VISIBLE
+    mock_send.assert_called_once_with(LEAD)
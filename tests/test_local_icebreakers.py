@@ -0,0 +1,89 @@
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "icebreakers"))
+
+from local_icebreakers import local_icebreaker, industry_key, role_key, SOURCE_COLUMN  # noqa: E402
+
+COMPANY = 'employment_history/0/organization_name'
+
+
+def leads():
+    return pd.DataFrame({
+        "first_name": ["Shannon", "Andrew", "Maya"],
+        "headline": ["Insurance Agent/Broker", "Mortgage Loan Originator, NMLS #1234", "Founder"],
+        COMPANY: ["Burns Insurance", "Atlantic Home Loans", float("nan")],
+        "industry": ["insurance", "Financial Services", "mystery"],
+        "icebreaker": ["", "", ""],
+    })
+
+
+def test_lookup_keys_and_stable_templates():
+    assert industry_key("Commercial Real Estate") == "real_estate"
+    assert role_key("NMLS #239174, Mortgage Loan Originator, President of Atlantic") == "owner"
+    assert role_key("Insurance Agent/Broker") == "broker"
+    assert role_key("Master of Computer Applications") is None
+
+    text = local_icebreaker("Burns Insurance", "Insurance Broker", "insurance")
+    assert "Burns Insurance" in text
+    assert text == local_icebreaker("Burns Insurance", "Insurance Broker", "insurance")
+    assert "your company" in local_icebreaker(float("nan"), float("nan"), float("nan"))
+
+
+def test_local_mode_needs_no_api_key_and_marks_rows(tmp_path):
+    from lead_enricher import LeadEnricher
+
+    (tmp_path / "in").mkdir()
+    leads().to_csv(tmp_path / "in" / "leads.csv", index=False)
+    with patch.dict(os.environ, {}, clear=True), patch('requests.post', side_effect=AssertionError("network used")):
+        LeadEnricher(str(tmp_path / "in"), str(tmp_path / "out"), local=True).run()
+
+    out = pd.read_csv(tmp_path / "out" / "leads_with_icebreakers.csv")
+    assert (out[SOURCE_COLUMN] == "template").all()
+    assert "Burns Insurance" in out.loc[0, "icebreaker"]
+
+
+def test_upgrade_pass_replaces_only_template_rows(tmp_path):
+    from lead_enricher import LeadEnricher
+
+    df = leads()
+    df["icebreaker"] = ["template one", "written by hand", "template three"]
+    df[SOURCE_COLUMN] = ["template", "", "template"]
+    (tmp_path / "in").mkdir()
+    df.to_csv(tmp_path / "in" / "leads.csv", index=False)
+
+    def reply(self, prompt):
+        # Rows are generated on several threads, so reply by row rather than by call order
+        if "Burns Insurance" in prompt:
+            return {"choices": [{"message": {"content": "Fresh LLM line."}}]}
+        return {"error": "429 Too Many Requests"}
+
+    with patch.dict(os.environ, {"XAI_API_KEY": "test"}), \
+            patch.object(LeadEnricher, '_call_grok_api', reply), \
+            patch('lead_enricher.time'):
+        LeadEnricher(str(tmp_path / "in"), str(tmp_path / "out"), upgrade_templates=True).run()
+
+    out = pd.read_csv(tmp_path / "out" / "leads_with_icebreakers.csv").fillna("")
+    assert list(out["icebreaker"]) == ["Fresh LLM line.", "written by hand", "template three"]
+    assert list(out[SOURCE_COLUMN]) == ["llm", "", "template"]
+
+
+def test_single_file_falls_back_to_templates_on_api_errors(tmp_path):
+    from lead_enricher_single import SingleFileLeadEnricher
+
+    source = tmp_path / "leads.csv"
+    leads().to_csv(source, index=False)
+    with patch.dict(os.environ, {"XAI_API_KEY": "test"}), \
+            patch.object(SingleFileLeadEnricher, '_call_grok_api', lambda self, prompt: {"error": "quota exhausted"}), \
+            patch('lead_enricher_single.time'):
+        enricher = SingleFileLeadEnricher(output_folder=str(tmp_path / "out"), fallback_local=True)
+        enricher.process_file(str(source))
+
+    out = pd.read_csv(tmp_path / "out" / "leads_with_icebreakers.csv")
+    assert not out["icebreaker"].str.contains("API_ERROR").any()
+    assert out.loc[0, "icebreaker"].startswith("Shannon, ")
+    assert (out[SOURCE_COLUMN] == "template").all()
@@ -0,0 +1,58 @@
+import os
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from api.utils import llm
+from api.utils.model_tiers import classify_turn, FAST, MAIN
+from api.utils.providers import Provider
+
+
+@pytest.mark.parametrize("message, history, expected", [
+    ("thanks!", None, FAST),
+    ("Ok cool", None, FAST),
+    ("jane@example.com", None, FAST),
+    ("Jane Doe", [{"role": "assistant", "content": "Happy to connect you! What's your name?"}], FAST),
+    ("How can AI help my logistics company?", None, MAIN),
+    ("Tell me about your services", None, MAIN),
+    ("Jane Doe", [{"role": "assistant", "content": "We build custom AI agents. Want to hear more?"}], MAIN),
+    ("Jane Doe", [{"role": "assistant", "content": "Sure! How should Reid contact you?"}], MAIN),
+    ("I run a small bakery and want to automate ordering and customer follow ups somehow", None, MAIN),
+])
+def test_classify_turn(message, history, expected):
+    assert classify_turn(message, history)[0] == expected
+
+
+CONFIRMATION = [
+    {"role": "user", "content": "jane@example.com"},
+    {"role": "assistant", "content": "Just to confirm: Reid should contact you, Jane, via email at jane@example.com "
+                                     "regarding automating your invoices. Does that all look correct to you?"},
+]
+
+
+@pytest.mark.parametrize("message", ["yes", "correct", "Yes, that's correct.", "yep looks good"])
+def test_lead_confirmation_goes_to_main_tier(message):
+    assert classify_turn(message, CONFIRMATION) == (MAIN, "lead confirmation")
+
+
+@patch('api.utils.providers.requests.post')
+@patch.dict(os.environ, {"FLUX_TEST_KEY": "secret"})
+def test_provider_uses_tier_model(mock_post):
+    mock_post.return_value = MagicMock(json=MagicMock(return_value={"choices": []}))
+    provider = Provider(name="grok", api_url="http://fake", api_key_env="FLUX_TEST_KEY", model="grok-3",
+                        max_tokens=250, tier_models={"fast": "grok-3-mini"})
+
+    provider.complete([], tier="fast", max_tokens=120)
+    assert mock_post.call_args.kwargs["json"]["model"] == "grok-3-mini"
+    assert mock_post.call_args.kwargs["json"]["max_tokens"] == 120
+
+    provider.complete([], tier="main")
+    assert mock_post.call_args.kwargs["json"]["model"] == "grok-3"
+
+
+def test_call_chat_api_routes_acknowledgements_to_fast_tier():
+    with patch.object(llm.chat_router, 'complete', return_value={"choices": []}) as mock_complete:
+        llm.call_chat_api("thanks!", [])
+    _, kwargs = mock_complete.call_args
+    assert kwargs["tier"] == FAST
+    assert kwargs["max_tokens"] < llm.CHAT_MAX_TOKENS
@@ -0,0 +1,117 @@
+import os
+import subprocess
+import sys
+import time
+import pstats
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from flask import Flask
+
+from api.utils import profiling
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "icebreakers"))
+
+
+def busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def make_app(**options):
+    app = Flask(__name__)
+    profiling.init_app(app, enabled=True, **options)
+
+    @app.route('/work')
+    def work():
+        busy_wait(0.05)
+        return "ok"
+
+    return app
+
+
+def test_sampler_collapses_stacks_by_module_and_function():
+    sampler = profiling.StackSampler(interval=0.002).start()
+    busy_wait(0.1)
+    sampler.stop()
+
+    assert sampler.samples > 10
+    stack, count = sampler.counts.most_common(1)[0]
+    assert stack.endswith("test_profiling:test_sampler_collapses_stacks_by_module_and_function;test_profiling:busy_wait")
+    line = sampler.collapsed().splitlines()[0]
+    assert line == f"{stack} {count}"
+    assert ("test_profiling", 1.0) in sampler.summary()
+
+
+def test_request_profiled_only_with_matching_header(tmp_path):
+    client = make_app(token="s3cret").test_client()
+    with patch.object(profiling, 'PROFILING_DIR', str(tmp_path)):
+        assert "X-Profile-File" not in client.get('/work').headers
+        assert "X-Profile-File" not in client.get('/work', headers={"X-Profile": "guess"}).headers
+        resp = client.get('/work', headers={"X-Profile": "s3cret"})
+
+    assert int(resp.headers["X-Profile-Samples"]) > 0
+    collapsed = (tmp_path / resp.headers["X-Profile-File"]).read_text()
+    assert "test_profiling:busy_wait" in collapsed
+
+
+GEVENT_REQUESTS = """
+from gevent import monkey; monkey.patch_all()
+import time, gevent
+from api.utils.profiling import StackSampler
+
+def spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def profiled_request():
+    sampler = StackSampler(interval=0.002).start()
+    for _ in range(4):
+        spin(0.02)
+        gevent.sleep(0.02)
+    print(sampler.stop().collapsed())
+
+def other_request():
+    for _ in range(20):
+        spin(0.005)
+        gevent.sleep(0)
+
+gevent.joinall([gevent.spawn(profiled_request), gevent.spawn(other_request)])
+"""
+
+
+def test_sampler_follows_the_request_greenlet_under_gevent():
+    pytest.importorskip("gevent")
+    root = Path(__file__).resolve().parent.parent
+    result = subprocess.run([sys.executable, "-c", GEVENT_REQUESTS], cwd=root, env=dict(os.environ, PYTHONPATH=str(root)),
+                            capture_output=True, text=True, check=True, timeout=60)
+    stacks = result.stdout.strip().splitlines()
+
+    assert any("__main__:profiled_request;__main__:spin" in stack for stack in stacks)
+    # Time suspended in gevent.sleep is attributed to the request, never the other greenlet's work
+    assert any("gevent" in stack for stack in stacks)
+    assert not any("other_request" in stack for stack in stacks)
+
+
+def test_cprofile_mode_writes_pstats(tmp_path):
+    client = make_app(mode="cprofile").test_client()
+    with patch.object(profiling, 'PROFILING_DIR', str(tmp_path)):
+        resp = client.get('/work', headers={"X-Profile": "1"})
+
+    stats = pstats.Stats(str(tmp_path / resp.headers["X-Profile-File"]))
+    assert any(func[2] == "busy_wait" for func in stats.stats)
+
+
+def test_enricher_profile_flag_writes_flamegraph_input(tmp_path, capsys):
+    from profiler import maybe_profile
+
+    with maybe_profile(str(tmp_path / "run.collapsed")):
+        busy_wait(0.05)
+
+    assert "busy_wait" in (tmp_path / "run.collapsed").read_text()
+    assert "written to" in capsys.readouterr().out
+    with maybe_profile(None) as sampler:
+        assert sampler is None
@@ -0,0 +1,157 @@
+import os
+import time
+from unittest.mock import patch, MagicMock
+
+import requests
+
+from api.utils.providers import Provider, ProviderRouter, ProviderStats, build_messages
+
+
+class FakeProvider(Provider):
+    """Provider whose completion is scripted instead of sent over HTTP."""
+
+    def __init__(self, name, delay=0.0, error=None):
+        super().__init__(name=name, api_url="http://fake", api_key_env="FAKE_KEY", model=name, max_tokens=10)
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    @property
+    def configured(self):
+        return True
+
+    def complete(self, messages, **overrides):
+        self.calls += 1
+        started = time.monotonic()
+        time.sleep(self.delay)
+        result = {"error": self.error} if self.error else {"choices": [{"message": {"content": self.name}}]}
+        self.stats.record(time.monotonic() - started, "error" not in result)
+        return result
+
+
+def test_build_messages_with_context():
+    messages = build_messages("system", "hi", [{"role": "assistant", "content": "hello"}], retrieved_context="ctx")
+    assert messages[0] == {"role": "system", "content": "system"}
+    assert messages[1]["role"] == "assistant"
+    assert "ctx" in messages[-1]["content"] and "hi" in messages[-1]["content"]
+
+
+def test_stats_percentiles_and_benching():
+    stats = ProviderStats()
+    for latency in (0.1, 0.2, 0.3, 0.4, 1.0):
+        stats.record(latency, True)
+    assert stats.percentile(50) == 0.3
+    assert stats.percentile(95) == 1.0
+    assert stats.healthy
+
+    for _ in range(3):
+        stats.record(0.0, False)
+    assert not stats.healthy
+    assert stats.error_rate == 3 / 8
+
+
+def test_router_prefers_fastest_provider():
+    slow, fast = FakeProvider("slow"), FakeProvider("fast")
+    for _ in range(5):
+        slow.stats.record(2.0, True)
+        fast.stats.record(0.5, True)
+
+    router = ProviderRouter([slow, fast])
+    assert [p.name for p in router.ranked()] == ["fast", "slow"]
+    assert router.complete([])["choices"][0]["message"]["content"] == "fast"
+
+
+def test_router_fails_over_on_error():
+    broken, backup = FakeProvider("broken", error="HTTP error: 503"), FakeProvider("backup")
+    router = ProviderRouter([broken, backup])
+
+    result = router.complete([])
+    assert result["choices"][0]["message"]["content"] == "backup"
+    assert broken.calls == 1
+
+
+def test_router_hedges_slow_primary():
+    slow, fast = FakeProvider("slow", delay=0.5), FakeProvider("fast")
+    router = ProviderRouter([slow, fast], hedge=True, hedge_default_delay=0.05)
+
+    started = time.monotonic()
+    result = router.complete([])
+    assert result["choices"][0]["message"]["content"] == "fast"
+    assert time.monotonic() - started < 0.4
+
+
+def test_router_without_configured_providers():
+    provider = Provider(name="grok", api_url="http://fake", api_key_env="FLUX_TEST_MISSING_KEY", model="m", max_tokens=1)
+    assert ProviderRouter([provider]).complete([]) == {"error": "API key not configured."}
+
+
+@patch('api.utils.providers.requests.post')
+@patch.dict(os.environ, {"FLUX_TEST_KEY": "secret"})
+def test_provider_complete_timeout(mock_post):
+    mock_post.side_effect = requests.exceptions.Timeout("slow")
+    provider = Provider(name="grok", display_name="Grok", api_url="http://fake", api_key_env="FLUX_TEST_KEY", model="m", max_tokens=1)
+
+    assert provider.complete([]) == {"error": "Request to Grok API timed out."}
+    assert provider.stats.error_rate == 1.0
+    _, kwargs = mock_post.call_args
+    assert kwargs["headers"]["Authorization"] == "Bearer secret"
+
+
+def test_open_circuit_cancels_the_quota_permit():
+    quota = MagicMock()
+    quota.acquire.return_value = "permit-1"
+    provider = Provider(name="p", api_url="http://fake", api_key_env="FAKE_KEY", model="m", max_tokens=10,
+                        quota_clients={"chat": quota})
+    for _ in range(3):
+        provider.breaker.record_failure()
+
+    with patch('requests.post') as post:
+        result = provider.complete([{"role": "user", "content": "hi"}])
+    assert result["unavailable"] == "circuit_open"
+    post.assert_not_called()
+    # Both the request slot and the tokens go back, not just the tokens
+    quota.cancel.assert_called_once_with("permit-1")
+    quota.report.assert_not_called()
+
+
+def _html_page(url, **kwargs):
+    response = MagicMock(status_code=200, text="<html>502 Bad Gateway</html>")
+    if "backup" in url:
+        response.json.return_value = {"choices": [{"message": {"content": "backup"}}], "usage": {"total_tokens": 7}}
+    else:
+        response.json.side_effect = ValueError("Expecting value: line 1 column 1 (char 0)")
+    return response
+
+
+def test_non_json_reply_fails_over_and_settles_the_permit():
+    quota = MagicMock()
+    quota.acquire.return_value = "permit-1"
+    primary = Provider(name="primary", api_url="http://primary", api_key_env="FAKE_KEY", model="m", max_tokens=10,
+                       quota_clients={"chat": quota})
+    backup = Provider(name="backup", api_url="http://backup", api_key_env="FAKE_KEY", model="m", max_tokens=10)
+
+    with patch.dict(os.environ, {"FAKE_KEY": "k"}), patch('requests.post', side_effect=_html_page):
+        result = ProviderRouter([primary, backup]).complete([{"role": "user", "content": "hi"}])
+
+    assert result["choices"][0]["message"]["content"] == "backup"
+    assert primary.stats.error_rate == 1.0 and primary.breaker.snapshot()["failures"] == 1
+    quota.report.assert_called_once_with("permit-1", 0)
+
+
+def test_non_json_reply_is_a_failure_on_the_async_path():
+    import asyncio
+    from api.utils import async_http
+
+    async def post_json(url, payload, headers=None, timeout=30.0):
+        return async_http.AsyncResponse(200, "<html>502 Bad Gateway</html>")
+
+    quota = MagicMock()
+    quota.acquire.return_value = "permit-2"
+    provider = Provider(name="p", api_url="http://fake", api_key_env="FAKE_KEY", model="m", max_tokens=10,
+                        quota_clients={"chat": quota})
+    with patch.object(async_http, "post_json", post_json):
+        result = asyncio.run(provider.complete_async([{"role": "user", "content": "hi"}]))
+
+    assert "invalid response" in result["error"]
+    assert provider.stats.error_rate == 1.0
+    quota.report.assert_called_once_with("permit-2", 0)
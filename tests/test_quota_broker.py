@@ -0,0 +1,122 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from api.utils.quota_broker import QuotaBroker, BrokerServer, QuotaClient, CHAT, BATCH
+
+
+def test_batch_keeps_chat_reserve_and_uses_the_rest():
+    broker = QuotaBroker(requests_per_minute=10, tokens_per_minute=1000, chat_reserve=0.2)
+
+    granted = 0
+    while broker.acquire(BATCH, 10, timeout=0)[0]:
+        granted += 1
+    # Batch stops at the reserve (2 requests) that chat can still use
+    assert granted == 8
+    assert broker.acquire(CHAT, 10, timeout=0)[0]
+    assert broker.acquire(CHAT, 10, timeout=0)[0]
+    permit, retry_after = broker.acquire(CHAT, 10, timeout=0)
+    assert permit is None and retry_after > 0
+
+
+def test_waiting_chat_preempts_waiting_batch():
+    # 600 requests/min refills one request every 0.1 s
+    broker = QuotaBroker(requests_per_minute=600, tokens_per_minute=10**6, chat_reserve=0.0)
+    while broker.acquire(CHAT, 1, timeout=0)[0]:
+        pass
+
+    order = []
+
+    def take(priority):
+        if broker.acquire(priority, 1, timeout=5)[0]:
+            order.append(priority)
+
+    batch = threading.Thread(target=take, args=(BATCH,))
+    batch.start()
+    time.sleep(0.02)
+    chat = threading.Thread(target=take, args=(CHAT,))
+    chat.start()
+    batch.join()
+    chat.join()
+    assert order == [CHAT, BATCH]
+
+
+def test_report_refunds_over_estimates():
+    broker = QuotaBroker(requests_per_minute=100, tokens_per_minute=1000, chat_reserve=0.0)
+    permit, _ = broker.acquire(CHAT, 900, timeout=0)
+    assert broker.acquire(CHAT, 900, timeout=0)[0] is None
+    broker.report(permit, 100)
+    assert broker.acquire(CHAT, 700, timeout=0)[0]
+
+
+def test_client_talks_to_server_and_fails_open():
+    server = BrokerServer(QuotaBroker(60, 10000), port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = QuotaClient(f"127.0.0.1:{server.server_address[1]}", CHAT, timeout=1)
+        permit = client.acquire(100)
+        assert permit and permit != QuotaClient.UNBROKERED
+        client.report(permit, 50)
+        assert server.broker.stats()["granted"][CHAT] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    unreachable = QuotaClient("127.0.0.1:1", CHAT, timeout=1)
+    assert unreachable.acquire(100) == QuotaClient.UNBROKERED
+
+
+def test_cancel_refunds_the_request_slot_and_tokens():
+    broker = QuotaBroker(requests_per_minute=1, tokens_per_minute=1000, chat_reserve=0.0)
+    permit, _ = broker.acquire(CHAT, 900, timeout=0)
+    assert broker.acquire(CHAT, 10, timeout=0)[0] is None
+    broker.cancel(permit)
+    assert broker.acquire(CHAT, 900, timeout=0)[0]
+
+
+def test_client_reuses_a_bounded_pool_of_connections():
+    server = BrokerServer(QuotaBroker(6000, 10**6), port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = QuotaClient(f"127.0.0.1:{server.server_address[1]}", CHAT, timeout=2, max_connections=2)
+        for _ in range(5):
+            client.report(client.acquire(10), 5)
+        assert client.connects == 1
+
+        permits = []
+        threads = [threading.Thread(target=lambda: permits.append(client.acquire(10))) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(permits) == 10 and all(permits) and client.connects <= 2
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+GEVENT_CLIENT = """
+from gevent import monkey; monkey.patch_all()
+import threading, gevent
+from api.utils.quota_broker import QuotaBroker, BrokerServer, QuotaClient, CHAT
+server = BrokerServer(QuotaBroker(6000, 10**6), port=0)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+client = QuotaClient("127.0.0.1:%d" % server.server_address[1], CHAT, timeout=2)
+jobs = [gevent.spawn(client.acquire, 10) for _ in range(50)]
+gevent.joinall(jobs)
+print(sum(1 for job in jobs if job.value), client.connects)
+"""
+
+
+def test_client_under_gevent_does_not_connect_per_greenlet():
+    pytest.importorskip("gevent")
+    root = Path(__file__).resolve().parent.parent
+    result = subprocess.run([sys.executable, "-c", GEVENT_CLIENT], cwd=root,
+                            env=dict(os.environ, PYTHONPATH=str(root)), capture_output=True, text=True, check=True)
+    granted, connects = map(int, result.stdout.split())
+    assert granted == 50 and connects <= 8
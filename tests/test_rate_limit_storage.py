@@ -0,0 +1,99 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+import api.utils.rate_limit_storage  # noqa: F401 - registers the sqlite:// scheme
+
+
+def _hit_many(uri, hits, results):
+    limiter = FixedWindowRateLimiter(storage_from_string(uri))
+    item = parse("20/minute")
+    results.put(sum(limiter.hit(item, "client") for _ in range(hits)))
+
+
+def test_limit_is_shared_between_storages(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'limits.db'}"
+    first = FixedWindowRateLimiter(storage_from_string(uri))
+    second = FixedWindowRateLimiter(storage_from_string(uri))
+    item = parse("10/minute")
+
+    admitted = [(first if i % 2 else second).hit(item, "client") for i in range(30)]
+    assert admitted.count(True) == 10
+    assert first.get_window_stats(item, "client").remaining == 0
+
+
+def test_limit_is_shared_between_processes(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'limits.db'}"
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    workers = [context.Process(target=_hit_many, args=(uri, 15, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sum(results.get() for _ in workers) == 20
+
+
+def test_preallocation_skips_round_trips(tmp_path):
+    storage = storage_from_string(f"sqlite:///{tmp_path / 'limits.db'}", reserve_batch=8)
+    limiter = FixedWindowRateLimiter(storage)
+    item = parse("1000/minute")
+
+    assert all(limiter.hit(item, "client") for _ in range(100))
+    # Blocks of 1, 2, 4, 8, 8, ... instead of one round trip per hit
+    assert storage.round_trips < 20
+
+
+def test_window_expiry_resets_counter(tmp_path):
+    storage = storage_from_string(f"sqlite:///{tmp_path / 'limits.db'}")
+    assert storage.incr("key", expiry=0) == 1
+    assert storage.incr("key", expiry=60) == 1
+    assert storage.get("key") == 1
+
+    storage.clear("key")
+    assert storage.get("key") == 0
+
+
+GEVENT_WORKER = """
+from gevent import monkey; monkey.patch_all()
+import sys, sqlite3, gevent
+connects = []
+_connect = sqlite3.connect
+sqlite3.connect = lambda *a, **k: connects.append(1) or _connect(*a, **k)
+from limits.storage import storage_from_string
+import api.utils.rate_limit_storage
+storage = storage_from_string("sqlite:///" + sys.argv[1], reserve_batch=1)
+gevent.joinall([gevent.spawn(storage.incr, "key", 60) for _ in range(50)])
+print(storage.get("key"), len(connects))
+"""
+
+
+def test_sqlite_storage_under_gevent_shares_one_connection(tmp_path):
+    pytest.importorskip("gevent")
+    root = Path(__file__).resolve().parent.parent
+    result = subprocess.run([sys.executable, "-c", GEVENT_WORKER, str(tmp_path / "limits.db")], cwd=root,
+                            env=dict(os.environ, PYTHONPATH=str(root)), capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["50", "1"]
+
+
+def test_bounded_memory_storage_caps_keys_and_keeps_recent_clients():
+    storage = storage_from_string("bounded+memory://", max_keys=50)
+    limiter = FixedWindowRateLimiter(storage)
+    item = parse("2/day")
+
+    for ip in range(500):
+        limiter.hit(item, f"10.0.{ip // 256}.{ip % 256}")
+    assert storage.key_count <= 50
+    assert storage.evictions >= 450
+
+    # The newest windows survive eviction, so a recent client is still limited
+    assert limiter.hit(item, "10.0.1.243")
+    assert not limiter.hit(item, "10.0.1.243")
@@ -0,0 +1,85 @@
+import json
+import os
+from unittest.mock import patch
+
+import requests
+
+from api import app
+from api.chatbot import FALLBACK_REPLY
+from api.utils.providers import Provider
+from api.utils.resilience import CircuitBreaker, Bulkhead, CLOSED, OPEN, HALF_OPEN, CIRCUIT_OPEN, OVERLOADED
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_half_opens_and_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=10, clock=clock)
+
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock.now = 10
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["rejected"] == 2
+
+
+def test_bulkhead_sheds_excess_calls():
+    bulkhead = Bulkhead("test", max_concurrent=1)
+    assert bulkhead.try_acquire()
+    assert not bulkhead.try_acquire()
+    bulkhead.release()
+    assert bulkhead.try_acquire()
+    assert bulkhead.snapshot() == {"in_flight": 1, "max_concurrent": 1, "rejected": 1}
+
+
+@patch('api.utils.providers.requests.post')
+@patch.dict(os.environ, {"FLUX_TEST_KEY": "secret"})
+def test_provider_fails_fast_once_circuit_opens(mock_post):
+    mock_post.side_effect = requests.exceptions.Timeout("slow")
+    provider = Provider(name="grok", display_name="Grok", api_url="http://fake", api_key_env="FLUX_TEST_KEY", model="m", max_tokens=1)
+
+    for _ in range(provider.breaker.failure_threshold):
+        provider.complete([])
+    assert mock_post.call_count == provider.breaker.failure_threshold
+
+    assert provider.complete([])["unavailable"] == CIRCUIT_OPEN
+    assert mock_post.call_count == provider.breaker.failure_threshold
+
+
+def chat(message="hello"):
+    return app.test_client().post('/api/chatbot', data=json.dumps({"message": message}), content_type='application/json')
+
+
+@patch('api.chatbot.call_chat_api')
+def test_chat_uses_fallback_reply_while_circuit_open(mock_call):
+    mock_call.return_value = {"error": "Grok API is temporarily unavailable.", "unavailable": CIRCUIT_OPEN}
+    resp = chat("circuit open question")
+    assert resp.status_code == 200
+    assert resp.get_json()["response"] == FALLBACK_REPLY
+
+
+@patch('api.chatbot.call_chat_api')
+def test_chat_sheds_load_with_503(mock_call):
+    mock_call.return_value = {"error": "Grok API is at capacity.", "unavailable": OVERLOADED}
+    resp = chat("overloaded question")
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "5"
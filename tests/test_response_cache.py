@@ -0,0 +1,94 @@
+from unittest.mock import patch
+
+from api.utils.response_cache import ResponseCache, normalize_message, is_context_free
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_message():
+    """Case, punctuation and whitespace differences share a key."""
+    assert normalize_message("  What is the FREE consultation?? ") == "what is the free consultation"
+    assert normalize_message("what is the free   consultation") == "what is the free consultation"
+
+
+def test_is_context_free():
+    assert is_context_free([])
+    assert is_context_free([{"role": "assistant", "content": "Hey! I'm Flux"}])
+    assert not is_context_free([{"role": "user", "content": "hi"}])
+
+
+def test_exact_hit_and_miss():
+    cache = ResponseCache()
+    assert cache.get("What does Fluxstream do?") is None
+    assert cache.put("What does Fluxstream do?", "We build AI automations.")
+    assert cache.get("what does fluxstream do") == "We build AI automations."
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_lead_marker_never_cached():
+    cache = ResponseCache()
+    reply = "[LEAD_INFO_COLLECTED] FirstName: Jane, Email: jane@example.com\nThanks!"
+    assert not cache.put("yes that's correct", reply)
+    assert cache.get("yes that's correct") is None
+    assert cache.stats()["rejected"] == 1
+
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache = ResponseCache(ttl=60, clock=clock)
+    cache.put("how do I contact Reid?", "Just ask me!")
+    clock.now += 59
+    assert cache.get("how do I contact Reid?") == "Just ask me!"
+    clock.now += 2
+    assert cache.get("how do I contact Reid?") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_capacity_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.put("one", "1")
+    cache.put("two", "2")
+    cache.get("one")
+    cache.put("three", "3")
+    assert cache.get("two") is None
+    assert cache.get("one") == "1"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_similarity_lookup_is_optional():
+    cache = ResponseCache(similarity_threshold=0.0)
+    cache.put("what is the free consultation", "It's a free AI review.")
+    assert cache.get("what is the free consultation exactly") is None
+
+    cache = ResponseCache(similarity_threshold=0.7)
+    cache.put("what is the free consultation", "It's a free AI review.")
+    assert cache.get("what's the free consultation") == "It's a free AI review."
+    assert cache.get("tell me a joke") is None
+    assert cache.stats()["similar_hits"] == 1
+
+
+@patch('api.chatbot.call_chat_api')
+def test_chat_serves_first_turn_from_cache(mock_llm):
+    from api import app
+    from api.chatbot import response_cache
+
+    response_cache.clear()
+    mock_llm.return_value = {"choices": [{"message": {"content": "We build AI automations."}}]}
+
+    client = app.test_client()
+    for _ in range(2):
+        resp = client.post('/api/chatbot', json={"message": "What does Fluxstream do?", "conversation_history": []})
+        assert resp.status_code == 200
+        assert resp.get_json()["response"] == "We build AI automations."
+
+    mock_llm.assert_called_once()
@@ -0,0 +1,64 @@
+from unittest.mock import patch
+
+from api.utils import llm
+from api.utils.grok import create_system_prompt
+from api.utils.retrieval import BM25Index, split_passages, get_index, retrieve_context
+
+DOC = """# Services
+
+## Chatbots
+We build custom chatbots and AI assistants for customer support.
+
+## Automation
+Workflow automation connects your tools and removes repetitive tasks.
+
+# Pricing
+Contact Reid for a quote on your project.
+"""
+
+
+def test_split_passages_keeps_heading_path():
+    passages = split_passages(DOC, "doc.md")
+    assert [p.title for p in passages] == ["Services > Chatbots", "Services > Automation", "Pricing"]
+
+
+def test_bm25_ranks_matching_passage_first(tmp_path):
+    index = BM25Index(split_passages(DOC, "doc.md"))
+    assert index.search("do you build chatbots?", min_score=0)[0][0].title == "Services > Chatbots"
+    assert index.search("automating repetitive workflows", min_score=0)[0][0].title == "Services > Automation"
+    assert index.search("weather tomorrow", min_score=0) == []
+
+    path = tmp_path / "index.json"
+    index.save(path)
+    assert BM25Index.load(path).search("quote", min_score=0)[0][0].title == "Pricing"
+
+
+def test_bundled_knowledge_answers_consultation_questions():
+    context = retrieve_context("What's included in the free consultation?")
+    assert "48 hours" in context
+    assert retrieve_context("thanks!") is None
+    assert len(get_index().passages) > 5
+
+
+def test_system_prompt_is_slim_but_keeps_lead_protocol():
+    prompt = create_system_prompt()
+    assert "[LEAD_INFO_COLLECTED] FirstName: [First Name]" in prompt
+    assert "50+ specialized solutions" not in prompt
+    assert len(prompt) < 2500
+
+
+def test_chat_turn_sends_retrieved_context():
+    with patch.object(llm.chat_router, 'complete', return_value={"choices": []}) as mock_complete:
+        llm.call_chat_api("Tell me about the free AI consultation", [])
+    messages = mock_complete.call_args.args[0]
+    assert "Free AI consultation" in messages[-1]["content"]
+
+
+def test_lead_capture_rules_stay_in_the_system_prompt():
+    prompt = create_system_prompt()
+    assert "[LEAD_INFO_COLLECTED] FirstName:" in prompt
+    assert "Just to confirm" in prompt and "HANDLING CORRECTIONS" in prompt
+    # The knowledge base holds facts only; protocol text there would apply only when retrieved
+    passages = get_index().passages
+    assert not any("lead capture" in p.title.lower() for p in passages)
+    assert not any("LEAD_INFO_COLLECTED" in p.text or "Just to confirm" in p.text for p in passages)
@@ -0,0 +1,150 @@
+import os
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "icebreakers"))
+
+from shard_leases import ShardLeases  # noqa: E402
+from lead_io import read_leads  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_workers_claim_disjoint_shards_and_reclaim_expired(tmp_path):
+    clock = Clock()
+    a = ShardLeases(tmp_path, "leads.csv", 250, shard_size=100, lease_seconds=60, worker_id="a", clock=clock)
+    b = ShardLeases(tmp_path, "leads.csv", 250, shard_size=999, lease_seconds=60, worker_id="b", clock=clock)
+    assert b.shard_size == 100 and a.shard_count == 3 and a.rows(2) == (200, 250)
+
+    assert a.try_claim(0)
+    assert not b.try_claim(0)
+    assert b.try_claim(1)
+
+    # a goes silent past its lease; b takes shard 0 over and a notices on renewal
+    clock.now += 61
+    assert b.try_claim(0)
+    assert not a.renew(0)
+    assert b.renew(0)
+
+    b.complete(0, lambda path: Path(path).write_text("x\n"))
+    assert not a.try_claim(0)
+    assert a.missing() == [1, 2]
+
+
+def test_sharded_enrichment_merges_in_row_order(tmp_path):
+    from lead_enricher_single import SingleFileLeadEnricher
+
+    source = tmp_path / "leads.csv"
+    pd.DataFrame({
+        "first_name": [f"Lead{i}" for i in range(23)],
+        "headline": ["CTO"] * 23,
+        "employment_history/0/organization_name": ["Acme"] * 23,
+    }).to_csv(source, index=False)
+
+    def fake_grok(self, prompt):
+        return {"choices": [{"message": {"content": "Great work at Acme."}}]}
+
+    with patch.dict(os.environ, {"XAI_API_KEY": "test"}), \
+            patch.object(SingleFileLeadEnricher, '_call_grok_api', fake_grok), \
+            patch('lead_enricher_single.time'):
+        enricher = SingleFileLeadEnricher(output_folder=str(tmp_path / "out"))
+        shared = tmp_path / "shared"
+        done = {}
+        workers = [
+            threading.Thread(target=lambda w=w: done.__setitem__(w, enricher.process_shards(str(source), str(shared), 5, lease_seconds=0.4, worker_id=w)))
+            for w in ("box-a", "box-b")
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        merged = pd.read_csv(enricher.merge_shards(str(source), str(shared)))
+
+    assert sum(done.values()) == 5
+    assert list(merged["first_name"]) == [f"Lead{i}" for i in range(23)]
+    assert merged["icebreaker"].str.startswith("Lead").all()
+
+
+def test_renew_never_overwrites_a_lease_taken_over_mid_renewal(tmp_path):
+    clock = Clock()
+    a = ShardLeases(tmp_path, "leads.csv", 100, lease_seconds=60, worker_id="a", clock=clock)
+    b = ShardLeases(tmp_path, "leads.csv", 100, lease_seconds=60, worker_id="b", clock=clock)
+    assert a.try_claim(0)
+    real_ftruncate = os.ftruncate
+    b_claims = []
+
+    def claim_then_truncate(fd, length):
+        # b tries to take the shard between a's ownership check and its rewrite
+        b_claims.append(b.try_claim(0))
+        real_ftruncate(fd, length)
+
+    with patch.object(os, "ftruncate", side_effect=claim_then_truncate):
+        # A live lease is never free while it is being renewed
+        assert a.renew(0)
+        clock.now += 61
+        assert not a.renew(0)
+
+    assert b_claims == [False, True]
+    assert b.owns(0) and b.renew(0)
+    assert not a.owns(0)
+
+
+def test_merge_needs_no_api_key(tmp_path, monkeypatch):
+    import lead_enricher_single
+
+    source = tmp_path / "leads.csv"
+    pd.DataFrame({"first_name": ["Ada", "Grace"], "icebreaker": ["Hi Ada.", "Hi Grace."]}).to_csv(source, index=False)
+    leases = ShardLeases(tmp_path / "shared", source.name, 2)
+    assert leases.try_claim(0)
+    leases.complete(0, lambda path: pd.read_csv(source).to_csv(path, index=False))
+
+    monkeypatch.delenv("XAI_API_KEY", raising=False)
+    monkeypatch.delenv("XAI_API_KEYS", raising=False)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["lead_enricher_single.py", str(source), "--shard-dir", str(tmp_path / "shared"), "--merge"])
+    lead_enricher_single.main()
+    assert list(pd.read_csv(tmp_path / "output_data" / "leads_with_icebreakers.csv")["first_name"]) == ["Ada", "Grace"]
+
+
+@pytest.mark.parametrize("name", ["leads.csv", "leads.jsonl.gz"])
+def test_sharded_merge_round_trips_source_columns(tmp_path, name):
+    from lead_enricher_single import SingleFileLeadEnricher
+    from lead_io import write_leads
+
+    source = tmp_path / name
+    write_leads(pd.DataFrame({
+        "first_name": ["Ada", "Grace", "Edsger"],
+        "headline": ["CTO", "", "Professor"],
+        "employment_history/0/organization_name": ["Acme", "Navy", "UT"],
+        "phone": ["0123456789", "0044 20 7946 0000", "NA"],
+        "zip": ["02134", "00501", "10001"],
+        "employees": [12, 3400, 7],
+    }), source)
+    seen_prompts = []
+
+    def fake_grok(self, prompt):
+        seen_prompts.append(prompt)
+        return {"choices": [{"message": {"content": "Great work."}}]}
+
+    with patch.dict(os.environ, {"XAI_API_KEY": "test"}), \
+            patch.object(SingleFileLeadEnricher, '_call_grok_api', fake_grok), \
+            patch('lead_enricher_single.time'):
+        enricher = SingleFileLeadEnricher(output_folder=str(tmp_path / "out"))
+        enricher.process_shards(str(source), str(tmp_path / "shared"), 2, worker_id="solo")
+        merged_path = enricher.merge_shards(str(source), str(tmp_path / "shared"))
+
+    assert merged_path.name == name.replace("leads", "leads_with_icebreakers")
+    merged, original = read_leads(merged_path, as_text=True), read_leads(source, as_text=True)
+    assert merged.drop(columns="icebreaker").equals(original)
+    assert 'Headline: "their role"' in seen_prompts[1]
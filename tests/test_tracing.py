@@ -0,0 +1,55 @@
+import json
+import logging
+from unittest.mock import patch, MagicMock
+
+from flask import Flask
+
+from api.utils import tracing
+from api.utils.providers import Provider
+
+
+def make_app():
+    app = Flask(__name__)
+    tracing.init_app(app, enabled=True)
+
+    @app.route('/work')
+    def work():
+        with tracing.span("validate"):
+            pass
+        with tracing.span("llm") as llm_span:
+            llm_span.set(provider="grok")
+        return "ok"
+
+    return app
+
+
+def test_span_is_noop_without_active_trace():
+    assert tracing.current_trace() is None
+    assert tracing.span("llm") is tracing._NOOP_SPAN
+
+
+def test_server_timing_header_and_json_log(caplog):
+    with caplog.at_level(logging.INFO, logger="api.trace"):
+        resp = make_app().test_client().get('/work')
+
+    names = [part.split(";")[0] for part in resp.headers["Server-Timing"].split(", ")]
+    assert names == ["validate", "llm", "total"]
+
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record["status"] == 200
+    assert [s["name"] for s in record["spans"]] == ["validate", "llm"]
+    assert record["spans"][1]["provider"] == "grok"
+    assert tracing.current_trace() is None
+
+
+def test_provider_span_records_outcome(monkeypatch):
+    monkeypatch.setenv('TEST_LLM_KEY', 'key')
+    provider = Provider(name="test", api_url="http://llm", api_key_env='TEST_LLM_KEY', model="m", max_tokens=10)
+    ok_response = MagicMock()
+    ok_response.json.return_value = {"choices": []}
+
+    with tracing.start_trace("unit") as trace, patch('api.utils.providers.requests.post', return_value=ok_response):
+        provider.complete([])
+
+    assert trace.spans[0]["name"] == "llm.test"
+    assert trace.spans[0]["ok"] is True